@@ -0,0 +1,159 @@
+"""
+プロジェクト・画面・テストケース・テスト項目の一括削除（カスケード削除）
+削除対象のIDを一時テーブルに積み、配下の階層を INSERT ... SELECT で展開してから
+階層ごとに DELETE ... WHERE id IN (SELECT id FROM 一時テーブル) を1文ずつ実行する
+（件数によらず文の数は一定で、全体を1つのトランザクションで行う）
+
+不具合の扱い
+・削除するテスト項目を参照している不具合は残し、参照（bugs.test_item_id）だけ解除する
+・削除するプロジェクトの不具合は削除する（他プロジェクトのテスト項目からの参照は解除する）
+削除するテストケース・テスト項目の実行履歴（test_run_cases / test_run_steps）・スクリーンショットの参照も削除する
+（test_runs は残す）
+取り込みの差分削除など、呼び出し元のトランザクション内でテスト項目を削除する場合は delete_test_items_in を使う
+"""
+from typing import Dict, Iterable, List, Tuple
+
+from core import scenario_db
+
+# 削除対象を積む一時テーブル（階層の上から順）
+# (一時テーブル名, 削除するテーブル, 親の一時テーブルから展開する条件)
+_LEVELS: List[Tuple[str, str, str]] = [
+    ("cascade_projects", "projects", ""),
+    ("cascade_screens", "screens", "project_id IN (SELECT id FROM temp.cascade_projects)"),
+    ("cascade_cases", "test_cases", "screen_id IN (SELECT id FROM temp.cascade_screens)"),
+    ("cascade_items", "test_items", "test_case_id IN (SELECT id FROM temp.cascade_cases)"),
+]
+# 一時テーブルに積む際の1回あたりの件数
+BATCH_SIZE = 5000
+
+
+def delete_projects(project_ids: Iterable[int]) -> Dict[str, int]:
+    """プロジェクトと配下の画面・テストケース・テスト項目・不具合・シナリオを削除する"""
+    return _cascade_delete("cascade_projects", project_ids)
+
+
+def delete_screens(screen_ids: Iterable[int]) -> Dict[str, int]:
+    """画面と配下のテストケース・テスト項目を削除する"""
+    return _cascade_delete("cascade_screens", screen_ids)
+
+
+def delete_test_cases(test_case_ids: Iterable[int]) -> Dict[str, int]:
+    """テストケースと配下のテスト項目を削除する"""
+    return _cascade_delete("cascade_cases", test_case_ids)
+
+
+def delete_test_items(test_item_ids: Iterable[int]) -> Dict[str, int]:
+    """テスト項目を削除する"""
+    return _cascade_delete("cascade_items", test_item_ids)
+
+
+def delete_test_items_in(cur, test_item_ids: Iterable[int]) -> Dict[str, int]:
+    """
+    呼び出し元のトランザクション内でテスト項目を削除する（コミット・ロールバックは呼び出し元が行う）
+    不具合からの参照を解除し、実行履歴・スクリーンショットの参照も削除する
+    戻り値: {"test_items": 削除したテスト項目数, "unlinked_bugs": 参照を解除した不具合数}
+    """
+    counts = {"test_items": 0, "unlinked_bugs": 0}
+    rows = [(int(i),) for i in test_item_ids]
+    if not rows:
+        return counts
+    _create_stage_tables(cur, "cascade_items")
+    _stage_ids(cur, "cascade_items", rows)
+    cur.execute("UPDATE bugs SET test_item_id = NULL WHERE test_item_id IN (SELECT id FROM temp.cascade_items)")
+    counts["unlinked_bugs"] = cur.rowcount
+    _delete_item_references(cur)
+    cur.execute("DELETE FROM test_items WHERE id IN (SELECT id FROM temp.cascade_items)")
+    counts["test_items"] = cur.rowcount
+    _clear_stage_tables(cur)
+    return counts
+
+
+def _cascade_delete(level_table: str, ids: Iterable[int]) -> Dict[str, int]:
+    """
+    指定階層のIDとその配下をまとめて削除し、削除・更新した件数を返す
+    戻り値: {"projects", "screens", "test_cases", "test_items": テーブルごとの削除件数,
+             "deleted_bugs": 削除した不具合数, "unlinked_bugs": テスト項目への参照を解除した不具合数}
+    いずれかの文が失敗した場合は全体をロールバックする（一部だけ削除された状態にはならない）
+    """
+    counts = {"projects": 0, "screens": 0, "test_cases": 0, "test_items": 0,
+              "deleted_bugs": 0, "unlinked_bugs": 0}
+    rows = [(int(i),) for i in ids]
+    if not rows:
+        return counts
+    with scenario_db.transaction(immediate=True) as cur:
+        start = _create_stage_tables(cur, level_table)
+        _stage_ids(cur, level_table, rows)
+        # 配下の階層を展開
+        for stage, table, condition in _LEVELS[start + 1:]:
+            cur.execute(f"INSERT OR IGNORE INTO temp.{stage} (id) SELECT id FROM {table} WHERE {condition}")
+        with_projects = start == 0
+        # 不具合 → テスト項目の参照を解除（削除するプロジェクトの不具合は後で削除するので数えない）
+        cur.execute("""
+            UPDATE bugs SET test_item_id = NULL
+            WHERE test_item_id IN (SELECT id FROM temp.cascade_items)
+              AND project_id NOT IN (SELECT id FROM temp.cascade_projects)
+        """)
+        counts["unlinked_bugs"] = cur.rowcount
+        if with_projects:
+            cur.execute("UPDATE bugs SET test_item_id = NULL WHERE test_item_id IN (SELECT id FROM temp.cascade_items)")
+        # 階層の下から削除
+        for stage, table, _ in reversed(_LEVELS[start:]):
+            if table == "projects":
+                # 残るテスト項目からの参照を解除してから、プロジェクトの不具合・シナリオ・BUG番号シーケンスを削除
+                cur.execute("""
+                    UPDATE test_items SET bug_id = NULL
+                    WHERE bug_id IN (SELECT id FROM bugs WHERE project_id IN (SELECT id FROM temp.cascade_projects))
+                """)
+                cur.execute("DELETE FROM bugs WHERE project_id IN (SELECT id FROM temp.cascade_projects)")
+                counts["deleted_bugs"] = cur.rowcount
+                cur.execute("DELETE FROM scenarios WHERE project_id IN (SELECT id FROM temp.cascade_projects)")
+                cur.execute("DELETE FROM bug_sequences WHERE project_id IN (SELECT id FROM temp.cascade_projects)")
+            elif table == "test_cases":
+                # 実行履歴はテスト項目・テストケースと一緒に削除（IDが再利用されても別の履歴と混ざらない）
+                # 手順は削除済みのテスト項目の分も残っていることがあるため、テストケースの実行結果から辿って削除する
+                cur.execute("""
+                    DELETE FROM test_run_steps WHERE run_case_id IN (
+                        SELECT id FROM test_run_cases WHERE test_case_id IN (SELECT id FROM temp.cascade_cases)
+                    )
+                """)
+                cur.execute("DELETE FROM test_run_cases WHERE test_case_id IN (SELECT id FROM temp.cascade_cases)")
+                cur.execute("DELETE FROM screenshots WHERE test_case_id IN (SELECT id FROM temp.cascade_cases)")
+            elif table == "test_items":
+                _delete_item_references(cur)
+            cur.execute(f"DELETE FROM {table} WHERE id IN (SELECT id FROM temp.{stage})")
+            counts[table] = cur.rowcount
+        _clear_stage_tables(cur)
+    print(f"[LOG] カスケード削除: プロジェクト{counts['projects']}件 画面{counts['screens']}件 "
+          f"テストケース{counts['test_cases']}件 テスト項目{counts['test_items']}件 "
+          f"不具合削除{counts['deleted_bugs']}件 不具合参照解除{counts['unlinked_bugs']}件")
+    return counts
+
+
+def _create_stage_tables(cur, level_table: str) -> int:
+    """一時テーブルを用意して空にし、削除を始める階層の位置を返す"""
+    start = -1
+    for pos, (stage, _, _) in enumerate(_LEVELS):
+        cur.execute(f"CREATE TEMP TABLE IF NOT EXISTS {stage} (id INTEGER PRIMARY KEY)")
+        cur.execute(f"DELETE FROM temp.{stage}")
+        if stage == level_table:
+            start = pos
+    if start < 0:
+        raise ValueError(f"不明な階層です: {level_table}")
+    return start
+
+
+def _stage_ids(cur, stage: str, rows: List[Tuple[int]]) -> None:
+    for i in range(0, len(rows), BATCH_SIZE):
+        cur.executemany(f"INSERT OR IGNORE INTO temp.{stage} (id) VALUES (?)", rows[i:i + BATCH_SIZE])
+
+
+def _delete_item_references(cur) -> None:
+    """temp.cascade_items のテスト項目の実行履歴・スクリーンショットの参照を削除する"""
+    cur.execute("DELETE FROM test_run_steps WHERE test_item_id IN (SELECT id FROM temp.cascade_items)")
+    # スクリーンショットは参照だけ削除（画像ファイルは screenshot.apply_retention で削除）
+    cur.execute("DELETE FROM screenshots WHERE test_item_id IN (SELECT id FROM temp.cascade_items)")
+
+
+def _clear_stage_tables(cur) -> None:
+    for stage, _, _ in _LEVELS:
+        cur.execute(f"DELETE FROM temp.{stage}")
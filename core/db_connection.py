@@ -0,0 +1,81 @@
+"""
+SQLiteコネクション管理
+スレッドごとにDBファイル単位で長寿命のコネクションを1本だけ保持し、
+PRAGMAの設定やプリペアドステートメントのキャッシュを使い回す
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+# コネクション作成時に1回だけ適用するPRAGMA
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-32768",  # 約32MB
+)
+# コネクションごとにキャッシュするプリペアドステートメント数
+STATEMENT_CACHE_SIZE = 256
+# 他コネクションの書き込みロック待ち時間（秒）
+BUSY_TIMEOUT = 30.0
+
+_local = threading.local()
+
+
+def _thread_connections() -> Dict[str, sqlite3.Connection]:
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    return connections
+
+
+def get_connection(db_path: str) -> sqlite3.Connection:
+    """
+    呼び出し元スレッド専用のコネクションを返す（初回のみ接続・PRAGMA設定）
+    `with get_connection(path) as conn:` で従来どおりブロック単位のコミット/ロールバックになる
+    （コネクション自体は閉じない）
+    """
+    connections = _thread_connections()
+    conn = connections.get(db_path)
+    if conn is None:
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, cached_statements=STATEMENT_CACHE_SIZE)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        connections[db_path] = conn
+    return conn
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection, immediate: bool = False) -> Iterator[sqlite3.Cursor]:
+    """
+    明示的なトランザクション（BEGIN [IMMEDIATE] 〜 COMMIT / 例外時ROLLBACK）
+    immediate=True は開始時点で書き込みロックを取得する
+    既にトランザクション中なら、その中でそのまま実行する
+    """
+    cur = conn.cursor()
+    if conn.in_transaction:
+        yield cur
+        return
+    cur.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    try:
+        yield cur
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+
+def close_thread_connections() -> None:
+    """呼び出し元スレッドのコネクションをすべて閉じる（ワーカースレッド終了時など）"""
+    connections = _thread_connections()
+    for conn in connections.values():
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    connections.clear()
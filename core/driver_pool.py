@@ -0,0 +1,280 @@
+"""
+ブラウザ（WebDriver）の使い回し
+起動に1〜3秒かかるブラウザを最初にまとめて起動しておき、テストケースの間は
+Cookie・ストレージ・開いているウインドウ・表示中のページだけを初期化して使い回す
+・一定回数使ったブラウザ、メモリが増えたブラウザ、操作中にエラーになったブラウザは起動し直す
+・ブラウザ（スロット）ごとの実行件数・使用時間・稼働率・再起動回数を stats() で返す
+
+pool = DriverPool(factory, browsers=("chrome",), size=4)
+pool.start()
+with pool.session() as (browser, driver):
+    ...
+slot = pool.acquire()          # 同じブラウザで続けて実行する場合
+... pool.renew(slot) ...       # テストケースの間の初期化
+pool.release(slot, renew=False)
+pool.close()
+"""
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# ブラウザを起動し直すまでの使用回数（テストケース数）
+DEFAULT_MAX_USES = 50
+# 起動直後からのメモリ増加量の上限（MB、None の場合はメモリでは起動し直さない）
+DEFAULT_MAX_MEMORY_GROWTH_MB: Optional[float] = 300.0
+# 初期化の最後に表示するページ
+BLANK_URL = "about:blank"
+# 空きを待つ間に使えるブラウザが残っているか確かめる間隔（秒）
+_ACQUIRE_POLL = 0.5
+# ページの localStorage / sessionStorage を消すスクリプト（about:blank などでは例外になるので握りつぶす）
+_CLEAR_STORAGE_SCRIPT = "try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}"
+# JSヒープの使用量（Chrome のみ。取れない場合は null）
+_MEMORY_SCRIPT = "return (window.performance && performance.memory) ? performance.memory.usedJSHeapSize : null;"
+
+DriverFactory = Callable[[str], Any]
+# ドライバのメモリ使用量（MB）を返す関数（取れない場合は None）
+MemoryProbe = Callable[[Any], Optional[float]]
+
+
+def js_heap_mb(driver: Any) -> Optional[float]:
+    """ページのJSヒープ使用量（MB）。Chrome 以外など取れない場合は None（既定の memory_probe）"""
+    try:
+        used = driver.execute_script(_MEMORY_SCRIPT)
+    except Exception:
+        return None
+    return used / (1024 * 1024) if used else None
+
+
+class _Slot:
+    """プールの1枠（起動し直してもスロットは同じで、使用実績を引き継ぐ）"""
+    def __init__(self, slot_id: int, browser: str):
+        self.slot_id = slot_id
+        self.browser = browser
+        self.driver: Any = None
+        # 起動し直しに失敗したスロットは False（それ以降使わない）
+        self.alive = True
+        # 今のドライバの使用回数・起動直後のメモリ（MB）
+        self.uses = 0
+        self.baseline_mb: Optional[float] = None
+        # スロット全体の実績
+        self.cases = 0
+        self.busy_seconds = 0.0
+        self.spawn_seconds = 0.0
+        self.restarts = 0
+        self.acquired_at: Optional[float] = None
+
+
+class DriverPool:
+    """
+    使い回すブラウザの置き場
+    ・size: 起動しておくブラウザ数（browsers を順番に割り当てる）
+    ・max_uses: この回数使ったら起動し直す
+    ・max_memory_growth_mb: 起動直後からこれ以上メモリが増えたら起動し直す（None で無効）
+    ・memory_probe: ドライバのメモリ使用量（MB）を返す関数（既定は js_heap_mb）
+    """
+    def __init__(self, factory: DriverFactory, browsers: Sequence[str], size: int,
+                 max_uses: int = DEFAULT_MAX_USES,
+                 max_memory_growth_mb: Optional[float] = DEFAULT_MAX_MEMORY_GROWTH_MB,
+                 memory_probe: Optional[MemoryProbe] = None):
+        if size < 1:
+            raise ValueError("sizeは1以上である必要があります")
+        if not browsers:
+            raise ValueError("browsersを1つ以上指定してください")
+        if max_uses < 1:
+            raise ValueError("max_usesは1以上である必要があります")
+        self._factory = factory
+        self._slots = [_Slot(i, browsers[i % len(browsers)]) for i in range(size)]
+        self.max_uses = max_uses
+        self.max_memory_growth_mb = max_memory_growth_mb
+        self._memory_probe = memory_probe or js_heap_mb
+        self._idle: "queue.Queue[_Slot]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._started_at: Optional[float] = None
+        self._closed = False
+
+    # ------------------------------ 起動・終了 ------------------------------
+    def start(self) -> None:
+        """全スロットのブラウザを並列に起動する（1つも起動できない場合は RuntimeError）"""
+        if self._started_at is not None:
+            return
+        self._started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(self._slots), thread_name_prefix="driver-spawn") as executor:
+            spawned = list(executor.map(self._spawn, self._slots))
+        errors = [error for error in spawned if error is not None]
+        ready = [slot for slot in self._slots if slot.driver is not None]
+        if not ready:
+            raise RuntimeError(f"ブラウザを起動できません: {errors[0]}")
+        for slot in ready:
+            self._idle.put(slot)
+        # 起動できなかったスロットは使わない
+        self._slots = ready
+        elapsed = time.perf_counter() - self._started_at
+        print(f"[LOG] ブラウザ起動: {len(ready)}/{len(spawned)}台 ({elapsed:.1f}s)")
+
+    def close(self) -> None:
+        """すべてのブラウザを終了する"""
+        with self._lock:
+            self._closed = True
+        for slot in self._slots:
+            self._quit(slot)
+
+    def _spawn(self, slot: _Slot) -> Optional[Exception]:
+        """スロットのブラウザを起動する（失敗した場合は例外を返す）"""
+        start = time.perf_counter()
+        try:
+            slot.driver = self._factory(slot.browser)
+        except Exception as e:
+            print(f"[WARN] ブラウザの起動に失敗しました（{slot.browser} #{slot.slot_id}）: {e}")
+            return e
+        finally:
+            slot.spawn_seconds += time.perf_counter() - start
+        slot.uses = 0
+        slot.baseline_mb = self._memory_probe(slot.driver)
+        return None
+
+    @staticmethod
+    def _quit(slot: _Slot) -> None:
+        driver, slot.driver = slot.driver, None
+        if driver is None:
+            return
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"[WARN] ブラウザの終了に失敗しました（{slot.browser} #{slot.slot_id}）: {e}")
+
+    # ------------------------------ 貸し出し ------------------------------
+    @contextmanager
+    def session(self) -> Iterator[Tuple[str, Any]]:
+        """
+        ブラウザを1つ借りて (ブラウザ名, ドライバ) を渡す
+        with の中で例外が出た場合はブラウザが壊れている可能性があるので起動し直す
+        """
+        slot = self.acquire()
+        ok = False
+        try:
+            yield slot.browser, slot.driver
+            ok = True
+        finally:
+            self.release(slot, discard=not ok)
+
+    def acquire(self, timeout: Optional[float] = None) -> _Slot:
+        """
+        空いているスロットを借りる（空きがなければ返却を待つ）
+        timeout 秒待っても空かない場合は TimeoutError、使えるブラウザがなくなった場合は RuntimeError
+        """
+        if self._started_at is None:
+            self.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = _ACQUIRE_POLL if deadline is None else min(_ACQUIRE_POLL, max(deadline - time.monotonic(), 0))
+            try:
+                slot = self._idle.get(timeout=wait)
+                break
+            except queue.Empty:
+                if not any(s.alive for s in self._slots):
+                    raise RuntimeError("使えるブラウザがありません（再起動に失敗しました）") from None
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError("空いているブラウザがありません") from None
+        slot.acquired_at = time.perf_counter()
+        return slot
+
+    def release(self, slot: _Slot, discard: bool = False, renew: bool = True) -> None:
+        """スロットを返す（renew してから空きに戻す。直前に renew 済みの場合は renew=False）"""
+        if renew:
+            alive = self.renew(slot, discard)
+        else:
+            if slot.acquired_at is not None:
+                slot.busy_seconds += time.perf_counter() - slot.acquired_at
+            with self._lock:
+                closed = self._closed
+            if closed:
+                self._quit(slot)
+            alive = slot.driver is not None
+        slot.acquired_at = None
+        if alive:
+            self._idle.put(slot)
+
+    def renew(self, slot: _Slot, discard: bool = False) -> bool:
+        """
+        借りたままテストケース1件分の使用を終える
+        ブラウザの状態を初期化し、使用回数・メモリの上限を超えた場合や discard=True の場合は起動し直す
+        戻り値: 引き続き使えるか（終了済みのプール・起動し直せなかったスロットは False で、それ以降使わない）
+        """
+        now = time.perf_counter()
+        if slot.acquired_at is not None:
+            slot.busy_seconds += now - slot.acquired_at
+            slot.acquired_at = now
+        slot.cases += 1
+        slot.uses += 1
+        reason = "エラー" if discard else self._recycle_reason(slot)
+        if reason is None and not self._reset(slot):
+            reason = "初期化失敗"
+        with self._lock:
+            closed = self._closed
+        if closed:
+            self._quit(slot)
+            return False
+        if reason is not None:
+            print(f"[LOG] ブラウザ再起動（{slot.browser} #{slot.slot_id}）: {reason}")
+            self._quit(slot)
+            slot.restarts += 1
+            if self._spawn(slot) is not None:
+                slot.alive = False
+                return False
+            # 起動し直している間は使用時間に数えない
+            slot.acquired_at = time.perf_counter()
+        return True
+
+    def _recycle_reason(self, slot: _Slot) -> Optional[str]:
+        if slot.uses >= self.max_uses:
+            return f"使用回数{slot.uses}回"
+        if self.max_memory_growth_mb is not None and slot.baseline_mb is not None:
+            current = self._memory_probe(slot.driver)
+            if current is not None and current - slot.baseline_mb > self.max_memory_growth_mb:
+                return f"メモリ増加{current - slot.baseline_mb:.0f}MB"
+        return None
+
+    @staticmethod
+    def _reset(slot: _Slot) -> bool:
+        """Cookie・ストレージ・追加で開いたウインドウを消して空白ページに戻す（失敗した場合は False）"""
+        driver = slot.driver
+        try:
+            handles = list(driver.window_handles)
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            if handles:
+                driver.switch_to.window(handles[0])
+            driver.execute_script(_CLEAR_STORAGE_SCRIPT)
+            driver.delete_all_cookies()
+            driver.get(BLANK_URL)
+        except Exception as e:
+            print(f"[WARN] ブラウザの初期化に失敗しました（{slot.browser} #{slot.slot_id}）: {e}")
+            return False
+        return True
+
+    # ------------------------------ 実績 ------------------------------
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        スロットごとの実績
+        [{"slot", "browser", "cases", "busy_seconds", "spawn_seconds", "restarts", "utilization"}, ...]
+        （utilization: start() からの経過時間に対する使用時間の割合）
+        """
+        elapsed = time.perf_counter() - self._started_at if self._started_at is not None else 0.0
+        return [{
+            "slot": slot.slot_id,
+            "browser": slot.browser,
+            "cases": slot.cases,
+            "busy_seconds": slot.busy_seconds,
+            "spawn_seconds": slot.spawn_seconds,
+            "restarts": slot.restarts,
+            "utilization": slot.busy_seconds / elapsed if elapsed > 0 else 0.0,
+        } for slot in self._slots]
+
+    def log_stats(self) -> None:
+        for s in self.stats():
+            print(f"[LOG] ブラウザ #{s['slot']}（{s['browser']}）: {s['cases']}件 稼働率{s['utilization']:.0%} "
+                  f"使用{s['busy_seconds']:.1f}s 起動{s['spawn_seconds']:.1f}s 再起動{s['restarts']}回")
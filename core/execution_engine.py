@@ -0,0 +1,489 @@
+"""
+テスト自動実行エンジン
+テストケースごとにブラウザ（WebDriver）を1つ割り当てて配下のテスト項目を順に実行し、
+結果を test_items.result / exec_date、test_cases.status / last_run / result に書き戻す
+複数のテストケースは core.run_scheduler でワーカーごとに分け、スレッドプールで並列に実行する
+ブラウザは core.driver_pool で起動しておいたものをテストケースの間で状態だけ初期化して使い回す
+
+テスト項目の操作手順・期待結果の各行のうち、行頭に @ を付けた次の形式の行を手順として実行する
+（@ のない行は手動実施の説明として無視する。「入力：ユーザー名」のような普通の書き方は手順にならない）
+    @open: /login                       （開く）            base_url からの相対URLも可
+    @type: input[name=user] = {input}   （入力）            {input} はテスト項目の入力データに置き換える
+    @click: #submit                     （クリック）
+    @select: #pref = 東京都              （選択）            表示文字列で選択
+    @wait: .result                      （待機）            要素が表示されるまで待つ
+    @assert_text: .msg = 完了           （確認）            要素の文字列に含まれるか
+    @assert_title: ダッシュボード        （タイトル確認）    ページタイトルに含まれるか
+    @assert_url: /search?q=1            （URL確認）         URLに含まれるか
+    @assert_visible: #menu              （表示確認）
+値を取る手順（type / select / assert_text）は、前後に空白のある「 = 」で対象と値を区切る
+（角かっこ・引用符の中の = は区切りにしない）。それ以外の手順は「:」の後ろ全体が対象
+手順が1つもないテスト項目は手動実施の項目として結果を書き換えない
+
+selenium は実行時に初めて読み込む（未インストールでもモジュール自体は読み込める）
+driver_factory を渡すと任意のドライバ（テスト用のスタブなど）で実行できる
+"""
+import datetime
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urljoin
+
+from core import run_history, run_scheduler, scenario_db
+from core.driver_pool import DEFAULT_MAX_MEMORY_GROWTH_MB, DEFAULT_MAX_USES, DriverFactory, DriverPool
+from core.screenshot import ScreenshotPipeline
+
+# ブラウザ
+CHROME = "chrome"
+FIREFOX = "firefox"
+# 書き戻す結果・ステータス
+RESULT_SUCCESS = "成功"
+RESULT_FAILURE = "失敗"
+CASE_EXECUTED_STATUS = "実施済"
+# 要素が見つかるまで・条件が満たされるまでの待ち時間（秒）
+DEFAULT_STEP_TIMEOUT = 10.0
+POLL_INTERVAL = 0.1
+# テスト項目の入力データを差し込むプレースホルダー
+INPUT_PLACEHOLDER = "{input}"
+# スクリーンショットを撮る手順（撮らない・失敗した手順だけ・すべての手順）
+SCREENSHOTS_OFF = "off"
+SCREENSHOTS_FAILURES = "failures"
+SCREENSHOTS_ALL = "all"
+# Selenium 4 の By.CSS_SELECTOR（selenium を読み込まずに要素を探すため文字列で持つ）
+CSS_SELECTOR = "css selector"
+
+# 手順のキーワード（日本語の別名 → 正式名）
+STEP_ALIASES = {
+    "開く": "open", "入力": "type", "クリック": "click", "選択": "select", "待機": "wait",
+    "確認": "assert_text", "タイトル確認": "assert_title", "URL確認": "assert_url", "表示確認": "assert_visible",
+}
+STEP_ACTIONS = ("open", "type", "click", "select", "wait", "assert_text", "assert_title", "assert_url", "assert_visible")
+# 対象と値を取る手順
+VALUE_ACTIONS = ("type", "select", "assert_text")
+# 対象と値の区切り
+VALUE_SEPARATOR = " = "
+# 「@キーワード: 対象」または「@キーワード: 対象 = 値」（全角コロンも可）
+_STEP_PATTERN = re.compile(r"^\s*[@＠]\s*([A-Za-z_]+|[^\s:：]+)\s*[:：]\s*(.+?)\s*$")
+
+# 手順 (キーワード, 対象, 値)
+Step = Tuple[str, str, Optional[str]]
+
+
+class StepError(Exception):
+    """手順の実行に失敗した（要素が見つからない・確認した内容が一致しない）"""
+
+
+def parse_steps(text: Optional[str], input_data: Optional[str] = None) -> List[Step]:
+    """操作手順・期待結果の文字列から実行する手順（行頭に @ を付けた行）を取り出す"""
+    steps = []
+    for line in (text or "").splitlines():
+        match = _STEP_PATTERN.match(line)
+        if not match:
+            continue
+        action = STEP_ALIASES.get(match.group(1), match.group(1).lower())
+        if action not in STEP_ACTIONS:
+            continue
+        body = match.group(2)
+        value = None
+        if action in VALUE_ACTIONS:
+            body, value = _split_value(body)
+        # 区切ってから入力データを差し込む（入力データに「 = 」が含まれても区切り位置は変わらない）
+        target = body.replace(INPUT_PLACEHOLDER, input_data or "")
+        if value is not None:
+            value = value.replace(INPUT_PLACEHOLDER, input_data or "")
+        steps.append((action, target, value))
+    return steps
+
+
+def _split_value(body: str) -> Tuple[str, Optional[str]]:
+    """
+    「対象 = 値」を (対象, 値) に分ける（区切りがない場合は値 None）
+    CSSセレクタの属性指定（[name = "a = b"] など）の中の「 = 」では区切らない
+    """
+    depth = 0
+    quote = None
+    for i, char in enumerate(body):
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char == "[":
+            depth += 1
+        elif char == "]":
+            depth = max(depth - 1, 0)
+        elif depth == 0 and body.startswith(VALUE_SEPARATOR, i):
+            return body[:i].strip(), body[i + len(VALUE_SEPARATOR):].strip()
+    return body.strip(), None
+
+
+def create_driver(browser: str, headless: bool = True) -> Any:
+    """
+    ヘッドレスブラウザの WebDriver を起動する（既定の driver_factory）
+    ドライバの実行ファイルは selenium 同梱の Selenium Manager が用意する
+    """
+    try:
+        from selenium import webdriver
+    except ImportError as e:
+        raise RuntimeError("自動実行には selenium が必要です（pip install selenium）") from e
+    if browser == CHROME:
+        options = webdriver.ChromeOptions()
+        if headless:
+            options.add_argument("--headless=new")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        return webdriver.Chrome(options=options)
+    if browser == FIREFOX:
+        options = webdriver.FirefoxOptions()
+        if headless:
+            options.add_argument("-headless")
+        return webdriver.Firefox(options=options)
+    raise ValueError(f"未対応のブラウザです: {browser}")
+
+
+class StepRunner:
+    """1つのドライバで手順を実行する"""
+    def __init__(self, driver: Any, base_url: str = "", timeout: float = DEFAULT_STEP_TIMEOUT):
+        self.driver = driver
+        self.base_url = base_url
+        self.timeout = timeout
+
+    def run(self, step: Step) -> None:
+        action, target, value = step
+        getattr(self, f"_do_{action}")(target, value)
+
+    def _find(self, selector: str, visible: bool = False) -> Any:
+        """要素が見つかる（visible=True なら表示される）まで待って返す"""
+        last_error: Optional[Exception] = None
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                element = self.driver.find_element(CSS_SELECTOR, selector)
+                if not visible or element.is_displayed():
+                    return element
+            except Exception as e:
+                last_error = e
+            if time.monotonic() >= deadline:
+                reason = f"（{last_error}）" if last_error else "（非表示）"
+                raise StepError(f"要素が見つかりません: {selector}{reason}")
+            time.sleep(POLL_INTERVAL)
+
+    def _wait_until(self, condition: Callable[[], bool], message: str) -> None:
+        deadline = time.monotonic() + self.timeout
+        while not condition():
+            if time.monotonic() >= deadline:
+                raise StepError(message)
+            time.sleep(POLL_INTERVAL)
+
+    def _do_open(self, target: str, value: Optional[str]) -> None:
+        self.driver.get(urljoin(self.base_url, target) if self.base_url else target)
+
+    def _do_type(self, target: str, value: Optional[str]) -> None:
+        element = self._find(target, visible=True)
+        element.clear()
+        element.send_keys(value or "")
+
+    def _do_click(self, target: str, value: Optional[str]) -> None:
+        self._find(target, visible=True).click()
+
+    def _do_select(self, target: str, value: Optional[str]) -> None:
+        element = self._find(target, visible=True)
+        for option in element.find_elements(CSS_SELECTOR, "option"):
+            if option.text.strip() == (value or ""):
+                option.click()
+                return
+        raise StepError(f"選択肢が見つかりません: {target} = {value}")
+
+    def _do_wait(self, target: str, value: Optional[str]) -> None:
+        self._find(target, visible=True)
+
+    def _do_assert_text(self, target: str, value: Optional[str]) -> None:
+        element = self._find(target)
+        expected = value or ""
+        self._wait_until(lambda: expected in element.text,
+                         f"文字列が一致しません: {target}（期待: {expected} / 実際: {element.text}）")
+
+    def _do_assert_title(self, target: str, value: Optional[str]) -> None:
+        self._wait_until(lambda: target in self.driver.title,
+                         f"タイトルが一致しません（期待: {target} / 実際: {self.driver.title}）")
+
+    def _do_assert_url(self, target: str, value: Optional[str]) -> None:
+        self._wait_until(lambda: target in self.driver.current_url,
+                         f"URLが一致しません（期待: {target} / 実際: {self.driver.current_url}）")
+
+    def _do_assert_visible(self, target: str, value: Optional[str]) -> None:
+        self._find(target, visible=True)
+
+
+class ExecutionEngine:
+    """
+    テストケースの自動実行
+    engine = ExecutionEngine(base_url="http://localhost:8000", parallelism=4, browsers=(CHROME, FIREFOX))
+    results = engine.run([test_case_id, ...])
+    ・parallelism: 同時に実行するテストケース数（＝起動するブラウザ数）
+    ・driver_factory: ブラウザ名を受け取ってドライバを返す関数（既定は create_driver）
+    ・max_uses / max_memory_growth_mb: ブラウザを起動し直す使用回数・メモリ増加量（core.driver_pool）
+    ・pool: 起動済みの DriverPool を渡すと run ごとに起動・終了せずにそれを使う（終了は呼び出し元で行う）
+    ・record_history: 実行履歴（core.run_history）を残すか
+    ・screenshots: 手順の後にスクリーンショットを撮るか（SCREENSHOTS_OFF / FAILURES / ALL）
+      保存は core.screenshot のワーカーで行う（screenshot_pipeline を渡すとそれを使い、終了は呼び出し元で行う）
+    ・on_case_done: テストケースごとの結果を受け取る関数（ワーカースレッドから呼ばれる）
+    戻り値はテストケースごとの結果
+    {"test_case_id", "result", "browser", "started_at", "finished_at", "duration", "error", "items"}
+    （result: 成功/失敗、手順のあるテスト項目がない場合は None。
+      items: [{"test_item_id", "result", "message", "duration", "steps": [手順ごとの記録, ...]}, ...]）
+    ブラウザを1つも起動できない場合、run は RuntimeError
+    """
+    def __init__(self, base_url: str = "", browsers: Sequence[str] = (CHROME,), parallelism: int = 2,
+                 driver_factory: Optional[DriverFactory] = None, headless: bool = True,
+                 step_timeout: float = DEFAULT_STEP_TIMEOUT, max_uses: int = DEFAULT_MAX_USES,
+                 max_memory_growth_mb: Optional[float] = DEFAULT_MAX_MEMORY_GROWTH_MB,
+                 pool: Optional[DriverPool] = None, record_history: bool = True,
+                 screenshots: str = SCREENSHOTS_OFF, screenshot_pipeline: Optional[ScreenshotPipeline] = None):
+        if parallelism < 1:
+            raise ValueError("parallelismは1以上である必要があります")
+        if not browsers:
+            raise ValueError("browsersを1つ以上指定してください")
+        if screenshots not in (SCREENSHOTS_OFF, SCREENSHOTS_FAILURES, SCREENSHOTS_ALL):
+            raise ValueError(f"不明なscreenshotsです: {screenshots}")
+        self.base_url = base_url
+        self.browsers = tuple(browsers)
+        self.parallelism = parallelism
+        self.step_timeout = step_timeout
+        self.max_uses = max_uses
+        self.max_memory_growth_mb = max_memory_growth_mb
+        self._driver_factory = driver_factory or (lambda browser: create_driver(browser, headless))
+        self._pool = pool
+        self._stop = threading.Event()
+        self.record_history = record_history
+        self._history: Optional[run_history.RunHistoryWriter] = None
+        self.screenshots = screenshots
+        self._screenshot_pipeline = screenshot_pipeline
+        self._screenshots: Optional[ScreenshotPipeline] = None
+        # 直近の run の実行履歴のID・ブラウザごとの実績（DriverPool.stats()）
+        self.last_run_id: Optional[int] = None
+        self.driver_stats: List[Dict[str, Any]] = []
+
+    def stop(self) -> None:
+        """実行中の run を止める（実行中のテスト項目が終わった時点で以降を実行しない）"""
+        self._stop.set()
+
+    def run(self, test_case_ids: Sequence[int],
+            on_case_done: Optional[Callable[[Dict[str, Any]], None]] = None,
+            durations: Optional[Dict[int, float]] = None) -> List[Dict[str, Any]]:
+        """
+        テストケースを並列に実行し、結果をDBに書き戻して返す（test_case_ids の順）
+        実行順・ワーカーへの割り当ては core.run_scheduler で決める
+        （durations: テストケースID → 見込み秒数。省略すると実行履歴の直近の所要時間を使う）
+        """
+        self._stop.clear()
+        cases = self._load_cases(test_case_ids)
+        start = time.perf_counter()
+        executable = [case_id for case_id, items in cases.items() if any(steps for _, steps in items)]
+        shards = run_scheduler.plan_shards(run_scheduler.load_cases(executable, durations), self.parallelism)
+        if shards:
+            longest = max(shard["expected_seconds"] for shard in shards)
+            total = sum(shard["expected_seconds"] for shard in shards)
+            print(f"[LOG] 実行計画: シャード{len(shards)}件 見込み{longest:.0f}s（合計{total:.0f}s）")
+        pool = self._pool
+        if pool is None and shards:
+            pool = DriverPool(self._driver_factory, self.browsers, len(shards),
+                              max_uses=self.max_uses, max_memory_growth_mb=self.max_memory_growth_mb)
+        results: Dict[int, Dict[str, Any]] = {}
+        self._history = run_history.RunHistoryWriter() if self.record_history else None
+        self.last_run_id = None
+        if self._history is not None:
+            self.last_run_id = self._history.start_run(len(shards), self.browsers, len(cases))
+        self._screenshots = None
+        if self.screenshots != SCREENSHOTS_OFF and shards:
+            self._screenshots = self._screenshot_pipeline or ScreenshotPipeline()
+        status = run_history.RUN_COMPLETED
+        try:
+            if pool is not None:
+                pool.start()
+            with ThreadPoolExecutor(max_workers=max(len(shards), 1), thread_name_prefix="exec") as executor:
+                futures = [executor.submit(self._run_shard, pool, [case["test_case_id"] for case in shard["cases"]],
+                                           cases, on_case_done)
+                           for shard in shards]
+                for future in futures:
+                    results.update((r["test_case_id"], r) for r in future.result())
+            # 手順のないテストケースは実行せずに結果なしで返す
+            for case_id in cases:
+                if case_id not in results:
+                    results[case_id] = self._finish_case(self._run_case(None, case_id, [])[0], on_case_done)
+        except BaseException:
+            status = run_history.RUN_ERROR
+            raise
+        finally:
+            if pool is not None:
+                self.driver_stats = pool.stats()
+                pool.log_stats()
+                if pool is not self._pool:
+                    pool.close()
+            if self._screenshots is not None:
+                if self._screenshots is not self._screenshot_pipeline:
+                    self._screenshots.close()
+                self._screenshots = None
+            if self._history is not None:
+                if self._stop.is_set() and status == run_history.RUN_COMPLETED:
+                    status = run_history.RUN_STOPPED
+                self._history.finish_run(self.last_run_id, status)
+                self._history = None
+        ordered = [results[case_id] for case_id in cases]
+        failed = sum(1 for r in ordered if r["result"] == RESULT_FAILURE)
+        print(f"[LOG] 自動実行: テストケース{len(ordered)}件（失敗{failed}件） 並列数{len(shards)} "
+              f"({time.perf_counter() - start:.1f}s)")
+        return ordered
+
+    @staticmethod
+    def _load_cases(test_case_ids: Sequence[int]) -> Dict[int, List[Tuple[int, List[Step]]]]:
+        """テストケースID → [(テスト項目ID, 手順), ...]（id順）"""
+        cases: Dict[int, List[Tuple[int, List[Step]]]] = {cid: [] for cid in test_case_ids}
+        ids = list(cases)
+        conn = scenario_db.get_connection()
+        for i in range(0, len(ids), run_scheduler.QUERY_CHUNK):
+            chunk = ids[i:i + run_scheduler.QUERY_CHUNK]
+            rows = conn.execute(f"""
+                SELECT id, test_case_id, operation, expected, input_data FROM test_items
+                WHERE test_case_id IN ({",".join("?" * len(chunk))}) ORDER BY id
+            """, chunk).fetchall()
+            for item_id, case_id, operation, expected, input_data in rows:
+                steps = parse_steps(operation, input_data) + parse_steps(expected, input_data)
+                cases[case_id].append((item_id, steps))
+        return cases
+
+    def _run_shard(self, pool: DriverPool, case_ids: List[int], cases: Dict[int, List[Tuple[int, List[Step]]]],
+                   on_case_done: Optional[Callable[[Dict[str, Any]], None]]) -> List[Dict[str, Any]]:
+        """
+        1ワーカーの担当分を順に実行する
+        同じ画面のテストケースが続くため、ブラウザは借りたまま renew で初期化して使い続ける
+        """
+        results = []
+        slot = None
+        try:
+            for case_id in case_ids:
+                error = None
+                if slot is None and not self._stop.is_set():
+                    try:
+                        slot = pool.acquire()
+                    except Exception as e:
+                        error = f"ブラウザを使用できません: {e}"
+                        print(f"[WARN] テストケース{case_id}: {error}")
+                result, broken = self._run_case(slot, case_id, cases[case_id])
+                if error is not None:
+                    result["error"] = error
+                # 次のテストケースのために初期化（起動し直せなかった場合は次で別のブラウザを借りる）
+                if slot is not None and not pool.renew(slot, discard=broken):
+                    slot = None
+                results.append(self._finish_case(result, on_case_done))
+        finally:
+            if slot is not None:
+                pool.release(slot, renew=False)
+        return results
+
+    def _run_case(self, slot: Any, case_id: int,
+                  items: List[Tuple[int, List[Step]]]) -> Tuple[Dict[str, Any], bool]:
+        """
+        テストケース1件を実行し、(結果, ブラウザ側のエラーが出たか) を返す
+        slot が None（ブラウザがない）場合・止められた場合は実行しない
+        """
+        result: Dict[str, Any] = {"test_case_id": case_id, "result": None, "browser": None, "started_at": None,
+                                  "finished_at": None, "duration": 0.0, "error": None, "items": []}
+        executable = [(item_id, steps) for item_id, steps in items if steps]
+        broken = False
+        if slot is not None and executable and not self._stop.is_set():
+            start = time.perf_counter()
+            result["browser"] = slot.browser
+            result["started_at"] = run_history.now_text()
+            runner = StepRunner(slot.driver, self.base_url, self.step_timeout)
+            for item_id, steps in executable:
+                if self._stop.is_set():
+                    break
+                item_result, item_broken = self._run_item(runner, case_id, item_id, steps)
+                result["items"].append(item_result)
+                broken = broken or item_broken
+            result["finished_at"] = run_history.now_text()
+            result["duration"] = time.perf_counter() - start
+        return result, broken
+
+    def _finish_case(self, result: Dict[str, Any],
+                     on_case_done: Optional[Callable[[Dict[str, Any]], None]]) -> Dict[str, Any]:
+        """実行した項目があれば結果を書き戻して履歴に積み、on_case_done に渡す"""
+        if result["items"]:
+            failed = any(item["result"] == RESULT_FAILURE for item in result["items"])
+            result["result"] = RESULT_FAILURE if failed else RESULT_SUCCESS
+            _write_case_result(result)
+        if self._history is not None and (result["items"] or result["error"]):
+            self._history.add_case(self.last_run_id, result)
+        if on_case_done is not None:
+            on_case_done(result)
+        return result
+
+    def _run_item(self, runner: StepRunner, case_id: int, item_id: int,
+                  steps: List[Step]) -> Tuple[Dict[str, Any], bool]:
+        """
+        テスト項目の手順を実行し、(結果, ブラウザ側のエラーが出たか) を返す
+        失敗した手順で止め、そこまでの手順ごとの開始/終了/所要時間を steps に残す
+        （スクリーンショットは手順の所要時間に含めない）
+        """
+        start = time.perf_counter()
+        message = None
+        broken = False
+        records = []
+        for action, target, value in steps:
+            record = {"action": action, "target": target, "started_at": run_history.now_text(),
+                      "result": RESULT_SUCCESS, "message": None}
+            step_start = time.perf_counter()
+            try:
+                runner.run((action, target, value))
+            except StepError as e:
+                message = str(e)
+            except Exception as e:
+                # ブラウザ側のエラー（ページ遷移の失敗など）も項目の失敗として扱う
+                message = f"{type(e).__name__}: {e}"
+                broken = True
+            record["finished_at"] = run_history.now_text()
+            record["duration"] = time.perf_counter() - step_start
+            records.append(record)
+            if message is not None:
+                record["result"] = RESULT_FAILURE
+                record["message"] = message
+            if self.screenshots == SCREENSHOTS_ALL or (self.screenshots == SCREENSHOTS_FAILURES and message):
+                self._capture(runner.driver, case_id, item_id, len(records))
+            if message is not None:
+                break
+        return {
+            "test_item_id": item_id,
+            "result": RESULT_SUCCESS if message is None else RESULT_FAILURE,
+            "message": message,
+            "duration": time.perf_counter() - start,
+            "steps": records,
+        }, broken
+
+    def _capture(self, driver: Any, case_id: int, item_id: int, step_no: int) -> None:
+        """画面のPNGを取得して保存待ちに積む（縮小・保存はスクリーンショットのワーカーが行う）"""
+        if self._screenshots is None:
+            return
+        try:
+            png = driver.get_screenshot_as_png()
+        except Exception as e:
+            print(f"[WARN] スクリーンショットを取得できません（テスト項目{item_id} 手順{step_no}）: {e}")
+            return
+        self._screenshots.submit(png, self.last_run_id, case_id, item_id, step_no)
+
+
+def _write_case_result(result: Dict[str, Any]) -> None:
+    """テストケース1件分の結果を書き戻す（呼び出し元スレッドのコネクションで1トランザクション）"""
+    now = datetime.datetime.now()
+    exec_date = now.strftime("%Y-%m-%d")
+    with scenario_db.transaction(immediate=True) as cur:
+        cur.executemany(
+            "UPDATE test_items SET result = ?, exec_date = ? WHERE id = ?",
+            [(item["result"], exec_date, item["test_item_id"]) for item in result["items"]],
+        )
+        cur.execute(
+            "UPDATE test_cases SET status = ?, last_run = ?, result = ? WHERE id = ?",
+            (CASE_EXECUTED_STATUS, now.strftime("%Y-%m-%d %H:%M:%S"), result["result"], result["test_case_id"]),
+        )
@@ -0,0 +1,268 @@
+"""
+プロジェクト・画面・テストケースの階層ストア
+階層全体（テスト項目を除く）をメモリ上に1つだけ保持して各画面で共有し、
+変更は「どの階層の、どのIDが、どの親の下で追加・削除されたか」の単位で購読者に通知する
+（各画面は通知された差分だけを表示に反映し、一覧全体を読み直さない）
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from core import scenario_db
+
+# 階層
+PROJECT = "project"
+SCREEN = "screen"
+CASE = "case"
+ITEM = "item"
+# 変更の種類
+# CHANGED: 配下のテスト項目がまとめて変わったテストケース（level=CASE、ids=テストケースID）
+# RESET: 一括インポートなどで階層全体を読み直した
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+RESET = "reset"
+
+Listener = Callable[["ChangeEvent"], None]
+
+
+class ChangeEvent:
+    """
+    階層の変更通知
+    kind: ADDED / REMOVED / CHANGED / RESET
+    level: PROJECT / SCREEN / CASE / ITEM（RESET の場合は None）
+    ids: 対象のID（削除は複数まとめて通知する）
+    parent_id: 親のID（プロジェクトの場合は None）
+    name: 追加時の名前
+    """
+    __slots__ = ("kind", "level", "ids", "parent_id", "name")
+
+    def __init__(self, kind: str, level: Optional[str] = None, ids: Sequence[int] = (),
+                 parent_id: Optional[int] = None, name: Optional[str] = None):
+        self.kind = kind
+        self.level = level
+        self.ids = tuple(ids)
+        self.parent_id = parent_id
+        self.name = name
+
+    def __repr__(self) -> str:
+        return (f"ChangeEvent({self.kind}, {self.level}, ids={self.ids}, "
+                f"parent_id={self.parent_id}, name={self.name!r})")
+
+
+class HierarchyStore:
+    """
+    階層ストア
+    ・読み込み: 初回アクセス時にプロジェクト・画面・テストケースを一括で読み込む（以降はDBに問い合わせない）
+    ・変更: add_* でDBに追加するか、他で変更したら notify_* / reload で知らせる
+    ・購読: subscribe(callback) で ChangeEvent を受け取る（変更を行ったスレッドで呼ばれる）
+    取得した一覧は呼び出し元で自由に変更してよい（コピーを返す）
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._db_path: Optional[str] = None
+        self._projects: List[Tuple[int, str]] = []
+        # 親ID → [(id, name), ...]（id順）
+        self._screens: Dict[int, List[Tuple[int, str]]] = {}
+        self._cases: Dict[int, List[Tuple[int, str]]] = {}
+        # 子ID → 親ID
+        self._screen_project: Dict[int, int] = {}
+        self._case_screen: Dict[int, int] = {}
+        self._listeners: List[Listener] = []
+
+    # ------------------------------ 読み込み ------------------------------
+    def load(self) -> None:
+        """DBから階層全体を読み込み直す（通知はしない）"""
+        start = time.perf_counter()
+        conn = scenario_db.get_connection()
+        projects = conn.execute("SELECT id, name FROM projects ORDER BY id").fetchall()
+        screen_rows = conn.execute("SELECT id, project_id, name FROM screens ORDER BY id").fetchall()
+        case_rows = conn.execute("SELECT id, screen_id, name FROM test_cases ORDER BY id").fetchall()
+        screens: Dict[int, List[Tuple[int, str]]] = {}
+        cases: Dict[int, List[Tuple[int, str]]] = {}
+        for sid, pid, name in screen_rows:
+            screens.setdefault(pid, []).append((sid, name))
+        for cid, sid, name in case_rows:
+            cases.setdefault(sid, []).append((cid, name))
+        with self._lock:
+            self._db_path = scenario_db.DB_PATH
+            self._projects = projects
+            self._screens = screens
+            self._cases = cases
+            self._screen_project = {sid: pid for sid, pid, _ in screen_rows}
+            self._case_screen = {cid: sid for cid, sid, _ in case_rows}
+        print(f"[LOG] 階層ストア読み込み: プロジェクト{len(projects)}件 画面{len(screen_rows)}件 "
+              f"テストケース{len(case_rows)}件 ({(time.perf_counter() - start) * 1000:.1f}ms)")
+
+    def _ensure_loaded(self) -> None:
+        with self._lock:
+            if self._db_path == scenario_db.DB_PATH:
+                return
+            self.load()
+
+    def get_projects(self) -> List[Tuple[int, str]]:
+        """プロジェクト一覧 [(id, name), ...]（id順）"""
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._projects)
+
+    def get_screens(self, project_id: Optional[int]) -> List[Tuple[int, str]]:
+        """プロジェクト配下の画面一覧 [(id, name), ...]（id順）"""
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._screens.get(project_id, ()))
+
+    def get_test_cases(self, screen_id: Optional[int]) -> List[Tuple[int, str]]:
+        """画面配下のテストケース一覧 [(id, name), ...]（id順）"""
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._cases.get(screen_id, ()))
+
+    def get_parent_id(self, level: str, entry_id: int) -> Optional[int]:
+        """画面の親プロジェクトID・テストケースの親画面ID"""
+        self._ensure_loaded()
+        with self._lock:
+            if level == SCREEN:
+                return self._screen_project.get(entry_id)
+            if level == CASE:
+                return self._case_screen.get(entry_id)
+            return None
+
+    # ------------------------------ 購読 ------------------------------
+    def subscribe(self, listener: Listener) -> Callable[[], None]:
+        """変更通知の購読を開始し、購読解除用の関数を返す"""
+        with self._lock:
+            self._listeners.append(listener)
+
+        def unsubscribe():
+            with self._lock:
+                if listener in self._listeners:
+                    self._listeners.remove(listener)
+        return unsubscribe
+
+    def _publish(self, event: ChangeEvent) -> None:
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                # 1つの購読者の失敗で他の画面への通知を止めない
+                print(f"[WARN] 変更通知の処理に失敗しました: {event} ({e})")
+
+    # ------------------------------ 追加 ------------------------------
+    def add_project(self, name: str) -> int:
+        """プロジェクトを追加（同名がある場合は sqlite3.IntegrityError）"""
+        with scenario_db.transaction() as cur:
+            cur.execute("INSERT INTO projects (name) VALUES (?)", (name,))
+            project_id = cur.lastrowid
+        self.notify_added(PROJECT, project_id, None, name)
+        return project_id
+
+    def add_screen(self, project_id: int, name: str) -> int:
+        """画面を追加"""
+        with scenario_db.transaction() as cur:
+            cur.execute("INSERT INTO screens (project_id, name) VALUES (?, ?)", (project_id, name))
+            screen_id = cur.lastrowid
+        self.notify_added(SCREEN, screen_id, project_id, name)
+        return screen_id
+
+    def add_test_case(self, screen_id: int, name: str) -> int:
+        """テストケースを追加"""
+        with scenario_db.transaction() as cur:
+            cur.execute("INSERT INTO test_cases (screen_id, name) VALUES (?, ?)", (screen_id, name))
+            case_id = cur.lastrowid
+        self.notify_added(CASE, case_id, screen_id, name)
+        return case_id
+
+    def add_test_item(self, test_case_id: int, name: str) -> int:
+        """テスト項目を追加（名前のみ。詳細付きの登録は呼び出し元で行い notify_added で通知する）"""
+        with scenario_db.transaction() as cur:
+            cur.execute("INSERT INTO test_items (test_case_id, name) VALUES (?, ?)", (test_case_id, name))
+            item_id = cur.lastrowid
+        self.notify_added(ITEM, item_id, test_case_id, name)
+        return item_id
+
+    # ------------------------------ 変更の反映 ------------------------------
+    def notify_added(self, level: str, entry_id: int, parent_id: Optional[int], name: str) -> None:
+        """DBに追加済みの要素をストアに反映して通知する"""
+        self._ensure_loaded()
+        with self._lock:
+            if level == PROJECT:
+                _insert_sorted(self._projects, entry_id, name)
+            elif level == SCREEN:
+                _insert_sorted(self._screens.setdefault(parent_id, []), entry_id, name)
+                self._screen_project[entry_id] = parent_id
+            elif level == CASE:
+                _insert_sorted(self._cases.setdefault(parent_id, []), entry_id, name)
+                self._case_screen[entry_id] = parent_id
+        self._publish(ChangeEvent(ADDED, level, (entry_id,), parent_id, name))
+
+    def notify_removed(self, level: str, ids: Sequence[int], parent_id: Optional[int] = None) -> None:
+        """
+        DBから削除済みの要素をストアから除いて通知する（配下の要素もストアから除く）
+        parent_id: 全要素が同じ親の下にある場合はその親のID（通知にそのまま載せる）
+        """
+        if not ids:
+            return
+        self._ensure_loaded()
+        removed = set(ids)
+        with self._lock:
+            if level == PROJECT:
+                self._projects = [p for p in self._projects if p[0] not in removed]
+                for pid in removed:
+                    self._drop_screens([sid for sid, _ in self._screens.pop(pid, ())])
+            elif level == SCREEN:
+                self._drop_screens(removed)
+            elif level == CASE:
+                self._drop_cases(removed)
+        self._publish(ChangeEvent(REMOVED, level, ids, parent_id))
+
+    def notify_items_changed(self, test_case_ids: Sequence[int]) -> None:
+        """
+        テストケース配下のテスト項目をまとめて変更した場合の通知（テスト項目はストアに持たない）
+        """
+        if test_case_ids:
+            self._publish(ChangeEvent(CHANGED, CASE, test_case_ids))
+
+    def reload(self) -> None:
+        """階層全体を読み直して RESET を通知する（一括インポート後など）"""
+        self.load()
+        self._publish(ChangeEvent(RESET))
+
+    def _drop_screens(self, screen_ids) -> None:
+        for sid in screen_ids:
+            pid = self._screen_project.pop(sid, None)
+            if pid in self._screens:
+                self._screens[pid] = [s for s in self._screens[pid] if s[0] != sid]
+            self._drop_cases([cid for cid, _ in self._cases.pop(sid, ())])
+
+    def _drop_cases(self, case_ids) -> None:
+        for cid in case_ids:
+            sid = self._case_screen.pop(cid, None)
+            if sid in self._cases:
+                self._cases[sid] = [c for c in self._cases[sid] if c[0] != cid]
+
+
+def _insert_sorted(entries: List[Tuple[int, str]], entry_id: int, name: str) -> None:
+    """id順の一覧に追加（同じidがあれば名前を置き換える）"""
+    pos = bisect.bisect_left(entries, (entry_id,))
+    if pos < len(entries) and entries[pos][0] == entry_id:
+        entries[pos] = (entry_id, name)
+    else:
+        entries.insert(pos, (entry_id, name))
+
+
+_store: Optional[HierarchyStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> HierarchyStore:
+    """アプリ全体で共有する階層ストア"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = HierarchyStore()
+    return _store
@@ -0,0 +1,78 @@
+"""
+インクリメンタル検索（入力中の絞り込み）
+DBで検索した結果を「基準結果」として保持し、キーワードが基準キーワードを含む間は
+DBに問い合わせずメモリ上で絞り込む（部分一致なので、長いキーワードの結果は必ず基準結果に含まれる）
+"""
+import threading
+from typing import List, Optional, Tuple
+
+from core import scenario_db
+
+# 一致判定に使う列（search_test_items(include_details=True) の並び）
+# プロジェクト名, 画面名, テストケース名, テスト項目名, 担当者, 入力データ, 操作手順, 期待結果, 備考
+SEARCH_TEXT_COLUMNS = (0, 1, 2, 3, 5, 7, 8, 9, 10)
+# 列をまたいだ一致を防ぐための区切り文字
+_SEPARATOR = "\n"
+
+
+def fetch_search_base(keyword: str, project_id: Optional[int] = None) -> Tuple[List[Tuple], List[str]]:
+    """
+    キーワードでDBを検索し、(一覧表示用の行, 行ごとの一致判定用テキスト) を返す
+    一覧表示用の行は get_test_item_list と同じ並び（ワーカースレッドから呼ぶ想定）
+    """
+    rows = scenario_db.search_test_items(keyword, project_id, limit=None, include_details=True)
+    texts = [
+        _SEPARATOR.join("" if row[i] is None else str(row[i]) for i in SEARCH_TEXT_COLUMNS).lower()
+        for row in rows
+    ]
+    return [row[:7] for row in rows], texts
+
+
+class IncrementalSearch:
+    """
+    基準結果からの絞り込み
+    refine() は基準結果の行ごとに一致するかどうかのマスク（bytearray）を返し、
+    基準結果から絞り込めない場合（DB検索が必要な場合）は None を返す
+    直前の絞り込み結果を含むキーワードなら、直前の結果をさらに絞り込む
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._project_id: Optional[int] = None
+        self._keyword = ""
+        self._texts: List[str] = []
+        self._last_keyword = ""
+        self._last_mask: Optional[bytearray] = None
+
+    def set_base(self, project_id: Optional[int], keyword: str, texts: List[str]) -> None:
+        """DB検索の結果を基準結果として登録"""
+        with self._lock:
+            self._project_id = project_id
+            self._keyword = keyword.strip().lower()
+            self._texts = texts
+            self._last_keyword = self._keyword
+            self._last_mask = None
+
+    def clear(self) -> None:
+        """基準結果を破棄"""
+        self.set_base(None, "", [])
+
+    def can_refine(self, project_id: Optional[int], keyword: str) -> bool:
+        keyword = keyword.strip().lower()
+        return bool(self._keyword) and project_id == self._project_id and self._keyword in keyword
+
+    def refine(self, project_id: Optional[int], keyword: str) -> Optional[bytearray]:
+        """キーワードに一致する基準結果の行のマスク（絞り込めない場合はNone）"""
+        with self._lock:
+            if not self.can_refine(project_id, keyword):
+                return None
+            keyword = keyword.strip().lower()
+            texts = self._texts
+            if keyword == self._keyword:
+                mask = bytearray(b"\x01" * len(texts))
+            elif self._last_mask is not None and self._last_keyword in keyword:
+                mask = bytearray(m and keyword in t for m, t in zip(self._last_mask, texts))
+            else:
+                mask = bytearray(keyword in t for t in texts)
+            self._last_keyword = keyword
+            self._last_mask = mask
+            return mask
@@ -0,0 +1,218 @@
+"""
+自動実行の履歴（test_runs / test_run_cases / test_run_steps）
+test_items.result / exec_date は最新の結果で上書きされるため、実行ごとの結果と
+テストケース・手順ごとの開始/終了/所要時間はここに追記だけで残す
+
+書き込みは RunHistoryWriter が専用スレッドでまとめて行う（実行中のワーカーはキューに積むだけ）
+writer = RunHistoryWriter()
+run_id = writer.start_run(parallelism=4, browsers=("chrome",), case_count=100)
+writer.add_case(run_id, case_result)   # ExecutionEngine のテストケースごとの結果
+writer.finish_run(run_id)
+"""
+import datetime
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from core import scenario_db
+
+# 実行のステータス
+RUN_RUNNING = "実行中"
+RUN_COMPLETED = "完了"
+RUN_STOPPED = "中断"
+RUN_ERROR = "エラー"
+# 1回の書き込みトランザクションにまとめるテストケース数・待つ時間（秒）
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 1.0
+# 見込み時間に使う直近の実行回数
+DURATION_SAMPLES = 3
+# IN (...) に渡すIDの1回あたりの件数
+QUERY_CHUNK = 900
+
+# キューの終端
+_STOP = object()
+
+
+def now_text() -> str:
+    """履歴に記録する日時（ミリ秒まで）"""
+    return datetime.datetime.now().isoformat(sep=" ", timespec="milliseconds")
+
+
+class RunHistoryWriter:
+    """
+    実行履歴の追記
+    add_case はワーカースレッドから呼んでよい（キューに積むだけで、書き込みは専用スレッドが
+    batch_size 件たまるか flush_interval 秒たった時点でまとめて1トランザクションで行う）
+    書き込みに失敗しても実行は止めない（[WARN] を出してそのバッチを捨てる）
+    """
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        # 書き込んだテストケース・手順の件数
+        self.written_cases = 0
+        self.written_steps = 0
+
+    def start_run(self, parallelism: int, browsers: Sequence[str], case_count: int) -> int:
+        """実行を記録して run_id を返し、書き込みスレッドを開始する"""
+        with scenario_db.transaction(immediate=True) as cur:
+            cur.execute("""
+                INSERT INTO test_runs (started_at, status, parallelism, browsers, case_count)
+                VALUES (?, ?, ?, ?, ?)
+            """, (now_text(), RUN_RUNNING, parallelism, ",".join(browsers), case_count))
+            run_id = cur.lastrowid
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="run-history", daemon=True)
+            self._thread.start()
+        return run_id
+
+    def add_case(self, run_id: int, result: Dict[str, Any]) -> None:
+        """テストケース1件分の結果を書き込み待ちに積む"""
+        self._queue.put((run_id, result))
+
+    def finish_run(self, run_id: int, status: str = RUN_COMPLETED) -> None:
+        """書き込み待ちをすべて書き込んでから、実行の終了日時・所要時間・失敗数を記録する"""
+        self.close()
+        finished = now_text()
+        with scenario_db.transaction(immediate=True) as cur:
+            started = cur.execute("SELECT started_at FROM test_runs WHERE id = ?", (run_id,)).fetchone()
+            duration = None
+            if started:
+                duration = (datetime.datetime.fromisoformat(finished)
+                            - datetime.datetime.fromisoformat(started[0])).total_seconds()
+            cur.execute("""
+                UPDATE test_runs SET finished_at = ?, duration = ?, status = ?,
+                    failed_count = (SELECT COUNT(*) FROM test_run_cases WHERE run_id = ? AND result = ?)
+                WHERE id = ?
+            """, (finished, duration, status, run_id, scenario_db.FAILED_RESULT, run_id))
+
+    def close(self) -> None:
+        """書き込み待ちをすべて書き込んで書き込みスレッドを終える"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def _loop(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = []
+            entry = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    entry = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: List[Tuple[int, Dict[str, Any]]]) -> None:
+        start = time.perf_counter()
+        steps = []
+        try:
+            with scenario_db.transaction(immediate=True) as cur:
+                for run_id, result in batch:
+                    cur.execute("""
+                        INSERT INTO test_run_cases
+                            (run_id, test_case_id, browser, started_at, finished_at, duration, result, error)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """, (run_id, result["test_case_id"], result.get("browser"), result.get("started_at"),
+                          result.get("finished_at"), result.get("duration"), result.get("result"),
+                          result.get("error")))
+                    run_case_id = cur.lastrowid
+                    for item in result.get("items", []):
+                        for step_no, step in enumerate(item.get("steps", []), start=1):
+                            steps.append((run_id, run_case_id, item["test_item_id"], step_no, step["action"],
+                                          step["target"], step["started_at"], step["finished_at"],
+                                          step["duration"], step["result"], step["message"]))
+                cur.executemany("""
+                    INSERT INTO test_run_steps (run_id, run_case_id, test_item_id, step_no, action, target,
+                        started_at, finished_at, duration, result, message)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, steps)
+        except Exception as e:
+            print(f"[WARN] 実行履歴の書き込みに失敗しました（テストケース{len(batch)}件）: {e}")
+            return
+        self.written_cases += len(batch)
+        self.written_steps += len(steps)
+        print(f"[LOG] 実行履歴書き込み: テストケース{len(batch)}件 手順{len(steps)}件 "
+              f"({(time.perf_counter() - start) * 1000:.1f}ms)")
+
+
+# ------------------------------ 参照 ------------------------------
+def get_runs(limit: int = 50) -> List[Tuple]:
+    """
+    新しい順の実行一覧
+    [(id, started_at, finished_at, duration, status, parallelism, browsers, case_count, failed_count), ...]
+    """
+    return scenario_db.get_connection().execute("""
+        SELECT id, started_at, finished_at, duration, status, parallelism, browsers, case_count, failed_count
+        FROM test_runs ORDER BY id DESC LIMIT ?
+    """, (limit,)).fetchall()
+
+
+def get_run_cases(run_id: int) -> List[Tuple]:
+    """
+    実行のテストケースごとの結果（idx_test_run_cases_run を使い、他の実行は読まない）
+    [(id, test_case_id, browser, started_at, finished_at, duration, result, error), ...]
+    """
+    return scenario_db.get_connection().execute("""
+        SELECT id, test_case_id, browser, started_at, finished_at, duration, result, error
+        FROM test_run_cases WHERE run_id = ? ORDER BY id
+    """, (run_id,)).fetchall()
+
+
+def get_run_steps(run_id: int, run_case_id: Optional[int] = None) -> List[Tuple]:
+    """
+    実行の手順ごとの記録（idx_test_run_steps_run を使い、他の実行は読まない）
+    [(run_case_id, test_item_id, step_no, action, target, started_at, finished_at, duration, result, message), ...]
+    """
+    sql = """
+        SELECT run_case_id, test_item_id, step_no, action, target, started_at, finished_at, duration, result, message
+        FROM test_run_steps WHERE run_id = ?
+    """
+    params: Tuple = (run_id,)
+    if run_case_id is not None:
+        sql += " AND run_case_id = ?"
+        params = (run_id, run_case_id)
+    return scenario_db.get_connection().execute(sql + " ORDER BY run_case_id, id", params).fetchall()
+
+
+def get_slowest_steps(run_id: int, limit: int = 20) -> List[Tuple]:
+    """実行の中で時間のかかった手順 [(test_item_id, action, target, duration, result), ...]"""
+    return scenario_db.get_connection().execute("""
+        SELECT test_item_id, action, target, duration, result
+        FROM test_run_steps WHERE run_id = ? ORDER BY duration DESC LIMIT ?
+    """, (run_id, limit)).fetchall()
+
+
+def get_case_durations(test_case_ids: Sequence[int], samples: int = DURATION_SAMPLES) -> Dict[int, float]:
+    """
+    テストケースごとの見込み時間（直近 samples 回の実行の所要時間の平均、秒）
+    実行したことのないテストケースは含まない（run_scheduler の durations に渡す）
+    """
+    durations: Dict[int, float] = {}
+    ids = list(dict.fromkeys(test_case_ids))
+    conn = scenario_db.get_connection()
+    for i in range(0, len(ids), QUERY_CHUNK):
+        chunk = ids[i:i + QUERY_CHUNK]
+        rows = conn.execute(f"""
+            SELECT test_case_id, AVG(duration) FROM (
+                SELECT test_case_id, duration,
+                       ROW_NUMBER() OVER (PARTITION BY test_case_id ORDER BY id DESC) AS n
+                FROM test_run_cases
+                WHERE test_case_id IN ({",".join("?" * len(chunk))}) AND result IS NOT NULL
+            ) WHERE n <= ? GROUP BY test_case_id
+        """, (*chunk, samples)).fetchall()
+        durations.update(rows)
+    return durations
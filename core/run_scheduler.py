@@ -0,0 +1,133 @@
+"""
+自動実行の実行計画
+テストケースを「前回失敗 → 未実行 → 前回成功」「優先度 高 → 中 → 低」「見込み時間の長い順」で並べ、
+ワーカー（並列数）ごとの担当（シャード）に分ける
+・同じ画面のテストケースは同じワーカーにまとめる（ブラウザのキャッシュ・画面の読み込みを使い回すため）
+・画面のまとまりを見込み時間の長い順に、その時点で合計の最も短いシャードへ割り当てる（LPT）
+  1画面の見込み時間が1ワーカーの持ち分（合計÷並列数）を超える場合だけ、その画面を持ち分ごとに区切る
+→ 全体の所要時間が「合計の見込み時間 ÷ 並列数」に近くなる
+
+見込み時間は durations（テストケースID → 秒）で渡す。省略した場合は実行履歴（core.run_history）の
+直近の所要時間を使い、履歴のないテストケースはテスト項目数 × DEFAULT_ITEM_SECONDS で見積もる
+"""
+import heapq
+from typing import Any, Dict, List, Optional, Sequence
+
+from core import run_history, scenario_db
+
+# 優先度の並び（小さいほど先）。未設定・不明は「中」扱い
+PRIORITY_RANK = {"高": 0, "中": 1, "低": 2}
+DEFAULT_PRIORITY_RANK = 1
+# 前回の結果の並び（前回失敗 → 未実行 → 前回成功）
+LAST_FAILED = 0
+LAST_NOT_RUN = 1
+LAST_PASSED = 2
+# 実績のないテストケースの見積もり（テスト項目1件あたり・テストケース1件あたりの秒数）
+DEFAULT_ITEM_SECONDS = 2.0
+DEFAULT_CASE_SECONDS = 1.0
+# IN (...) に渡すIDの1回あたりの件数
+QUERY_CHUNK = 900
+
+
+def load_cases(test_case_ids: Sequence[int], durations: Optional[Dict[int, float]] = None) -> List[Dict[str, Any]]:
+    """
+    実行計画に使うテストケースの情報（test_case_ids の順、存在しないIDは除く）
+    [{"test_case_id", "screen_id", "name", "priority", "last_result", "expected_seconds"}, ...]
+    priority: 配下のテスト項目の最も高い優先度の並び順 / last_result: LAST_FAILED / LAST_NOT_RUN / LAST_PASSED
+    """
+    if durations is None:
+        durations = run_history.get_case_durations(test_case_ids)
+    rank_sql = " ".join(f"WHEN '{name}' THEN {rank}" for name, rank in PRIORITY_RANK.items())
+    conn = scenario_db.get_connection()
+    found: Dict[int, Dict[str, Any]] = {}
+    ids = list(dict.fromkeys(test_case_ids))
+    for i in range(0, len(ids), QUERY_CHUNK):
+        chunk = ids[i:i + QUERY_CHUNK]
+        rows = conn.execute(f"""
+            SELECT tc.id, tc.screen_id, tc.name,
+                   MIN(CASE ti.priority {rank_sql} ELSE {DEFAULT_PRIORITY_RANK} END),
+                   MAX(ti.result = ?), MAX(ti.result IS NOT NULL AND ti.result <> ''), COUNT(ti.id)
+            FROM test_cases tc
+            LEFT JOIN test_items ti ON ti.test_case_id = tc.id
+            WHERE tc.id IN ({",".join("?" * len(chunk))})
+            GROUP BY tc.id
+        """, (scenario_db.FAILED_RESULT, *chunk)).fetchall()
+        for case_id, screen_id, name, priority, failed, has_result, item_count in rows:
+            if failed:
+                last_result = LAST_FAILED
+            elif has_result:
+                last_result = LAST_PASSED
+            else:
+                last_result = LAST_NOT_RUN
+            expected = durations.get(case_id)
+            if expected is None:
+                expected = DEFAULT_CASE_SECONDS + item_count * DEFAULT_ITEM_SECONDS
+            found[case_id] = {
+                "test_case_id": case_id,
+                "screen_id": screen_id,
+                "name": name,
+                "priority": DEFAULT_PRIORITY_RANK if priority is None else priority,
+                "last_result": last_result,
+                "expected_seconds": float(expected),
+            }
+    return [found[cid] for cid in ids if cid in found]
+
+
+def _queue_key(case: Dict[str, Any]):
+    return (case["last_result"], case["priority"], -case["expected_seconds"], case["test_case_id"])
+
+
+def build_queue(cases: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """テストケースを実行する順に並べる（画面はまとめず、1本の実行順）"""
+    return sorted(cases, key=_queue_key)
+
+
+def plan_shards(cases: Sequence[Dict[str, Any]], workers: int) -> List[Dict[str, Any]]:
+    """
+    テストケースをワーカーごとのシャードに分ける（空のシャードは返さない）
+    [{"cases": [テストケースの情報, ...（実行順）], "expected_seconds": 見込み時間の合計}, ...]
+    シャード内は画面のまとまりごとに、まとまりの先頭（最も先に実行したいテストケース）の順に並べる
+    """
+    if workers < 1:
+        raise ValueError("workersは1以上である必要があります")
+    groups: Dict[Any, List[Dict[str, Any]]] = {}
+    for case in build_queue(cases):
+        groups.setdefault(case["screen_id"], []).append(case)
+    total = sum(case["expected_seconds"] for case in cases)
+    share = total / workers if total > 0 else 0.0
+    # 1ワーカーの持ち分を超える画面は、実行順のまま持ち分ごとに区切る
+    units: List[List[Dict[str, Any]]] = []
+    for group in groups.values():
+        units.extend(_split(group, share) if workers > 1 else [group])
+    # LPT: 見込み時間の長いまとまりから、合計の最も短いシャードへ
+    units.sort(key=lambda unit: (-sum(c["expected_seconds"] for c in unit), _queue_key(unit[0])))
+    heap = [(0.0, shard) for shard in range(min(workers, len(units)))]
+    assigned: List[List[List[Dict[str, Any]]]] = [[] for _ in heap]
+    for unit in units:
+        seconds, shard = heapq.heappop(heap)
+        assigned[shard].append(unit)
+        heapq.heappush(heap, (seconds + sum(c["expected_seconds"] for c in unit), shard))
+    shards = []
+    for shard_units in assigned:
+        shard_units.sort(key=lambda unit: _queue_key(unit[0]))
+        shard_cases = [case for unit in shard_units for case in unit]
+        shards.append({
+            "cases": shard_cases,
+            "expected_seconds": sum(case["expected_seconds"] for case in shard_cases),
+        })
+    return shards
+
+
+def _split(group: List[Dict[str, Any]], share: float) -> List[List[Dict[str, Any]]]:
+    """画面のまとまりを、見込み時間が share を超えない範囲で区切る（1件で超える場合はその1件だけ）"""
+    if share <= 0 or sum(case["expected_seconds"] for case in group) <= share:
+        return [group]
+    parts: List[List[Dict[str, Any]]] = [[]]
+    seconds = 0.0
+    for case in group:
+        if parts[-1] and seconds + case["expected_seconds"] > share:
+            parts.append([])
+            seconds = 0.0
+        parts[-1].append(case)
+        seconds += case["expected_seconds"]
+    return parts
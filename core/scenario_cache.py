@@ -0,0 +1,177 @@
+"""
+Excel解析結果のディスクキャッシュ
+ファイル内容のハッシュ（ブック単位）とシート内容のハッシュ（シート単位）をキーに
+ScenarioLoaderの抽出結果を data/parse_cache 以下へ保存する
+"""
+import hashlib
+import os
+import pickle
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Any, List, Optional, Tuple
+
+from core import scenario_db
+
+# 抽出ロジックを変更した場合はこの値を上げて既存キャッシュを無効化する
+CACHE_FORMAT_VERSION = 1
+# キャッシュ全体の上限サイズ（超えた分は最終利用の古い順に削除）
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+# 共有文字列を参照するセルの値（<c ... t="s"><v>インデックス</v>）
+_SHARED_STRING_CELL = re.compile(rb'<c\b[^>]*?\bt="s"[^>]*>\s*<v>(\d+)</v>')
+
+
+def default_cache_dir() -> str:
+    """scenarios.db と同じ data/ ディレクトリ配下のキャッシュ置き場"""
+    return os.path.join(os.path.dirname(scenario_db.DB_PATH), "parse_cache")
+
+
+def _read_shared_strings(zf: zipfile.ZipFile) -> List[str]:
+    """共有文字列テーブルを読み込む（ふりがな rPh は openpyxl と同様に除外）"""
+    try:
+        data = zf.read("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+    strings = []
+    for si in ET.fromstring(data).iter(f"{_NS_MAIN}si"):
+        parts = []
+        for node in si.iter():
+            if node.tag == f"{_NS_MAIN}rPh":
+                break
+            if node.tag == f"{_NS_MAIN}t" and node.text:
+                parts.append(node.text)
+        strings.append("".join(parts))
+    return strings
+
+
+def _value_format_signature(zf: zipfile.ZipFile) -> bytes:
+    """
+    セル値の型（日付変換など）に影響するブック共通情報のハッシュ
+    書式のうち数値書式とセル書式の対応、1904年基準かどうかだけを対象にする
+    """
+    digest = hashlib.sha256()
+    try:
+        styles = ET.fromstring(zf.read("xl/styles.xml"))
+        num_fmts = styles.find(f"{_NS_MAIN}numFmts")
+        if num_fmts is not None:
+            for fmt in num_fmts:
+                digest.update(f"{fmt.get('numFmtId')}={fmt.get('formatCode')};".encode("utf-8"))
+        cell_xfs = styles.find(f"{_NS_MAIN}cellXfs")
+        if cell_xfs is not None:
+            digest.update(",".join(xf.get("numFmtId", "0") for xf in cell_xfs).encode("ascii"))
+    except KeyError:
+        pass
+    workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+    pr = workbook.find(f"{_NS_MAIN}workbookPr")
+    digest.update(b"1904" if pr is not None and pr.get("date1904") in ("1", "true") else b"1900")
+    return digest.digest()
+
+
+class ScenarioParseCache:
+    """
+    解析結果のディスクキャッシュ（サイズ上限付きLRU）
+    ・ブックキー: ファイル全体のハッシュ → シートキーの一覧
+    ・シートキー: シート名＋共有文字列を展開したシートXMLのハッシュ → 抽出結果
+    """
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    # ------------------------------ キー計算 ------------------------------
+    def file_key(self, path: str) -> str:
+        """ファイル内容全体のハッシュからブックキーを作る"""
+        digest = hashlib.sha256(f"v{CACHE_FORMAT_VERSION}:".encode("ascii"))
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return "wb-" + digest.hexdigest()
+
+    def sheet_keys(self, path: str, members: List[Tuple[str, str]]) -> List[str]:
+        """
+        シートごとの内容ハッシュからシートキーを作る
+        共有文字列はインデックスではなく文字列そのものをハッシュに含めるため、
+        他シートの編集で共有文字列テーブルの並びが変わってもキーは変わらない
+        """
+        keys = []
+        with zipfile.ZipFile(path) as zf:
+            shared = _read_shared_strings(zf)
+            shared_digest = hashlib.sha256("\0".join(shared).encode("utf-8")).digest()
+            common = _value_format_signature(zf)
+            for sheetname, member in members:
+                data = zf.read(member)
+                digest = hashlib.sha256(f"v{CACHE_FORMAT_VERSION}:".encode("ascii"))
+                digest.update(common)
+                digest.update(sheetname.encode("utf-8") + b"\0")
+                last = 0
+                matched = 0
+                for m in _SHARED_STRING_CELL.finditer(data):
+                    idx = int(m.group(1))
+                    digest.update(data[last:m.start(1)])
+                    digest.update(shared[idx].encode("utf-8") if idx < len(shared) else m.group(1))
+                    last = m.end(1)
+                    matched += 1
+                digest.update(data[last:])
+                # 想定外の書式で共有文字列を展開しきれない場合はテーブル全体をキーに含める
+                if matched != data.count(b't="s"'):
+                    digest.update(shared_digest)
+                keys.append("sh-" + digest.hexdigest())
+        return keys
+
+    # ------------------------------ 読み書き ------------------------------
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".pkl")
+
+    def contains(self, key: str) -> bool:
+        """キャッシュがあるか（読み込まずに確認する）"""
+        return os.path.exists(self._path(key))
+
+    def get(self, key: str) -> Optional[Any]:
+        """キャッシュを取得（ヒット時は最終利用時刻を更新）"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path, None)
+            return value
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[WARN] 解析キャッシュの読み込みに失敗しました: {key} ({e})")
+            return None
+
+    def put(self, key: str, value: Any) -> None:
+        """キャッシュを保存（一時ファイル経由で置き換え）"""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def evict(self) -> int:
+        """
+        合計サイズが上限を超えていれば、最終利用の古いものから削除する
+        戻り値: 削除したファイル数
+        """
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".pkl"):
+                    continue
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        return removed
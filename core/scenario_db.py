@@ -5,9 +5,26 @@ import sqlite3
 from typing import Optional, Dict, Any, List, Tuple
 import os
 import datetime
+import threading
+import time
+from core import db_connection
 
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'scenarios.db')
 
+
+def get_connection() -> sqlite3.Connection:
+    """
+    DB_PATHへの呼び出し元スレッド専用コネクションを返す（core.db_connectionで管理）
+    """
+    return db_connection.get_connection(DB_PATH)
+
+
+def transaction(immediate: bool = False):
+    """
+    DB_PATHのコネクションで明示的トランザクションを開始する（with文で使用）
+    """
+    return db_connection.transaction(get_connection(), immediate)
+
 # テーブル作成SQL
 CREATE_PROJECTS_TABLE = '''
 CREATE TABLE IF NOT EXISTS projects (
@@ -172,76 +189,379 @@ INITIAL_MASTER_DATA = {
     "master_reproducibilities": ["毎回発生", "条件付きで発生", "まれに発生", "再現不可"]
 }
 
+# セカンダリインデックス（結合・絞り込みに使う外部キー列）
+# bugs.project_id は UNIQUE(project_id, bug_no) の自動インデックスで賄えるため作成しない
+CREATE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_screens_project ON screens(project_id, name)",
+    "CREATE INDEX IF NOT EXISTS idx_test_cases_screen ON test_cases(screen_id, name)",
+    "CREATE INDEX IF NOT EXISTS idx_test_items_test_case ON test_items(test_case_id)",
+    "CREATE INDEX IF NOT EXISTS idx_test_items_bug ON test_items(bug_id)",
+    "CREATE INDEX IF NOT EXISTS idx_bugs_test_item ON bugs(test_item_id)",
+    "CREATE INDEX IF NOT EXISTS idx_scenarios_project ON scenarios(project_id)",
+]
+
+def _migrate_v1_base_schema(cur):
+    """
+    v1: 基本テーブル・マスターテーブル・初期マスターデータ
+    （バージョン管理導入前に作られたDBにもそのまま適用できるよう冪等にしている）
+    """
+    for table_sql in (
+        CREATE_PROJECTS_TABLE, CREATE_SCENARIOS_TABLE, CREATE_SCREENS_TABLE,
+        CREATE_TEST_CASES_TABLE, CREATE_TEST_ITEMS_TABLE, CREATE_BUGS_TABLE,
+    ):
+        cur.execute(table_sql)
+    for table_sql in CREATE_MASTER_TABLES:
+        cur.execute(table_sql)
+    for table_name, values in INITIAL_MASTER_DATA.items():
+        cur.executemany(f"INSERT OR IGNORE INTO {table_name} (name) VALUES (?)", [(v,) for v in values])
+    _migrate_test_cases_table(cur)
+
+def _migrate_v2_indexes(cur):
+    """
+    v2: 外部キー列のセカンダリインデックス
+    """
+    for index_sql in CREATE_INDEXES:
+        cur.execute(index_sql)
+
+# 全文検索インデックス（FTS5 外部コンテンツテーブル＋trigramトークナイザ）
+# trigramは3文字単位で索引するため、日本語の部分一致もそのまま検索できる
+# {テーブル名: (FTSテーブル名, 索引するカラム)}
+FTS_TABLES = {
+    "test_items": ("fts_test_items", ("name", "input_data", "operation", "expected", "remarks", "tester")),
+    "test_cases": ("fts_test_cases", ("name",)),
+    "screens": ("fts_screens", ("name",)),
+    "bugs": ("fts_bugs", ("summary", "details")),
+}
+# trigramで検索できる最短のキーワード長（これより短い場合はLIKE検索）
+FTS_MIN_KEYWORD_LENGTH = 3
+
+def _migrate_v3_fulltext_search(cur):
+    """
+    v3: 全文検索インデックスと同期用トリガー
+    FTS5（trigram）が使えないSQLiteでは作成せず、検索はLIKEで行う
+    """
+    for table, (fts_table, columns) in FTS_TABLES.items():
+        column_list = ", ".join(columns)
+        old_values = ", ".join(f"old.{c}" for c in columns)
+        new_values = ", ".join(f"new.{c}" for c in columns)
+        try:
+            cur.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+                    {column_list}, content='{table}', content_rowid='id', tokenize='trigram'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            print(f"[WARN] 全文検索インデックスを作成できません（LIKE検索で代替します）: {e}")
+            return
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values});
+            END
+        """)
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+            END
+        """)
+        # 索引対象のカラムが更新された場合だけ入れ替える（結果の記録などでは発火しない）
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {column_list} ON {table} BEGIN
+                INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values});
+            END
+        """)
+        # 既存データを索引に取り込む
+        cur.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+CREATE_BUG_SEQUENCES_TABLE = '''
+CREATE TABLE IF NOT EXISTS bug_sequences (
+    project_id INTEGER PRIMARY KEY,
+    last_no INTEGER NOT NULL,  -- 払い出し済みの最大BUG番号
+    FOREIGN KEY(project_id) REFERENCES projects(id)
+);
+'''
+
+def _migrate_v4_bug_sequences(cur):
+    """
+    v4: プロジェクトごとのBUG番号シーケンス（既存の不具合の最大番号から開始）
+    """
+    cur.execute(CREATE_BUG_SEQUENCES_TABLE)
+    cur.execute("""
+        INSERT OR IGNORE INTO bug_sequences (project_id, last_no)
+        SELECT project_id, MAX(bug_no) FROM bugs GROUP BY project_id
+    """)
+
+CREATE_RUN_HISTORY_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS test_runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        started_at TEXT NOT NULL,
+        finished_at TEXT,
+        duration REAL,             -- 秒
+        status TEXT NOT NULL,      -- 実行中/完了/中断/エラー
+        parallelism INTEGER,
+        browsers TEXT,             -- カンマ区切り
+        case_count INTEGER,        -- 対象のテストケース数
+        failed_count INTEGER       -- 結果が失敗のテストケース数
+    );
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS test_run_cases (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        run_id INTEGER NOT NULL,
+        test_case_id INTEGER NOT NULL,
+        browser TEXT,
+        started_at TEXT,
+        finished_at TEXT,
+        duration REAL,             -- 秒
+        result TEXT,               -- 成功/失敗（実行した項目がない場合はNULL）
+        error TEXT,
+        FOREIGN KEY(run_id) REFERENCES test_runs(id)
+    );
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS test_run_steps (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        run_id INTEGER NOT NULL,
+        run_case_id INTEGER NOT NULL,
+        test_item_id INTEGER NOT NULL,
+        step_no INTEGER NOT NULL,  -- テスト項目内の手順の順番（1から）
+        action TEXT NOT NULL,
+        target TEXT,
+        started_at TEXT,
+        finished_at TEXT,
+        duration REAL,             -- 秒
+        result TEXT,               -- 成功/失敗
+        message TEXT,
+        FOREIGN KEY(run_id) REFERENCES test_runs(id),
+        FOREIGN KEY(run_case_id) REFERENCES test_run_cases(id)
+    );
+    ''',
+    # 実行単位の参照（他の実行を走査しない）・テストケースごとの直近の所要時間・削除時の参照
+    "CREATE INDEX IF NOT EXISTS idx_test_run_cases_run ON test_run_cases(run_id)",
+    "CREATE INDEX IF NOT EXISTS idx_test_run_cases_case ON test_run_cases(test_case_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_test_run_steps_run ON test_run_steps(run_id, run_case_id)",
+    "CREATE INDEX IF NOT EXISTS idx_test_run_steps_item ON test_run_steps(test_item_id)",
+]
+
+def _migrate_v5_run_history(cur):
+    """
+    v5: 自動実行の履歴（実行・テストケース・手順ごとの開始/終了/所要時間）
+    """
+    for sql in CREATE_RUN_HISTORY_TABLES:
+        cur.execute(sql)
+
+CREATE_SCREENSHOT_TABLES = [
+    # 保存した画像（内容のハッシュで1件。同じ画像は1回だけ保存する）
+    '''
+    CREATE TABLE IF NOT EXISTS screenshot_files (
+        content_hash TEXT PRIMARY KEY,  -- 元のPNGのSHA-256
+        path TEXT NOT NULL,             -- スクリーンショット保存先からの相対パス
+        thumbnail_path TEXT,            -- サムネイル（Pillowがない場合はNULL）
+        width INTEGER,
+        height INTEGER,
+        size INTEGER NOT NULL,          -- 画像とサムネイルの合計バイト数
+        created_at TEXT NOT NULL
+    );
+    ''',
+    # 撮影した手順からの参照（同じ画像の保存は別のワーカーが行う場合があるため、画像への外部キーは付けない）
+    '''
+    CREATE TABLE IF NOT EXISTS screenshots (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        content_hash TEXT NOT NULL,
+        run_id INTEGER,
+        test_case_id INTEGER,
+        test_item_id INTEGER,
+        step_no INTEGER,
+        captured_at TEXT NOT NULL,
+        FOREIGN KEY(run_id) REFERENCES test_runs(id)
+    );
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_screenshots_item ON screenshots(test_item_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_screenshots_run ON screenshots(run_id)",
+    "CREATE INDEX IF NOT EXISTS idx_screenshots_hash ON screenshots(content_hash)",
+]
+
+def _migrate_v6_screenshots(cur):
+    """
+    v6: 自動実行のスクリーンショット（保存した画像と、撮影した手順からの参照）
+    """
+    for sql in CREATE_SCREENSHOT_TABLES:
+        cur.execute(sql)
+
+# マイグレーション一覧（n番目の関数を適用するとuser_versionがn+1になる）
+# スキーマを変更する場合は末尾に関数を追加する（既存の関数は変更しない）
+MIGRATIONS = [
+    _migrate_v1_base_schema,
+    _migrate_v2_indexes,
+    _migrate_v3_fulltext_search,
+    _migrate_v4_bug_sequences,
+    _migrate_v5_run_history,
+    _migrate_v6_screenshots,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def get_schema_version() -> int:
+    """
+    DBのスキーマバージョン（PRAGMA user_version）を返す
+    """
+    return get_connection().execute("PRAGMA user_version").fetchone()[0]
+
 def init_db():
     """
     DBファイルとテーブルを初期化
+    PRAGMA user_versionを見て未適用のマイグレーションだけを順に適用する
+    （最新のDBでは何もしない）
     """
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    with sqlite3.connect(DB_PATH) as conn:
-        # 新スキーマ
-        conn.execute(CREATE_PROJECTS_TABLE)
-        conn.execute(CREATE_SCENARIOS_TABLE)
-        conn.execute(CREATE_SCREENS_TABLE)
-        conn.execute(CREATE_TEST_CASES_TABLE)
-        conn.execute(CREATE_TEST_ITEMS_TABLE)
-        conn.execute(CREATE_BUGS_TABLE)
-        
-        # マスターテーブルを作成
-        for table_sql in CREATE_MASTER_TABLES:
-            conn.execute(table_sql)
-        
-        # 初期マスターデータを投入
-        for table_name, values in INITIAL_MASTER_DATA.items():
-            for value in values:
-                try:
-                    conn.execute(f"INSERT INTO {table_name} (name) VALUES (?)", (value,))
-                except sqlite3.IntegrityError:
-                    # 既に存在する場合はスキップ
-                    pass
-        
-        # マイグレーション: test_casesテーブルにカラムを追加
-        _migrate_test_cases_table(conn)
-        
-        conn.commit()
-
-def _migrate_test_cases_table(conn):
+    if get_schema_version() >= SCHEMA_VERSION:
+        return
+    with transaction(immediate=True) as cur:
+        # 書き込みロック取得後に再確認（他プロセスが先に適用した場合）
+        version = cur.execute("PRAGMA user_version").fetchone()[0]
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            MIGRATIONS[target - 1](cur)
+            cur.execute(f"PRAGMA user_version = {target}")
+            print(f"[LOG] スキーママイグレーション適用: v{target}")
+    # マイグレーションで初期マスターデータを投入している場合がある
+    invalidate_master_data()
+
+# プロセス内で初期化済みのDBファイル（ensure_dbで1回だけinit_dbを実行する）
+_initialized_paths = set()
+_init_lock = threading.Lock()
+
+def ensure_db():
+    """
+    DB_PATHの初期化をプロセス内で1回だけ行う（2回目以降は何もしない）
+    アプリ起動時に呼び出す
+    """
+    if DB_PATH in _initialized_paths:
+        return
+    with _init_lock:
+        if DB_PATH in _initialized_paths:
+            return
+        start = time.perf_counter()
+        init_db()
+        _initialized_paths.add(DB_PATH)
+        print(f"[LOG] DB初期化完了: schema v{SCHEMA_VERSION} ({(time.perf_counter() - start) * 1000:.1f}ms)")
+
+def _migrate_test_cases_table(cur):
     """
     test_casesテーブルのマイグレーション
     既存のテーブルに新しいカラムを追加
     """
-    try:
-        # カラムの存在確認
-        cur = conn.cursor()
-        cur.execute("PRAGMA table_info(test_cases)")
-        columns = [row[1] for row in cur.fetchall()]
-        
-        # 不足しているカラムを追加
-        if 'status' not in columns:
-            conn.execute("ALTER TABLE test_cases ADD COLUMN status TEXT DEFAULT '未実行'")
-        if 'last_run' not in columns:
-            conn.execute("ALTER TABLE test_cases ADD COLUMN last_run TEXT")
-        if 'result' not in columns:
-            conn.execute("ALTER TABLE test_cases ADD COLUMN result TEXT")
-            
-        print("test_casesテーブルのマイグレーション完了")
-    except Exception as e:
-        print(f"マイグレーションエラー: {e}")
+    # カラムの存在確認
+    cur.execute("PRAGMA table_info(test_cases)")
+    columns = [row[1] for row in cur.fetchall()]
+    
+    # 不足しているカラムを追加
+    if 'status' not in columns:
+        cur.execute("ALTER TABLE test_cases ADD COLUMN status TEXT DEFAULT '未実行'")
+    if 'last_run' not in columns:
+        cur.execute("ALTER TABLE test_cases ADD COLUMN last_run TEXT")
+    if 'result' not in columns:
+        cur.execute("ALTER TABLE test_cases ADD COLUMN result TEXT")
 
 def get_next_bug_no(project_id: int) -> int:
     """
-    指定プロジェクトの次のBUG番号を返す（1から連番）
+    指定プロジェクトの次のBUG番号を返す（1から連番、参照のみで払い出しはしない）
+    登録時の番号は reserve_bug_nos で払い出す（同時登録でも重複しない）
     """
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT MAX(bug_no) FROM bugs WHERE project_id = ?", (project_id,))
-        row = cur.fetchone()
-        return (row[0] or 0) + 1
+    row = get_connection().execute(
+        "SELECT last_no FROM bug_sequences WHERE project_id = ?", (project_id,)
+    ).fetchone()
+    return (row[0] if row else 0) + 1
+
+def reserve_bug_nos(cur: sqlite3.Cursor, project_id: int, count: int = 1) -> int:
+    """
+    指定プロジェクトのBUG番号を count 件まとめて払い出し、先頭の番号を返す
+    （払い出した番号は 先頭 〜 先頭+count-1）
+    登録と同じ書き込みトランザクション（transaction(immediate=True)）の中で呼ぶこと
+    シーケンスがないプロジェクトは既存の不具合の最大番号から始める
+    """
+    if count < 1:
+        raise ValueError("countは1以上である必要があります")
+    cur.execute("UPDATE bug_sequences SET last_no = last_no + ? WHERE project_id = ?", (count, project_id))
+    if cur.rowcount == 0:
+        cur.execute("""
+            INSERT INTO bug_sequences (project_id, last_no)
+            SELECT ?, COALESCE(MAX(bug_no), 0) + ? FROM bugs WHERE project_id = ?
+        """, (project_id, count, project_id))
+    last_no = cur.execute("SELECT last_no FROM bug_sequences WHERE project_id = ?", (project_id,)).fetchone()[0]
+    return last_no - count + 1
+
+# マスターデータのキャッシュ（DBファイルごと）
+# マスターは滅多に変わらないため、全マスターテーブルを1回のクエリでまとめて読み込んで保持する
+# 次のどちらかで読み込み直す
+#  ・プロセス内での変更: invalidate_master_data() で世代番号を進める
+#  ・他プロセスでの変更: コネクションごとの PRAGMA data_version の変化
+#    （data_version は自コネクションのコミットでは変わらないため、プロセス内の変更は世代番号で扱う）
+MASTER_TABLES = tuple(INITIAL_MASTER_DATA)
+_master_cache: Dict[str, Dict[str, List[str]]] = {}
+# DBファイル → {コネクションのid: キャッシュと一致を確認済みの data_version}
+_master_seen: Dict[str, Dict[int, int]] = {}
+_master_generation = 0
+_master_lock = threading.Lock()
+
+def invalidate_master_data() -> None:
+    """
+    マスターデータのキャッシュを破棄する（マスターテーブルを変更したら呼び出す）
+    """
+    global _master_generation
+    with _master_lock:
+        _master_generation += 1
+        _master_cache.clear()
+        _master_seen.clear()
+
+def get_all_master_data() -> Dict[str, List[str]]:
+    """
+    全マスターテーブルのname一覧を {テーブル名: [name, ...]} で返す（キャッシュ利用）
+    """
+    return {table: list(names) for table, names in _cached_master_data().items()}
+
+def _cached_master_data() -> Dict[str, List[str]]:
+    """
+    キャッシュ済みのマスターデータ（呼び出し元で変更しないこと）
+    キャッシュがないか、このコネクションから見て他で変更があれば読み込み直す
+    """
+    conn = get_connection()
+    data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+    with _master_lock:
+        data = _master_cache.get(DB_PATH)
+        seen = _master_seen.setdefault(DB_PATH, {})
+        if data is not None and seen.get(id(conn)) == data_version:
+            return data
+        generation = _master_generation
+    data = _load_master_data(conn)
+    with _master_lock:
+        # 読み込み中に無効化された場合は保持しない（次回読み込み直す）
+        if generation == _master_generation:
+            if _master_cache.get(DB_PATH) != data:
+                # 内容が変わっていれば他コネクションでの確認結果も無効
+                _master_seen[DB_PATH] = {}
+            _master_cache[DB_PATH] = data
+            _master_seen.setdefault(DB_PATH, {})[id(conn)] = data_version
+    return data
+
+def _load_master_data(conn: sqlite3.Connection) -> Dict[str, List[str]]:
+    """
+    全マスターテーブルを1回のクエリ（UNION ALL）で読み込む
+    """
+    union = " UNION ALL ".join(
+        f"SELECT {no} AS table_no, id, name FROM {table}" for no, table in enumerate(MASTER_TABLES)
+    )
+    data: Dict[str, List[str]] = {table: [] for table in MASTER_TABLES}
+    for table_no, name in conn.execute(f"SELECT table_no, name FROM ({union}) ORDER BY table_no, id"):
+        data[MASTER_TABLES[table_no]].append(name)
+    return data
 
 def get_master_data(table_name: str) -> list:
     """
     指定したマスターテーブルからname一覧を取得
+    （マスターテーブルはキャッシュから返す）
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    if table_name in MASTER_TABLES:
+        return list(_cached_master_data()[table_name])
+    with get_connection() as conn:
         cur = conn.cursor()
         cur.execute(f"SELECT name FROM {table_name} ORDER BY id")
         rows = cur.fetchall()
@@ -252,7 +572,7 @@ def get_all_scenarios() -> list:
     シナリオ一覧表示用のデータを取得
     各テスト項目（test_items）を、画面名・シナリオ名などと一緒に返す
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cur = conn.cursor()
         cur.execute('''
             SELECT 
@@ -283,31 +603,438 @@ def get_all_scenarios() -> list:
             })
         return scenarios
 
-def delete_project(project_id: int) -> None:
+def get_projects() -> List[Tuple[int, str]]:
     """
-    指定したプロジェクトと関連データ（画面・テストケース・テスト項目）を全て削除する
+    プロジェクト一覧 [(id, name), ...]
     """
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        # 画面ID取得
-        cur.execute("SELECT id FROM screens WHERE project_id=?", (project_id,))
-        screen_ids = [row[0] for row in cur.fetchall()]
-        # テストケースID取得
-        case_ids = []
-        for sid in screen_ids:
-            cur.execute("SELECT id FROM test_cases WHERE screen_id=?", (sid,))
-            case_ids.extend([row[0] for row in cur.fetchall()])
-        # テスト項目削除
-        if case_ids:
-            cur.executemany("DELETE FROM test_items WHERE test_case_id=?", [(cid,) for cid in case_ids])
-        # テストケース削除
-        if screen_ids:
-            cur.executemany("DELETE FROM test_cases WHERE screen_id=?", [(sid,) for sid in screen_ids])
-        # 画面削除
-        cur.execute("DELETE FROM screens WHERE project_id=?", (project_id,))
-        # プロジェクト削除
-        cur.execute("DELETE FROM projects WHERE id=?", (project_id,))
-        conn.commit()
+    return get_connection().execute("SELECT id, name FROM projects ORDER BY id").fetchall()
+
+def get_screens(project_id: int) -> List[Tuple[int, str]]:
+    """
+    プロジェクト配下の画面一覧 [(id, name), ...]
+    """
+    return get_connection().execute(
+        "SELECT id, name FROM screens WHERE project_id=? ORDER BY id", (project_id,)
+    ).fetchall()
+
+def get_test_cases(screen_id: int) -> List[Tuple[int, str]]:
+    """
+    画面配下のテストケース一覧 [(id, name), ...]
+    """
+    return get_connection().execute(
+        "SELECT id, name FROM test_cases WHERE screen_id=? ORDER BY id", (screen_id,)
+    ).fetchall()
+
+def get_test_items(test_case_id: int) -> List[Tuple[int, str]]:
+    """
+    テストケース配下のテスト項目一覧 [(id, name), ...]
+    """
+    return get_connection().execute(
+        "SELECT id, name FROM test_items WHERE test_case_id=? ORDER BY id", (test_case_id,)
+    ).fetchall()
+
+# テスト実行画面で編集するテスト項目の列（get_test_items_for_execution の id 以降の並び）
+EXECUTION_ITEM_COLUMNS = (
+    "name", "input_data", "operation", "expected", "priority", "tester", "exec_date", "result", "bug_id", "remarks",
+)
+
+def get_test_items_for_execution(test_case_id: int) -> List[Tuple]:
+    """
+    テスト実行画面用のテスト項目一覧
+    [(id, name, input_data, operation, expected, priority, tester, exec_date, result, bug_id, bug_no, remarks), ...]
+    bug_no は関連付いた不具合のプロジェクト内番号（表示用）
+    """
+    return get_connection().execute("""
+        SELECT ti.id, ti.name, ti.input_data, ti.operation, ti.expected, ti.priority, ti.tester,
+               ti.exec_date, ti.result, ti.bug_id, b.bug_no, ti.remarks
+        FROM test_items ti
+        LEFT JOIN bugs b ON ti.bug_id = b.id
+        WHERE ti.test_case_id = ?
+        ORDER BY ti.id
+    """, (test_case_id,)).fetchall()
+
+def find_bug_id(project_id: int, bug_no: int) -> Optional[int]:
+    """プロジェクト内のBUG番号から不具合のID（bugs.id）を返す（見つからない場合はNone）"""
+    row = get_connection().execute(
+        "SELECT id FROM bugs WHERE project_id = ? AND bug_no = ?", (project_id, bug_no)
+    ).fetchone()
+    return row[0] if row else None
+
+def update_test_items(changes: List[Tuple[int, Dict[str, Any]]]) -> int:
+    """
+    テスト項目の変更された列だけを更新し、更新した行数を返す
+    changes: [(テスト項目ID, {列名: 値, ...}), ...]（列名は EXECUTION_ITEM_COLUMNS のいずれか）
+    変更された列の組み合わせごとに executemany でまとめて更新する（全体で1トランザクション）
+    結果だけの変更では全文検索インデックスの更新トリガーは発火しない
+    """
+    groups: Dict[Tuple[str, ...], List[tuple]] = {}
+    for item_id, values in changes:
+        if not values:
+            continue
+        columns = tuple(sorted(values))
+        unknown = set(columns) - set(EXECUTION_ITEM_COLUMNS)
+        if unknown:
+            raise ValueError(f"更新できない列です: {', '.join(sorted(unknown))}")
+        groups.setdefault(columns, []).append((*(values[c] for c in columns), item_id))
+    updated = 0
+    with transaction(immediate=True) as cur:
+        for columns, rows in groups.items():
+            assignments = ", ".join(f"{c} = ?" for c in columns)
+            cur.executemany(f"UPDATE test_items SET {assignments} WHERE id = ?", rows)
+            updated += cur.rowcount
+    return updated
+
+def get_test_cases_for_execution(screen_id: int) -> List[Tuple[int, str, Optional[str]]]:
+    """
+    テスト実行用のテストケース一覧 [(id, name, 最小の結果), ...]
+    未実施の項目を含むケースを先頭にする
+    """
+    return get_connection().execute("""
+        SELECT tc.id, tc.name, MIN(ti.result) as min_result
+        FROM test_cases tc
+        LEFT JOIN test_items ti ON tc.id = ti.test_case_id
+        WHERE tc.screen_id=?
+        GROUP BY tc.id, tc.name
+        ORDER BY CASE WHEN min_result IS NULL OR min_result='' OR min_result='未実施' THEN 0 ELSE 1 END, tc.id
+    """, (screen_id,)).fetchall()
+
+def get_test_item_list(project_id: Optional[int] = None, keyword: str = "") -> List[Tuple]:
+    """
+    シナリオ一覧表示用のテスト項目一覧
+    [(プロジェクト名, 画面名, テストケース名, テスト項目名, 優先度, 担当者, 結果), ...]
+    keyword を指定した場合は search_test_items の全件（関連度順）
+    """
+    if keyword.strip():
+        return search_test_items(keyword, project_id, limit=None)
+    sql = """
+        SELECT 
+            p.name as project_name,
+            s.name as screen_name,
+            tc.name as testcase_name,
+            ti.name as testitem_name,
+            ti.priority,
+            ti.tester,
+            ti.result
+        FROM test_items ti
+        JOIN test_cases tc ON ti.test_case_id = tc.id
+        JOIN screens s ON tc.screen_id = s.id
+        JOIN projects p ON s.project_id = p.id
+    """
+    params: Tuple = ()
+    if project_id:
+        sql += " WHERE p.id = ?"
+        params = (project_id,)
+    sql += " ORDER BY p.name, s.name, tc.name, ti.id"
+    return get_connection().execute(sql, params).fetchall()
+
+# 一覧のページサイズ（キーセットページング）
+ITEM_PAGE_SIZE = 1000
+
+# ページング用の一覧SQL（表示列7つ＋キー列 p.id, s.id, tc.id, ti.id）
+# CROSS JOIN で結合順をプロジェクト→画面→テストケース→テスト項目に固定し、
+# 各インデックスの並びのままORDER BYを満たす（ソート用の一時B-treeを作らない）
+_ITEM_PAGE_SELECT = """
+    SELECT p.name, s.name, tc.name, ti.name, ti.priority, ti.tester, ti.result,
+           p.id, s.id, tc.id, ti.id
+    FROM projects p
+    CROSS JOIN screens s ON s.project_id = p.id
+    CROSS JOIN test_cases tc ON tc.screen_id = s.id
+    CROSS JOIN test_items ti ON ti.test_case_id = tc.id
+"""
+
+# 一覧の列で並べ替える場合の並びの値（表示列の順。空の値は一覧の表示と同じ既定値に置き換える）
+ITEM_SORT_EXPRESSIONS = (
+    "p.name",
+    "s.name",
+    "tc.name",
+    "ti.name",
+    "COALESCE(NULLIF(ti.priority, ''), '-')",
+    "COALESCE(NULLIF(ti.tester, ''), '-')",
+    "COALESCE(NULLIF(ti.result, ''), '未実施')",
+)
+
+def get_test_item_page(project_id: Optional[int] = None, after: Optional[Tuple] = None,
+                       limit: int = ITEM_PAGE_SIZE, sort_column: Optional[int] = None,
+                       descending: bool = False) -> Tuple[List[Tuple], Optional[Tuple]]:
+    """
+    シナリオ一覧のキーセットページング
+    並びはプロジェクト名, 画面名, 画面ID, テストケース名, テストケースID, テスト項目ID
+    （get_test_item_list と違い、同名の画面・テストケースも各ID順に並びを決める）
+    sort_column: 列で並べ替える場合の表示列の番号（ITEM_SORT_EXPRESSIONS）。
+    列の値（descending=True で降順）、同じ値の中はテスト項目ID順
+    after: 前ページの続きを示すカーソル（最初のページはNone。並べ替えの指定は前ページと同じにする）
+    戻り値: (一覧表示用の行, 次ページのカーソル。最後のページならNone)
+
+    OFFSETを使わず、カーソル位置から
+    「同じテストケースの続き → 同じ画面の続き → 同じプロジェクトの続き → 以降のプロジェクト」
+    の順にインデックスをたどって読むため、何ページ目でもコストはページサイズ分だけ
+    （列で並べ替える場合は (列の値, テスト項目ID) をカーソルにし、ページごとに対象行を並べ替えて読む）
+    """
+    if sort_column is not None:
+        return _get_sorted_test_item_page(project_id, after, limit, sort_column, descending)
+    if after is None:
+        # (条件, パラメータ, ORDER BY)
+        branches = [("WHERE 1=1", (), "p.name, s.name, s.id, tc.name, tc.id, ti.id")]
+    else:
+        p_name, p_id, s_name, s_id, tc_name, tc_id, ti_id = after
+        branches = [
+            ("WHERE p.id = ? AND s.id = ? AND tc.id = ? AND ti.id > ?", (p_id, s_id, tc_id, ti_id), "ti.id"),
+            ("WHERE p.id = ? AND s.id = ? AND (tc.name, tc.id) > (?, ?)", (p_id, s_id, tc_name, tc_id),
+             "tc.name, tc.id, ti.id"),
+            ("WHERE p.id = ? AND (s.name, s.id) > (?, ?)", (p_id, s_name, s_id),
+             "s.name, s.id, tc.name, tc.id, ti.id"),
+        ]
+        if not project_id:
+            branches.append(("WHERE p.name > ?", (p_name,), "p.name, s.name, s.id, tc.name, tc.id, ti.id"))
+    conn = get_connection()
+    rows: List[Tuple] = []
+    for where, params, order in branches:
+        if project_id:
+            where += " AND p.id = ?"
+            params += (project_id,)
+        rows.extend(conn.execute(
+            f"{_ITEM_PAGE_SELECT} {where} ORDER BY {order} LIMIT ?", params + (limit - len(rows),)
+        ).fetchall())
+        if len(rows) >= limit:
+            break
+    if len(rows) < limit:
+        return [row[:7] for row in rows], None
+    last = rows[-1]
+    cursor = (last[0], last[7], last[1], last[8], last[2], last[9], last[10])
+    return [row[:7] for row in rows], cursor
+
+def _get_sorted_test_item_page(project_id: Optional[int], after: Optional[Tuple], limit: int,
+                               sort_column: int, descending: bool) -> Tuple[List[Tuple], Optional[Tuple]]:
+    """列で並べ替えた一覧の1ページ（カーソルは (列の値, テスト項目ID)）"""
+    key = ITEM_SORT_EXPRESSIONS[sort_column]
+    conditions = []
+    params: Tuple = ()
+    if project_id:
+        conditions.append("p.id = ?")
+        params += (project_id,)
+    if after is not None:
+        value, ti_id = after
+        if descending:
+            conditions.append(f"({key} < ? OR ({key} = ? AND ti.id > ?))")
+            params += (value, value, ti_id)
+        else:
+            conditions.append(f"({key}, ti.id) > (?, ?)")
+            params += (value, ti_id)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = get_connection().execute(f"""
+        SELECT p.name, s.name, tc.name, ti.name, ti.priority, ti.tester, ti.result, {key}, ti.id
+        FROM projects p
+        CROSS JOIN screens s ON s.project_id = p.id
+        CROSS JOIN test_cases tc ON tc.screen_id = s.id
+        CROSS JOIN test_items ti ON ti.test_case_id = tc.id
+        {where}
+        ORDER BY {key} {"DESC" if descending else "ASC"}, ti.id
+        LIMIT ?
+    """, params + (limit,)).fetchall()
+    if len(rows) < limit:
+        return [row[:7] for row in rows], None
+    return [row[:7] for row in rows], (rows[-1][7], rows[-1][8])
+
+def count_test_items(project_id: Optional[int] = None) -> int:
+    """
+    テスト項目数（一覧の総件数表示用、行の中身は読まずインデックスだけで数える）
+    """
+    if not project_id:
+        return get_connection().execute("SELECT COUNT(*) FROM test_items").fetchone()[0]
+    return get_connection().execute("""
+        SELECT COUNT(*)
+        FROM screens s
+        JOIN test_cases tc ON tc.screen_id = s.id
+        JOIN test_items ti ON ti.test_case_id = tc.id
+        WHERE s.project_id = ?
+    """, (project_id,)).fetchone()[0]
+
+# 検索結果の1ページあたりの件数
+SEARCH_PAGE_SIZE = 500
+
+def fulltext_search_enabled() -> bool:
+    """
+    全文検索インデックスが使えるかどうか
+    """
+    row = get_connection().execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='fts_test_items'"
+    ).fetchone()
+    return row is not None
+
+def _fts_phrase(keyword: str) -> str:
+    """キーワードをFTS5のフレーズ（部分一致）として扱うためにクォートする"""
+    return '"' + keyword.replace('"', '""') + '"'
+
+def _like_pattern(keyword: str) -> str:
+    """キーワードをLIKEの部分一致パターンにする（ESCAPE '\\'）"""
+    escaped = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+def _use_fts(keyword: str) -> bool:
+    return len(keyword) >= FTS_MIN_KEYWORD_LENGTH and fulltext_search_enabled()
+
+def _limit_clause(limit: Optional[int], offset: int) -> Tuple[str, Tuple]:
+    return " LIMIT ? OFFSET ?", (-1 if limit is None else limit, offset)
+
+def search_test_items(keyword: str, project_id: Optional[int] = None,
+                      limit: Optional[int] = SEARCH_PAGE_SIZE, offset: int = 0,
+                      include_details: bool = False) -> List[Tuple]:
+    """
+    テスト項目のキーワード検索（関連度順・ページ単位）
+    テスト項目（名前・入力データ・操作手順・期待結果・備考・担当者）、テストケース名、画面名、
+    プロジェクト名の順に一致の強さを評価し、同じ強さの中は全文検索の関連度（bm25）順に並べる
+    戻り値: get_test_item_list と同じ並びのタプルのリスト
+    include_details=True の場合は末尾に 入力データ, 操作手順, 期待結果, 備考 を追加する
+    limit=None で全件
+    """
+    keyword = keyword.strip()
+    if not keyword:
+        return []
+    columns = FTS_TABLES["test_items"][1]
+    if _use_fts(keyword):
+        query = _fts_phrase(keyword)
+        hits_sql = """
+            SELECT rowid AS item_id, 0 AS tier, bm25(fts_test_items) AS rank
+            FROM fts_test_items WHERE fts_test_items MATCH ?
+            UNION ALL
+            SELECT ti.id, 1, bm25(fts_test_cases)
+            FROM fts_test_cases JOIN test_items ti ON ti.test_case_id = fts_test_cases.rowid
+            WHERE fts_test_cases MATCH ?
+            UNION ALL
+            SELECT ti.id, 2, bm25(fts_screens)
+            FROM fts_screens
+            JOIN test_cases tc ON tc.screen_id = fts_screens.rowid
+            JOIN test_items ti ON ti.test_case_id = tc.id
+            WHERE fts_screens MATCH ?
+        """
+        hits_params: Tuple = (query, query, query)
+    else:
+        # 短いキーワードはtrigramで引けないため、テスト項目側をLIKEで走査する
+        pattern = _like_pattern(keyword)
+        item_conditions = " OR ".join(f"ti.{c} LIKE ? ESCAPE '\\'" for c in columns)
+        hits_sql = f"""
+            SELECT ti.id AS item_id, 0 AS tier, 0.0 AS rank FROM test_items ti WHERE {item_conditions}
+            UNION ALL
+            SELECT ti.id, 1, 0.0
+            FROM test_cases tc JOIN test_items ti ON ti.test_case_id = tc.id
+            WHERE tc.name LIKE ? ESCAPE '\\'
+            UNION ALL
+            SELECT ti.id, 2, 0.0
+            FROM screens s
+            JOIN test_cases tc ON tc.screen_id = s.id
+            JOIN test_items ti ON ti.test_case_id = tc.id
+            WHERE s.name LIKE ? ESCAPE '\\'
+        """
+        hits_params = (pattern,) * len(columns) + (pattern, pattern)
+    # プロジェクト名は件数が少ないためLIKEで判定する
+    hits_sql += """
+        UNION ALL
+        SELECT ti.id, 3, 0.0
+        FROM projects p
+        JOIN screens s ON s.project_id = p.id
+        JOIN test_cases tc ON tc.screen_id = s.id
+        JOIN test_items ti ON ti.test_case_id = tc.id
+        WHERE p.name LIKE ? ESCAPE '\\'
+    """
+    hits_params += (_like_pattern(keyword),)
+    details = ", ti.input_data, ti.operation, ti.expected, ti.remarks" if include_details else ""
+    sql = f"""
+        WITH hits AS ({hits_sql}),
+        best AS (
+            SELECT item_id, MIN(tier) AS tier, MIN(rank) AS rank FROM hits GROUP BY item_id
+        )
+        SELECT p.name, s.name, tc.name, ti.name, ti.priority, ti.tester, ti.result{details}
+        FROM best
+        JOIN test_items ti ON ti.id = best.item_id
+        JOIN test_cases tc ON ti.test_case_id = tc.id
+        JOIN screens s ON tc.screen_id = s.id
+        JOIN projects p ON s.project_id = p.id
+    """
+    params = hits_params
+    if project_id:
+        sql += " WHERE p.id = ?"
+        params += (project_id,)
+    sql += " ORDER BY best.tier, best.rank, ti.id"
+    limit_sql, limit_params = _limit_clause(limit, offset)
+    return get_connection().execute(sql + limit_sql, params + limit_params).fetchall()
+
+def search_test_cases(keyword: str, project_id: Optional[int] = None, screen_id: Optional[int] = None,
+                      limit: Optional[int] = SEARCH_PAGE_SIZE, offset: int = 0) -> List[Tuple]:
+    """
+    テストケース名のキーワード検索（関連度順・ページ単位）
+    戻り値: [(id, 画面名, テストケース名, ステータス, 最終実行日, 実行結果), ...]
+    limit=None で全件
+    """
+    keyword = keyword.strip()
+    if not keyword:
+        return []
+    if _use_fts(keyword):
+        sql = """
+            SELECT tc.id, s.name, tc.name, tc.status, tc.last_run, tc.result
+            FROM fts_test_cases
+            JOIN test_cases tc ON tc.id = fts_test_cases.rowid
+            JOIN screens s ON tc.screen_id = s.id
+            WHERE fts_test_cases MATCH ?
+        """
+        params: Tuple = (_fts_phrase(keyword),)
+        order = " ORDER BY bm25(fts_test_cases), tc.id"
+    else:
+        sql = """
+            SELECT tc.id, s.name, tc.name, tc.status, tc.last_run, tc.result
+            FROM test_cases tc JOIN screens s ON tc.screen_id = s.id
+            WHERE tc.name LIKE ? ESCAPE '\\'
+        """
+        params = (_like_pattern(keyword),)
+        order = " ORDER BY tc.id"
+    if project_id:
+        sql += " AND s.project_id = ?"
+        params += (project_id,)
+    if screen_id is not None:
+        sql += " AND s.id = ?"
+        params += (screen_id,)
+    limit_sql, limit_params = _limit_clause(limit, offset)
+    return get_connection().execute(sql + order + limit_sql, params + limit_params).fetchall()
+
+def search_bugs(keyword: str, project_id: Optional[int] = None,
+                limit: Optional[int] = SEARCH_PAGE_SIZE, offset: int = 0) -> List[Tuple]:
+    """
+    不具合（概要・詳細）のキーワード検索（関連度順・ページ単位）
+    戻り値: [(id, project_id, bug_no, 概要, ステータス), ...]
+    limit=None で全件
+    """
+    keyword = keyword.strip()
+    if not keyword:
+        return []
+    if _use_fts(keyword):
+        sql = """
+            SELECT b.id, b.project_id, b.bug_no, b.summary, b.status
+            FROM fts_bugs JOIN bugs b ON b.id = fts_bugs.rowid
+            WHERE fts_bugs MATCH ?
+        """
+        params: Tuple = (_fts_phrase(keyword),)
+        order = " ORDER BY bm25(fts_bugs), b.id"
+    else:
+        pattern = _like_pattern(keyword)
+        sql = """
+            SELECT b.id, b.project_id, b.bug_no, b.summary, b.status
+            FROM bugs b
+            WHERE (b.summary LIKE ? ESCAPE '\\' OR b.details LIKE ? ESCAPE '\\')
+        """
+        params = (pattern, pattern)
+        order = " ORDER BY b.id"
+    if project_id:
+        sql += " AND b.project_id = ?"
+        params += (project_id,)
+    limit_sql, limit_params = _limit_clause(limit, offset)
+    return get_connection().execute(sql + order + limit_sql, params + limit_params).fetchall()
+
+def delete_project(project_id: int) -> Dict[str, int]:
+    """
+    指定したプロジェクトと関連データ（画面・テストケース・テスト項目・不具合）を全て削除する
+    戻り値は core.cascade_delete の削除件数
+    """
+    from core import cascade_delete
+    return cascade_delete.delete_projects([project_id])
 
 def delete_test_cases_safely(test_case_ids: List[int]) -> dict:
     """
@@ -317,83 +1044,105 @@ def delete_test_cases_safely(test_case_ids: List[int]) -> dict:
     # validate
     if not isinstance(test_case_ids, list) or not all(isinstance(i, int) for i in test_case_ids):
         raise ValueError("test_case_ids は整数IDのリストである必要があります")
-    if not test_case_ids:
-        return {"deleted_test_cases": 0, "updated_bugs": 0}
-    
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        deleted_count = 0
-        updated_bugs_count = 0
-        
-        for cid in test_case_ids:
-            # 関連バグ数をカウント
-            cur.execute("""
-                SELECT COUNT(*) FROM bugs 
-                WHERE test_item_id IN (
-                    SELECT id FROM test_items WHERE test_case_id = ?
-                )
-            """, (cid,))
-            bug_count = cur.fetchone()[0]
-            updated_bugs_count += bug_count
-            
-            # データ整合性を保つための適切な削除順序
-            # 1. bugsテーブルのtest_item_id参照を解除
-            cur.execute("""
-                UPDATE bugs SET test_item_id = NULL 
-                WHERE test_item_id IN (
-                    SELECT id FROM test_items WHERE test_case_id = ?
-                )
-            """, (cid,))
-            
-            # 2. test_itemsテーブルのbug_id参照を解除（念のため）
-            cur.execute("UPDATE test_items SET bug_id = NULL WHERE test_case_id = ?", (cid,))
-            
-            # 3. test_itemsを削除
-            cur.execute("DELETE FROM test_items WHERE test_case_id=?", (cid,))
-            
-            # 4. 最後にtest_casesを削除
-            cur.execute("DELETE FROM test_cases WHERE id=?", (cid,))
-            deleted_count += 1
-        
-        conn.commit()
-        return {"deleted_test_cases": deleted_count, "updated_bugs": updated_bugs_count}
+    from core import cascade_delete
+    counts = cascade_delete.delete_test_cases(test_case_ids)
+    return {"deleted_test_cases": counts["test_cases"], "updated_bugs": counts["unlinked_bugs"]}
+
+# 不具合の登録項目（project_id, bug_no, created_at, updated_at 以外）
+BUG_FIELDS = (
+    "test_item_id", "reported_date", "summary", "details", "cause_category", "severity",
+    "reproducibility", "status", "assignee", "fix_date", "remarks",
+)
+# 失敗したテスト項目から自動登録する不具合の初期値
+FAILED_RESULT = "失敗"
+AUTO_BUG_STATUS = "未対応"
+AUTO_BUG_REMARKS = "テスト結果（失敗）から自動登録"
 
 def insert_bug(data: dict) -> str:
     """
     不具合情報をDBに登録し、表示用BUG-ID（例: BUG-0001）を返す
     dataにはproject_id, その他項目が含まれること
     """
-    project_id = data.get("project_id")
-    if not project_id:
+    return insert_bugs([data])[0]
+
+def insert_bugs(bugs: List[Dict[str, Any]]) -> List[str]:
+    """
+    複数の不具合をまとめて登録し、表示用BUG-IDを登録順のリストで返す
+    各要素は insert_bug の data と同じ形式（project_id 必須）
+    ・BUG番号はプロジェクトごとに件数分をまとめて払い出す（同時登録でも重複しない）
+    ・test_item_id を指定した不具合はテスト項目側（test_items.bug_id）からも関連付ける
+    払い出し・登録・関連付けは1つの書き込みトランザクションで行う
+    """
+    if not bugs:
+        return []
+    if not all(data.get("project_id") for data in bugs):
         raise ValueError("project_idは必須です")
-    bug_no = get_next_bug_no(project_id)
     now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO bugs (
-                project_id, bug_no, test_item_id, reported_date, summary, details, cause_category, severity, reproducibility, status, assignee, fix_date, remarks, created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                project_id,
-                bug_no,
-                data.get("test_item_id"),
-                data.get("reported_date"),
-                data.get("summary"),
-                data.get("details"),
-                data.get("cause_category"),
-                data.get("severity"),
-                data.get("reproducibility"),
-                data.get("status"),
-                data.get("assignee"),
-                data.get("fix_date"),
-                data.get("remarks"),
-                now,
-                now
-            )
+    bug_nos = [0] * len(bugs)
+    by_project: Dict[int, List[int]] = {}
+    for i, data in enumerate(bugs):
+        by_project.setdefault(data["project_id"], []).append(i)
+    columns = ", ".join(BUG_FIELDS)
+    placeholders = ", ".join("?" * (len(BUG_FIELDS) + 4))
+    with transaction(immediate=True) as cur:
+        for project_id, indexes in by_project.items():
+            first = reserve_bug_nos(cur, project_id, len(indexes))
+            for offset, i in enumerate(indexes):
+                bug_nos[i] = first + offset
+        cur.executemany(
+            f"INSERT INTO bugs (project_id, bug_no, {columns}, created_at, updated_at) VALUES ({placeholders})",
+            [(data["project_id"], bug_no, *(data.get(f) for f in BUG_FIELDS), now, now)
+             for data, bug_no in zip(bugs, bug_nos)],
         )
-        conn.commit()
+        links = [(data["project_id"], bug_no, data["test_item_id"])
+                 for data, bug_no in zip(bugs, bug_nos) if data.get("test_item_id")]
+        if links:
+            cur.executemany(
+                "UPDATE test_items SET bug_id = (SELECT id FROM bugs WHERE project_id = ? AND bug_no = ?) WHERE id = ?",
+                links,
+            )
     # 表示用BUG-IDを返す
-    return f"BUG-{bug_no:04d}"
\ No newline at end of file
+    return [f"BUG-{bug_no:04d}" for bug_no in bug_nos]
+
+def file_bugs_for_failed_items(test_case_ids: List[int]) -> List[str]:
+    """
+    指定テストケース配下で結果が「失敗」かつ不具合が未登録のテスト項目ごとに不具合を自動登録し、
+    表示用BUG-IDのリストを返す（テスト項目と不具合は相互に関連付ける）
+    対象の抽出から登録までを1つの書き込みトランザクションで行うため、同時に実行しても二重登録しない
+    """
+    if not test_case_ids:
+        return []
+    placeholders = ",".join("?" * len(test_case_ids))
+    today = datetime.date.today().strftime("%Y-%m-%d")
+    with transaction(immediate=True) as cur:
+        rows = cur.execute(f"""
+            SELECT ti.id, s.project_id, s.name, tc.name, ti.name, ti.input_data, ti.operation, ti.expected,
+                   ti.exec_date, ti.remarks
+            FROM test_items ti
+            JOIN test_cases tc ON ti.test_case_id = tc.id
+            JOIN screens s ON tc.screen_id = s.id
+            WHERE ti.test_case_id IN ({placeholders}) AND ti.result = ? AND ti.bug_id IS NULL
+            ORDER BY ti.id
+        """, (*test_case_ids, FAILED_RESULT)).fetchall()
+        bugs = []
+        for (item_id, project_id, screen_name, case_name, item_name, input_data, operation, expected,
+             exec_date, remarks) in rows:
+            details = "\n".join(
+                f"{label}: {value}" for label, value in (
+                    ("画面", screen_name), ("テストケース", case_name), ("入力データ", input_data),
+                    ("操作手順", operation), ("期待結果", expected), ("備考", remarks),
+                ) if value
+            )
+            bugs.append({
+                "project_id": project_id,
+                "test_item_id": item_id,
+                "reported_date": exec_date or today,
+                "summary": f"{item_name}（{case_name}）が失敗",
+                "details": details,
+                "status": AUTO_BUG_STATUS,
+                "remarks": AUTO_BUG_REMARKS,
+            })
+        bug_ids = insert_bugs(bugs)
+    if bug_ids:
+        print(f"[LOG] 失敗したテスト項目から不具合を自動登録: {len(bug_ids)}件")
+    return bug_ids
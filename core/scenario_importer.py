@@ -0,0 +1,276 @@
+"""
+Excel取込データをDBへ反映するインポートエンジン
+既存のテスト項目と安定キーで突き合わせ、必要なINSERT/UPDATE/DELETEだけを発行する
+（テスト項目IDが維持されるため、bugs.test_item_id の紐付けも壊れない）
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from core import cascade_delete, db_connection, scenario_db
+
+# テスト項目のうちExcelから取り込むカラム（並びはSQLと対応）
+TESTITEM_COLUMNS = (
+    "name", "input_data", "operation", "expected", "priority", "tester", "exec_date", "result", "remarks"
+)
+# カラム名とExcelヘッダーの対応（nameは「テスト項目」列）
+EXCEL_HEADERS = {
+    "input_data": "入力データ",
+    "operation": "操作手順",
+    "expected": "期待結果",
+    "priority": "優先度",
+    "tester": "担当者",
+    "exec_date": "実施日",
+    "result": "結果",
+    "remarks": "備考",
+}
+NAME_MAX_LENGTH = 100
+
+
+def normalize_testitem(testitem: Dict[str, Any]) -> Optional[Tuple[str, ...]]:
+    """
+    Excelのテスト項目行をDBのカラム値（TESTITEM_COLUMNS順のタプル）に変換
+    テスト項目名が空・長すぎる場合はNone
+    """
+    name = testitem.get("テスト項目") or testitem.get("name")
+    if not name:
+        return None
+    name = str(name).strip()
+    if not name or len(name) > NAME_MAX_LENGTH:
+        return None
+    values = [name]
+    for column in TESTITEM_COLUMNS[1:]:
+        values.append(str(testitem.get(EXCEL_HEADERS[column], "")).strip())
+    return tuple(values)
+
+
+def _keyed(rows: List[Tuple[str, ...]]) -> List[Tuple[Tuple[str, int], Tuple[str, ...]]]:
+    """
+    テスト項目に安定キー（テスト項目名, 同名内での出現順）を付与
+    同じケース内に同名の項目があっても上から順に対応付けられる
+    """
+    seen: Dict[str, int] = {}
+    keyed = []
+    for values in rows:
+        name = values[0]
+        seen[name] = seen.get(name, 0) + 1
+        keyed.append(((name, seen[name]), values))
+    return keyed
+
+
+def summarize_by_screen(result_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    シナリオ単位の取込結果を画面単位に集計
+    戻り値: [{"screen", "scenarios": [...], "inserted", "updated", "deleted", "unchanged"}, ...]
+    """
+    screens: Dict[str, Dict[str, Any]] = {}
+    for row in result_list:
+        screen = screens.setdefault(row["screen"], {
+            "screen": row["screen"], "scenarios": [],
+            "inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0,
+        })
+        screen["scenarios"].append(row)
+        for key in ("inserted", "updated", "deleted", "unchanged"):
+            screen[key] += row.get(key, 0)
+    return list(screens.values())
+
+
+def _chunks(rows: List[Any], size: int) -> Iterator[List[Any]]:
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+class ScenarioImporter:
+    """
+    ScenarioLoaderの抽出結果をプロジェクトへ取り込む
+    overwrite=True: 既存シナリオはテスト項目の差分だけを反映
+    overwrite=False: 既存シナリオには手を付けない
+    append=True: 既存シナリオにもテスト項目を常に追加（差分判定なし）
+
+    書き込みは1トランザクション（BEGIN IMMEDIATE）で行い、画面・テストケースは
+    プロジェクト単位の集合クエリで解決、テスト項目は一時テーブル経由で種類ごとに1文で反映する
+    """
+    # executemany 1回あたりの行数
+    BATCH_SIZE = 5000
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or scenario_db.DB_PATH
+
+    def import_all(self, all_data: Iterable[Dict[str, Any]], project_id: Optional[int] = None,
+                   project_name: Optional[str] = None, overwrite: bool = True,
+                   append: bool = False) -> List[Dict[str, Any]]:
+        """
+        全画面・シナリオを取り込み、シナリオごとの結果を返す
+        all_data: ScenarioLoader.iter_all_scenarios() のようなシートごとの抽出結果のイテラブル
+        （1シートずつ整形して取り込む値だけを残すため、シートの抽出結果全体は保持しない）
+        戻り値: [{"screen", "name", "status", "message", "inserted", "updated", "deleted", "unchanged"}, ...]
+        """
+        # 取込対象の整形（画面名・シナリオ名・テスト項目のバリデーション）
+        scenarios = []
+        for page in all_data:
+            screen_name = page["screen_name"].strip()
+            if not screen_name or len(screen_name) > NAME_MAX_LENGTH:
+                continue
+            for scenario in page["scenarios"]:
+                scenario_name = scenario["name"].strip()
+                if not scenario_name or len(scenario_name) > NAME_MAX_LENGTH:
+                    continue
+                items = [v for v in map(normalize_testitem, scenario.get("testitems", [])) if v]
+                scenarios.append((screen_name, scenario_name, items))
+        if not scenarios:
+            return []
+
+        conn = db_connection.get_connection(self.db_path)
+        with db_connection.transaction(conn, immediate=True) as cur:
+            return self._import(cur, scenarios, project_id, project_name, overwrite, append)
+
+    def _import(self, cur, scenarios, project_id, project_name, overwrite, append) -> List[Dict[str, Any]]:
+        pid = project_id if project_id else self._get_or_create_project(cur, project_name)
+        screen_ids = self._resolve_screens(cur, pid, {screen for screen, _, _ in scenarios})
+        existing_cases = self._load_cases(cur, pid)
+        new_cases = {(screen_ids[screen], name) for screen, name, _ in scenarios} - set(existing_cases)
+        case_ids = self._resolve_cases(cur, pid, new_cases) if new_cases else existing_cases
+        # 差分判定が必要な既存ケースのテスト項目だけを読み込む
+        diff_targets = set() if append or not overwrite else {
+            existing_cases[(screen_ids[screen], name)]
+            for screen, name, _ in scenarios if (screen_ids[screen], name) in existing_cases
+        }
+        current_items = self._load_items(cur, pid) if diff_targets else {}
+
+        inserts, updates, deletes = [], [], []
+        result_list = []
+        for screen_name, scenario_name, items in scenarios:
+            key = (screen_ids[screen_name], scenario_name)
+            cid = case_ids[key]
+            counts = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+            if key in existing_cases and not overwrite and not append:
+                msg = "既存シナリオを残しました"
+            elif cid in diff_targets:
+                diff_targets.discard(cid)
+                self._diff_case(cid, items, current_items.get(cid, []), inserts, updates, deletes, counts)
+                msg = "差分更新 (追加 {inserted} / 更新 {updated} / 削除 {deleted} / 変更なし {unchanged})".format(**counts)
+            else:
+                inserts.extend((cid, *values) for values in items)
+                counts["inserted"] = len(items)
+                msg = ("新規登録" if key not in existing_cases else "追加登録") + f" (追加 {len(items)})"
+            result_list.append({
+                "screen": screen_name, "name": scenario_name, "status": "成功", "message": msg, **counts
+            })
+
+        self._write_items(cur, inserts, updates, deletes)
+        return result_list
+
+    def _write_items(self, cur, inserts: list, updates: list, deletes: list) -> None:
+        """
+        テスト項目の追加・更新・削除をまとめて反映する
+        行はいったん一時テーブルに積み、本テーブルへは種類ごとに1文で反映する
+        （executemany で本テーブルに1行ずつ文を実行すると、全文検索インデックスの同期トリガーを含む
+        文の実行が行数分繰り返されるため。トリガー自体は FOR EACH ROW で行ごとに発火する）
+        一時テーブルの id は主キーにして、更新時の突き合わせを主キー検索にする
+        """
+        columns = ", ".join(TESTITEM_COLUMNS)
+        placeholders = ", ".join("?" * (len(TESTITEM_COLUMNS) + 1))
+        cur.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS import_items (id INTEGER PRIMARY KEY, test_case_id INTEGER, {columns})"
+        )
+        # Excelから消えた項目は削除（不具合の参照解除・実行履歴の削除はカスケード削除と共通）
+        cascade_delete.delete_test_items_in(cur, deletes)
+        if updates:
+            self._stage(cur, f"INSERT INTO import_items ({columns}, id) VALUES ({placeholders})", updates)
+            cur.execute(f"""
+                UPDATE test_items SET ({columns}) = (
+                    SELECT {columns} FROM temp.import_items st WHERE st.id = test_items.id
+                )
+                WHERE id IN (SELECT id FROM temp.import_items)
+            """)
+        if inserts:
+            self._stage(cur, f"INSERT INTO import_items (test_case_id, {columns}) VALUES ({placeholders})", inserts)
+            cur.execute(f"""
+                INSERT INTO test_items (test_case_id, {columns})
+                SELECT test_case_id, {columns} FROM temp.import_items ORDER BY rowid
+            """)
+        cur.execute("DELETE FROM temp.import_items")
+
+    def _stage(self, cur, sql: str, rows: list) -> None:
+        """一時テーブルを空にしてから rows を積む"""
+        cur.execute("DELETE FROM temp.import_items")
+        for chunk in _chunks(rows, self.BATCH_SIZE):
+            cur.executemany(sql, chunk)
+
+    @staticmethod
+    def _diff_case(case_id: int, items: List[Tuple[str, ...]], current: List[Tuple[int, Tuple[str, ...]]],
+                   inserts: list, updates: list, deletes: list, counts: Dict[str, int]) -> None:
+        """1テストケース分のテスト項目を突き合わせ、必要な書き込みを各リストに積む"""
+        existing = {}
+        ids = {}
+        for (key, values), (row_id, _) in zip(_keyed([values for _, values in current]), current):
+            existing[key] = values
+            ids[key] = row_id
+        for key, values in _keyed(items):
+            if key not in existing:
+                inserts.append((case_id, *values))
+                counts["inserted"] += 1
+            elif existing.pop(key) != values:
+                updates.append((*values, ids[key]))
+                counts["updated"] += 1
+            else:
+                counts["unchanged"] += 1
+        deletes.extend(ids[key] for key in existing)
+        counts["deleted"] = len(existing)
+
+    def _get_or_create_project(self, cur, project_name: str) -> int:
+        """プロジェクトがなければ作成し、IDを返す"""
+        cur.execute("SELECT id FROM projects WHERE name=?", (project_name,))
+        row = cur.fetchone()
+        if row:
+            return row[0]
+        cur.execute("INSERT INTO projects (name) VALUES (?)", (project_name,))
+        return cur.lastrowid
+
+    def _resolve_screens(self, cur, pid: int, names: Set[str]) -> Dict[str, int]:
+        """プロジェクトの画面を一括取得し、不足分はまとめて作成する（画面名→ID）"""
+        def load():
+            cur.execute("SELECT id, name FROM screens WHERE project_id=? ORDER BY id", (pid,))
+            screens = {}
+            for sid, name in cur.fetchall():
+                screens.setdefault(name, sid)
+            return screens
+        screens = load()
+        missing = sorted(names - set(screens))
+        if missing:
+            cur.executemany("INSERT INTO screens (project_id, name) VALUES (?, ?)", [(pid, n) for n in missing])
+            screens = load()
+        return screens
+
+    def _load_cases(self, cur, pid: int) -> Dict[Tuple[int, str], int]:
+        """プロジェクト配下のテストケースを一括取得（(画面ID, ケース名)→ID）"""
+        cur.execute("""
+            SELECT tc.id, tc.screen_id, tc.name
+            FROM test_cases tc JOIN screens s ON tc.screen_id = s.id
+            WHERE s.project_id = ?
+            ORDER BY tc.id
+        """, (pid,))
+        cases = {}
+        for cid, sid, name in cur.fetchall():
+            cases.setdefault((sid, name), cid)
+        return cases
+
+    def _resolve_cases(self, cur, pid: int, new_cases: Set[Tuple[int, str]]) -> Dict[Tuple[int, str], int]:
+        """不足しているテストケースをまとめて作成し、改めて一括取得する"""
+        cur.executemany("INSERT INTO test_cases (screen_id, name) VALUES (?, ?)", sorted(new_cases))
+        return self._load_cases(cur, pid)
+
+    def _load_items(self, cur, pid: int) -> Dict[int, List[Tuple[int, Tuple[str, ...]]]]:
+        """プロジェクト配下のテスト項目を一括取得（ケースID→[(項目ID, 値), ...]）"""
+        columns = ", ".join(f"ti.{c}" for c in TESTITEM_COLUMNS)
+        cur.execute(f"""
+            SELECT ti.id, ti.test_case_id, {columns}
+            FROM test_items ti
+            JOIN test_cases tc ON ti.test_case_id = tc.id
+            JOIN screens s ON tc.screen_id = s.id
+            WHERE s.project_id = ?
+            ORDER BY ti.test_case_id, ti.id
+        """, (pid,))
+        items: Dict[int, List[Tuple[int, Tuple[str, ...]]]] = {}
+        for row in cur:
+            values = tuple("" if v is None else str(v) for v in row[2:])
+            items.setdefault(row[1], []).append((row[0], values))
+        return items
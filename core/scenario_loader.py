@@ -1,9 +1,77 @@
 import openpyxl
-from typing import Any, Dict, List, Optional
+import os
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# インポート対象外とするシート名の接頭辞
+EXCLUDE_SHEET_PREFIXES = ("不具合報告", "共通項目", "サンプル")
+
+# 並列抽出に切り替える最小シート数（これ未満はプロセス起動コストの方が大きい）
+PARALLEL_MIN_SHEETS = 8
+
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def _row_value(row: Optional[Sequence[Any]], col: int) -> Any:
+    """
+    行タプルから列番号（1始まり）の値を取得（範囲外はNone）
+    """
+    if row is None or col > len(row):
+        return None
+    return row[col - 1]
+
+
+def _is_target_sheet(sheetname: str) -> bool:
+    return not any(sheetname.startswith(prefix) for prefix in EXCLUDE_SHEET_PREFIXES)
+
+
+def sheet_archive_members(scenario_path: str) -> List[Tuple[str, str]]:
+    """
+    xlsx（zip）内のシート名とシートXMLのメンバー名をブック上の順序で返す
+    戻り値: [(シート名, "xl/worksheets/sheet1.xml"), ...]
+    """
+    with zipfile.ZipFile(scenario_path) as zf:
+        workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+        rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    targets = {}
+    for rel in rels.iter(f"{_NS_PKG_REL}Relationship"):
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            member = target.lstrip("/")
+        else:
+            member = posixpath.normpath(posixpath.join("xl", target))
+        targets[rel.get("Id")] = member
+    members = []
+    for sheet in workbook.iter(f"{_NS_MAIN}sheet"):
+        members.append((sheet.get("name"), targets.get(sheet.get(f"{_NS_REL}id"), "")))
+    return members
+
+
+def _extract_sheets_worker(scenario_path: str, sheetnames: List[str]) -> List[Dict[str, Any]]:
+    """
+    ProcessPoolExecutor用: 指定シート群を1回だけ開いたブックから抽出して返す
+    """
+    return ScenarioLoader(scenario_path, streaming=True).extract_sheets(sheetnames)
+
 
 class ScenarioLoader:
-    def __init__(self, scenario_path: str):
+    def __init__(self, scenario_path: str, streaming: bool = False, max_workers: Optional[int] = 1, cache=None):
+        """
+        streaming=True の場合は読み取り専用ブックを行単位で読み進める
+        （巨大なExcelでもメモリ使用量が一定に保たれる）
+        max_workers: シート抽出に使うプロセス数（1=並列化なし、None=CPUコア数）
+        cache: 解析結果キャッシュ（core.scenario_cache.ScenarioParseCache）。指定時は変更のないシートを再解析しない
+        """
         self.scenario_path = scenario_path
+        self.streaming = streaming
+        self.max_workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+        self.cache = cache
 
     def extract_scenarios_from_sheet(self, ws) -> Optional[Dict[str, Any]]:
         """
@@ -79,16 +147,199 @@ class ScenarioLoader:
             "scenarios": scenarios
         }
 
+    def extract_scenarios_from_rows(self, title: str, rows: Iterable[Sequence[Any]]) -> Dict[str, Any]:
+        """
+        行タプルのイテレータから画面名・シナリオ・テスト項目を抽出（ストリーミング用）
+        extract_scenarios_from_sheet と同じ判定を、先読み数行分のバッファだけで行う
+        戻り値は extract_scenarios_from_sheet と同じ形式
+        """
+        it = iter(rows)
+        buf = deque()
+
+        def fill(n: int) -> bool:
+            # バッファにn行たまるまで読み進める（シート末尾ならFalse）
+            while len(buf) < n:
+                try:
+                    buf.append(next(it))
+                except StopIteration:
+                    return False
+            return True
+
+        # 画面名の取得（先頭2行のみ参照）
+        fill(2)
+        first = buf[0] if len(buf) > 0 else None
+        second = buf[1] if len(buf) > 1 else None
+        a1 = _row_value(first, 1) or ""
+        b1 = _row_value(first, 2) or ""
+        a2 = _row_value(second, 1) or ""
+        if a1 in ("テスト画面名", "画面名", "画面"):
+            screen_name = a2 if a2 else b1
+        else:
+            screen_name = a1
+        if not screen_name:
+            screen_name = title
+        print(f"[LOG] 画面名: {screen_name}")
+
+        scenarios = []
+        while fill(1):
+            if _row_value(buf[0], 1) != "シナリオ名":
+                buf.popleft()
+                continue
+            # A列に"シナリオ名"が現れたら、その直下がシナリオ名、さらに2行下がヘッダー
+            fill(3)
+            scenario_name = _row_value(buf[1], 1) if len(buf) > 1 else None
+            print(f"[LOG] シナリオ名検出: {scenario_name}")
+            header = buf[2] if len(buf) > 2 else None
+            if _row_value(header, 1) != "No":
+                print(f"[WARN] テスト項目ヘッダーが見つかりません (シナリオ名: {scenario_name})")
+                buf.popleft()
+                continue
+            headers = []
+            for value in header:
+                if value is None:
+                    break
+                headers.append(value)
+            print(f"[LOG] テスト項目ヘッダー: {headers}")
+            for _ in range(3):
+                buf.popleft()
+            scenario = {"name": scenario_name, "testitems": []}
+            # テスト項目データ抽出（次のシナリオ名や空行で終了し、その行は再判定する）
+            while fill(1):
+                row = buf[0]
+                first_col = _row_value(row, 1)
+                if first_col == "シナリオ名" or (first_col is None and _row_value(row, 2) is None):
+                    break
+                scenario["testitems"].append(
+                    {header: _row_value(row, i + 1) for i, header in enumerate(headers)}
+                )
+                buf.popleft()
+            print(f"[LOG] テスト項目抽出: {len(scenario['testitems'])}件")
+            scenarios.append(scenario)
+        return {
+            "screen_name": screen_name,
+            "scenarios": scenarios
+        }
+
+    def extract_sheets(self, sheetnames: List[str]) -> List[Dict[str, Any]]:
+        """
+        読み取り専用ブックを1回だけ開き、指定シートを順に抽出して返す
+        """
+        wb = openpyxl.load_workbook(self.scenario_path, read_only=True, data_only=True)
+        try:
+            results = []
+            for sheetname in sheetnames:
+                ws = wb[sheetname]
+                rows = ws.iter_rows(min_row=1, min_col=1, values_only=True)
+                results.append(self.extract_scenarios_from_rows(ws.title, rows))
+            return results
+        finally:
+            wb.close()
+
+    def _extract_sheets_parallel(self, members: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        シートをプロセスプールに分配して抽出し、元のシート順で返す
+        シートXMLのサイズが均等になるようにワーカーごとの担当シートを割り振る
+        （各ワーカーはブックを1回だけ開く）
+        """
+        with zipfile.ZipFile(self.scenario_path) as zf:
+            sizes = [zf.getinfo(member).file_size if member else 0 for _, member in members]
+        workers = min(self.max_workers, len(members))
+        buckets = [[] for _ in range(workers)]
+        loads = [0] * workers
+        # 大きいシートから順に、負荷の最も小さいワーカーへ割り当てる
+        for idx in sorted(range(len(members)), key=lambda i: sizes[i], reverse=True):
+            target = loads.index(min(loads))
+            buckets[target].append(idx)
+            loads[target] += sizes[idx]
+        buckets = [sorted(bucket) for bucket in buckets if bucket]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(members)
+        with ProcessPoolExecutor(max_workers=len(buckets)) as executor:
+            futures = [
+                executor.submit(_extract_sheets_worker, self.scenario_path, [members[i][0] for i in bucket])
+                for bucket in buckets
+            ]
+            for bucket, future in zip(buckets, futures):
+                for idx, data in zip(bucket, future.result()):
+                    results[idx] = data
+        return results
+
+    def _extract_members(self, members: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """指定シート群を抽出（シート数が多ければプロセスプールを使う）"""
+        if self.max_workers > 1 and len(members) >= PARALLEL_MIN_SHEETS:
+            return self._extract_sheets_parallel(members)
+        return self.extract_sheets([name for name, _ in members])
+
+    def _iter_with_cache(self, members: List[Tuple[str, str]]) -> Iterator[Dict[str, Any]]:
+        """
+        キャッシュを使って全対象シートをシート順に返すジェネレータ
+        ファイル自体が同一ならブックキーから、そうでなければ変更のあったシートだけを再解析する
+        キャッシュにあるシートは返す直前に1シートずつ読み込む（保持するのは再解析したシートだけ）
+        """
+        cache = self.cache
+        file_key = cache.file_key(self.scenario_path)
+        keys = cache.get(file_key)
+        if keys is None or len(keys) != len(members) or not all(cache.contains(key) for key in keys):
+            keys = cache.sheet_keys(self.scenario_path, members)
+        missing = [i for i, key in enumerate(keys) if not cache.contains(key)]
+        print(f"[LOG] 解析キャッシュ使用: {len(members) - len(missing)}/{len(members)}シート")
+        parsed: Dict[int, Dict[str, Any]] = {}
+        if missing:
+            for idx, data in zip(missing, self._extract_members([members[i] for i in missing])):
+                parsed[idx] = data
+                cache.put(keys[idx], data)
+        cache.put(file_key, keys)
+        cache.evict()
+        for idx, key in enumerate(keys):
+            data = parsed.pop(idx, None)
+            if data is None:
+                data = cache.get(key)
+            if data is None:
+                # 読み込みの間に削除された場合はそのシートだけ解析し直す
+                data = self._extract_members([members[idx]])[0]
+            yield data
+
+    def iter_all_scenarios(self) -> Iterator[Dict[str, Any]]:
+        """
+        読み取り専用モードでブックを開き、シートごとの抽出結果を順に返すジェネレータ
+        1シート分の結果を返した時点でそのシートの行データは破棄される
+        キャッシュ指定時はキャッシュにあるシートを1シートずつ読み込んで返す
+        （再解析したシート・並列抽出したシートは抽出後まとめて保持してから順に返す）
+        """
+        members = [m for m in sheet_archive_members(self.scenario_path) if _is_target_sheet(m[0])]
+        if self.cache is not None:
+            results: Optional[Iterable[Dict[str, Any]]] = self._iter_with_cache(members)
+        elif self.max_workers > 1 and len(members) >= PARALLEL_MIN_SHEETS:
+            results = self._extract_sheets_parallel(members)
+        else:
+            results = None
+        if results is not None:
+            for data in results:
+                if data and data["scenarios"]:
+                    yield data
+            return
+        wb = openpyxl.load_workbook(self.scenario_path, read_only=True, data_only=True)
+        try:
+            for sheetname, _ in members:
+                ws = wb[sheetname]
+                rows = ws.iter_rows(min_row=1, min_col=1, values_only=True)
+                data = self.extract_scenarios_from_rows(ws.title, rows)
+                if data and data["scenarios"]:
+                    yield data
+        finally:
+            wb.close()
+
     def load_all_scenarios(self) -> List[Dict[str, Any]]:
         """
         全シートからシナリオデータを抽出し整形
         戻り値: [ { ... }, ... ]
+        （全シート分を保持する。取り込みには iter_all_scenarios をそのまま ScenarioImporter.import_all に渡す）
         """
+        if self.streaming or self.max_workers > 1 or self.cache is not None:
+            return list(self.iter_all_scenarios())
         wb = openpyxl.load_workbook(self.scenario_path, data_only=True)
-        exclude_prefixes = ("不具合報告", "共通項目", "サンプル")
         all_data = []
         for sheetname in wb.sheetnames:
-            if any(sheetname.startswith(prefix) for prefix in exclude_prefixes):
+            if not _is_target_sheet(sheetname):
                 continue
             ws = wb[sheetname]
             data = self.extract_scenarios_from_sheet(ws)
@@ -0,0 +1,409 @@
+"""
+自動実行のスクリーンショット
+ブラウザから取得したPNGをそのまま上限付きのキューに積み、縮小・圧縮・保存はワーカースレッドで行う
+（撮影した手順のワーカーは画像の処理・ファイル書き込みを待たない）
+・画像は元のPNGのSHA-256で保存する（同じ画面は1回だけ保存し、参照だけを増やす）
+    <保存先>/ab/abcdef....jpg、サムネイルは <保存先>/thumbs/ab/abcdef....jpg
+  保存先はDBファイルと同じフォルダの screenshots に固定する
+  （screenshot_files のパスは保存先からの相対パスで、重複の判定・保存の上限もDB全体で行うため、
+  DBごとに保存先は1つにする）
+・Pillow（requirements.txt）で幅 max_width まで縮小してJPEGで保存し、サムネイルも作る
+  Pillow を読み込めない環境では元のPNGのまま保存し、サムネイルは作らない
+・保存期間・保存する実行数・合計サイズの上限を超えた分は apply_retention で古いものから削除する
+
+pipeline = ScreenshotPipeline()
+pipeline.submit(driver.get_screenshot_as_png(), run_id=..., test_case_id=..., test_item_id=..., step_no=...)
+pipeline.close()   # 残りを保存して保存期間などの上限を適用
+"""
+import datetime
+import hashlib
+import io
+import os
+import queue
+import struct
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from core import scenario_db
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow を読み込めない場合は縮小・再圧縮せずに元のPNGのまま保存する
+    Image = None
+
+# 保存する画像の最大幅・JPEGの品質
+DEFAULT_MAX_WIDTH = 1280
+JPEG_QUALITY = 80
+# サムネイルの最大幅・JPEGの品質（結果記録画面の一覧用）
+THUMBNAIL_WIDTH = 240
+THUMBNAIL_QUALITY = 70
+# キューに積める画像の数・キューが空くまで待つ時間（秒、超えた分は保存しない）
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_SUBMIT_TIMEOUT = 0.5
+DEFAULT_WORKERS = 2
+# 1回の書き込みトランザクションにまとめる件数
+DB_BATCH_SIZE = 50
+# 保存の上限（None で無効）
+DEFAULT_MAX_TOTAL_MB: Optional[float] = 1024.0
+DEFAULT_MAX_AGE_DAYS: Optional[int] = 30
+DEFAULT_KEEP_RUNS: Optional[int] = None
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# キューの終端
+_STOP = object()
+
+
+def screenshot_directory() -> str:
+    """保存先（DBファイルと同じフォルダの screenshots）"""
+    return os.path.join(os.path.dirname(scenario_db.DB_PATH), "screenshots")
+
+
+def png_size(png: bytes) -> Tuple[Optional[int], Optional[int]]:
+    """PNGのヘッダー（IHDR）から (幅, 高さ) を読む（PNGでない場合は (None, None)）"""
+    if len(png) < 24 or not png.startswith(_PNG_SIGNATURE):
+        return None, None
+    return struct.unpack(">II", png[16:24])
+
+
+class ScreenshotPipeline:
+    """
+    スクリーンショットの非同期保存
+    ・workers: 縮小・圧縮・保存を行うスレッド数
+    ・queue_size / submit_timeout: キューの上限と、満杯のときに submit が待つ時間（超えた分は捨てて数える）
+    ・max_total_mb / max_age_days / keep_runs: close 時に適用する保存の上限（apply_retention）
+    """
+    def __init__(self, workers: int = DEFAULT_WORKERS,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, submit_timeout: float = DEFAULT_SUBMIT_TIMEOUT,
+                 max_width: int = DEFAULT_MAX_WIDTH, max_total_mb: Optional[float] = DEFAULT_MAX_TOTAL_MB,
+                 max_age_days: Optional[int] = DEFAULT_MAX_AGE_DAYS, keep_runs: Optional[int] = DEFAULT_KEEP_RUNS):
+        if workers < 1:
+            raise ValueError("workersは1以上である必要があります")
+        self.directory = screenshot_directory()
+        self.submit_timeout = submit_timeout
+        self.max_width = max_width
+        self.max_total_mb = max_total_mb
+        self.max_age_days = max_age_days
+        self.keep_runs = keep_runs
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        # 件数（受け付け・新規保存・保存済みの画像と同じ・キューが満杯で捨てた・失敗）
+        self.stats = {"submitted": 0, "stored": 0, "deduplicated": 0, "dropped": 0, "failed": 0}
+        # このパイプラインで screenshot_files への登録まで済んだ画像のハッシュ
+        self._stored: set = set()
+        # 保存中（ファイルの書き込み〜登録のコミット前）の画像のハッシュ → その間に届いた同じ画像の参照
+        # 参照は保存したワーカーが登録と一緒に書き込み、保存に失敗した場合は捨てる
+        self._storing: Dict[str, List[Tuple]] = {}
+        self._workers = [threading.Thread(target=self._loop, name=f"screenshot-{i}", daemon=True)
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, png: bytes, run_id: Optional[int] = None, test_case_id: Optional[int] = None,
+               test_item_id: Optional[int] = None, step_no: Optional[int] = None) -> bool:
+        """
+        PNGを保存待ちに積む（戻り値: 積めたか）
+        キューが submit_timeout 秒空かない場合は保存せずに False（撮影したワーカーを止めない）
+        """
+        entry = (png, run_id, test_case_id, test_item_id, step_no, _now_text())
+        try:
+            self._queue.put(entry, timeout=self.submit_timeout)
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("submitted")
+        return True
+
+    def close(self, apply_retention: bool = True) -> Dict[str, int]:
+        """保存待ちをすべて保存してワーカーを終え、保存の上限を適用して件数を返す"""
+        for _ in self._workers:
+            self._queue.put(_STOP)
+        for worker in self._workers:
+            worker.join()
+        if apply_retention:
+            self.apply_retention()
+        print(f"[LOG] スクリーンショット: 受付{self.stats['submitted']}件 保存{self.stats['stored']}件 "
+              f"重複{self.stats['deduplicated']}件 破棄{self.stats['dropped']}件 失敗{self.stats['failed']}件")
+        return dict(self.stats)
+
+    def apply_retention(self) -> Dict[str, int]:
+        """保存の上限を適用する（このパイプラインの設定で apply_retention を呼ぶ）"""
+        return apply_retention(self.max_total_mb, self.max_age_days, self.keep_runs)
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += n
+
+    # ------------------------------ ワーカー ------------------------------
+    def _loop(self) -> None:
+        # [(参照の一覧, screenshot_files に書き込む内容 または None), ...]
+        pending: List[Tuple[List[Tuple], Optional[Tuple]]] = []
+        while True:
+            try:
+                entry = self._queue.get(timeout=1.0 if pending else None)
+            except queue.Empty:
+                # しばらく新しい画像がなければ、たまった分を書き込む
+                self._flush(pending)
+                continue
+            if entry is _STOP:
+                self._flush(pending)
+                return
+            try:
+                processed = self._process(*entry)
+                if processed is not None:
+                    pending.append(processed)
+            except Exception as e:
+                self._count("failed")
+                print(f"[WARN] スクリーンショットの保存に失敗しました: {e}")
+            if len(pending) >= DB_BATCH_SIZE:
+                self._flush(pending)
+
+    def _process(self, png: bytes, run_id, test_case_id, test_item_id, step_no,
+                 captured_at) -> Optional[Tuple[List[Tuple], Optional[Tuple]]]:
+        """
+        画像を保存し、DBに書き込む (参照の一覧, screenshot_files の内容) を返す
+        同じ画像が登録済みの場合はファイルを書かずに参照だけを返し、
+        別のワーカーが保存中の場合は参照をそのワーカーに預けて None を返す
+        """
+        content_hash = hashlib.sha256(png).hexdigest()
+        reference = (content_hash, run_id, test_case_id, test_item_id, step_no, captured_at)
+        with self._lock:
+            if content_hash in self._stored:
+                self.stats["deduplicated"] += 1
+                return [reference], None
+            waiting = self._storing.get(content_hash)
+            if waiting is not None:
+                waiting.append(reference)
+                self.stats["deduplicated"] += 1
+                return None
+            self._storing[content_hash] = []
+        try:
+            if _find_file(content_hash) is not None:
+                # 以前の実行で登録済み
+                self._count("deduplicated")
+                self._finish_storing([content_hash])
+                return [reference], None
+            return [reference], self._store(png, content_hash, captured_at)
+        except Exception:
+            # 保存できなかった画像への参照は登録しない（預かっていた参照も捨てる）
+            self._count("failed", len(self._discard_storing([content_hash])))
+            raise
+
+    def _take_waiting(self, hashes: List[str]) -> List[Tuple]:
+        """保存中の画像に預けられた参照を受け取る（保存中のまま。以降に届いた参照は引き続き預かる）"""
+        references = []
+        with self._lock:
+            for content_hash in hashes:
+                references.extend(self._storing.get(content_hash, ()))
+                self._storing[content_hash] = []
+        return references
+
+    def _finish_storing(self, hashes: List[str]) -> List[Tuple]:
+        """登録済みにして、最後に預けられた参照を返す（以降の同じ画像は参照だけを書き込む）"""
+        references = []
+        with self._lock:
+            for content_hash in hashes:
+                references.extend(self._storing.pop(content_hash, ()))
+                self._stored.add(content_hash)
+        return references
+
+    def _discard_storing(self, hashes: List[str]) -> List[Tuple]:
+        """保存中の状態を取り消し、預けられていた参照を返す（次に届いた同じ画像は保存し直す）"""
+        references = []
+        with self._lock:
+            for content_hash in hashes:
+                references.extend(self._storing.pop(content_hash, ()))
+        return references
+
+    def _store(self, png: bytes, content_hash: str, captured_at: str) -> Tuple:
+        """画像（とサムネイル）をファイルに保存し、screenshot_files に書き込む内容を返す"""
+        if Image is not None:
+            image_bytes, thumbnail_bytes, width, height = self._compress(png)
+            ext = ".jpg"
+        else:
+            image_bytes, thumbnail_bytes = png, None
+            width, height = png_size(png)
+            ext = ".png"
+        path = os.path.join(content_hash[:2], content_hash + ext)
+        _write_atomic(os.path.join(self.directory, path), image_bytes)
+        thumbnail_path = None
+        if thumbnail_bytes is not None:
+            thumbnail_path = os.path.join("thumbs", content_hash[:2], content_hash + ".jpg")
+            _write_atomic(os.path.join(self.directory, thumbnail_path), thumbnail_bytes)
+        self._count("stored")
+        size = len(image_bytes) + len(thumbnail_bytes or b"")
+        return content_hash, path, thumbnail_path, width, height, size, captured_at
+
+    def _compress(self, png: bytes) -> Tuple[bytes, bytes, int, int]:
+        """幅 max_width まで縮小したJPEGとサムネイルを作る"""
+        resample = getattr(Image, "Resampling", Image).LANCZOS
+        with Image.open(io.BytesIO(png)) as source:
+            image = source.convert("RGB")
+        if image.width > self.max_width:
+            image = image.resize((self.max_width, max(1, round(image.height * self.max_width / image.width))),
+                                 resample)
+        out = io.BytesIO()
+        image.save(out, "JPEG", quality=JPEG_QUALITY, optimize=True)
+        thumbnail = image.copy()
+        thumbnail.thumbnail((THUMBNAIL_WIDTH, THUMBNAIL_WIDTH * 4), resample)
+        thumb_out = io.BytesIO()
+        thumbnail.save(thumb_out, "JPEG", quality=THUMBNAIL_QUALITY)
+        return out.getvalue(), thumb_out.getvalue(), image.width, image.height
+
+    def _flush(self, pending: List[Tuple[List[Tuple], Optional[Tuple]]]) -> None:
+        """
+        ためた画像・参照をまとめて1トランザクションで書き込む
+        保存した画像に預けられた参照は、画像の登録と同じトランザクションで書き込む
+        （screenshot_files に行のない参照を残さない）
+        """
+        if not pending:
+            return
+        files = [file for _, file in pending if file is not None]
+        references = [reference for entry_references, _ in pending for reference in entry_references]
+        pending.clear()
+        hashes = [file[0] for file in files]
+        references.extend(self._take_waiting(hashes))
+        try:
+            self._insert(files, references)
+        except Exception as e:
+            discarded = len(references) + len(self._discard_storing(hashes))
+            self._count("failed", discarded)
+            print(f"[WARN] スクリーンショットの登録に失敗しました（{discarded}件）: {e}")
+            return
+        # 書き込みの間に預けられた参照は、画像の登録がコミットされてから書き込む
+        late = self._finish_storing(hashes)
+        if late:
+            try:
+                self._insert([], late)
+            except Exception as e:
+                self._count("failed", len(late))
+                print(f"[WARN] スクリーンショットの登録に失敗しました（{len(late)}件）: {e}")
+
+    @staticmethod
+    def _insert(files: List[Tuple], references: List[Tuple]) -> None:
+        with scenario_db.transaction(immediate=True) as cur:
+            cur.executemany("""
+                INSERT OR IGNORE INTO screenshot_files
+                    (content_hash, path, thumbnail_path, width, height, size, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, files)
+            cur.executemany("""
+                INSERT INTO screenshots (content_hash, run_id, test_case_id, test_item_id, step_no, captured_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, references)
+
+
+def _now_text() -> str:
+    return datetime.datetime.now().isoformat(sep=" ", timespec="milliseconds")
+
+
+def _find_file(content_hash: str) -> Optional[Tuple]:
+    return scenario_db.get_connection().execute(
+        "SELECT path, thumbnail_path FROM screenshot_files WHERE content_hash = ?", (content_hash,)
+    ).fetchone()
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """一時ファイルに書いてから置き換える（同じ画像を同時に保存しても壊れたファイルにならない）"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+# ------------------------------ 保存の上限 ------------------------------
+def apply_retention(max_total_mb: Optional[float] = DEFAULT_MAX_TOTAL_MB,
+                    max_age_days: Optional[int] = DEFAULT_MAX_AGE_DAYS,
+                    keep_runs: Optional[int] = DEFAULT_KEEP_RUNS) -> Dict[str, int]:
+    """
+    保存の上限を超えたスクリーンショットを古いものから削除し、{"references", "files", "bytes"} の削除件数を返す
+    1. 撮影から max_age_days 日を過ぎた参照を削除
+    2. 新しい実行 keep_runs 件より前の実行の参照を削除
+    3. どこからも参照されなくなった画像を削除
+    4. 画像の合計が max_total_mb を超えている場合、最後に参照された時期の古い画像から参照ごと削除
+    """
+    directory = screenshot_directory()
+    removed = {"references": 0, "files": 0, "bytes": 0}
+    doomed: List[Tuple[str, Optional[str]]] = []
+    with scenario_db.transaction(immediate=True) as cur:
+        if max_age_days is not None:
+            limit = (datetime.datetime.now() - datetime.timedelta(days=max_age_days)).isoformat(sep=" ")
+            cur.execute("DELETE FROM screenshots WHERE captured_at < ?", (limit,))
+            removed["references"] += cur.rowcount
+        if keep_runs is not None:
+            cur.execute("""
+                DELETE FROM screenshots WHERE run_id IN (
+                    SELECT id FROM test_runs WHERE id NOT IN (SELECT id FROM test_runs ORDER BY id DESC LIMIT ?)
+                )
+            """, (keep_runs,))
+            removed["references"] += cur.rowcount
+        unreferenced = cur.execute("""
+            SELECT content_hash, path, thumbnail_path, size FROM screenshot_files f
+            WHERE NOT EXISTS (SELECT 1 FROM screenshots s WHERE s.content_hash = f.content_hash)
+        """).fetchall()
+        if max_total_mb is not None:
+            total = cur.execute("SELECT COALESCE(SUM(size), 0) FROM screenshot_files").fetchone()[0]
+            excess = total - sum(row[3] for row in unreferenced) - max_total_mb * 1024 * 1024
+            if excess > 0:
+                # 最後に参照された時期の古い画像から、超えた分を削除
+                for row in cur.execute("""
+                    SELECT f.content_hash, f.path, f.thumbnail_path, f.size FROM screenshot_files f
+                    JOIN screenshots s ON s.content_hash = f.content_hash
+                    GROUP BY f.content_hash ORDER BY MAX(s.id)
+                """).fetchall():
+                    if excess <= 0:
+                        break
+                    unreferenced.append(row)
+                    excess -= row[3]
+        hashes = [(row[0],) for row in unreferenced]
+        cur.executemany("DELETE FROM screenshots WHERE content_hash = ?", hashes)
+        removed["references"] += cur.rowcount
+        cur.executemany("DELETE FROM screenshot_files WHERE content_hash = ?", hashes)
+        removed["files"] = len(hashes)
+        removed["bytes"] = sum(row[3] for row in unreferenced)
+        doomed = [(row[1], row[2]) for row in unreferenced]
+    # ファイルはコミットしてから削除（ロールバックされた場合に参照だけが残らないように）
+    for path, thumbnail_path in doomed:
+        for relative in (path, thumbnail_path):
+            if relative:
+                try:
+                    os.remove(os.path.join(directory, relative))
+                except FileNotFoundError:
+                    pass
+    if removed["references"] or removed["files"]:
+        print(f"[LOG] スクリーンショット整理: 参照{removed['references']}件 画像{removed['files']}件 "
+              f"({removed['bytes'] / 1024 / 1024:.1f}MB)")
+    return removed
+
+
+# ------------------------------ 参照 ------------------------------
+def get_screenshots(test_item_id: Optional[int] = None, run_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    テスト項目・実行のスクリーンショット（新しい順）
+    [{"id", "run_id", "test_case_id", "test_item_id", "step_no", "captured_at",
+      "path", "thumbnail_path"（絶対パス、サムネイルがない場合は None）, "width", "height"}, ...]
+    """
+    conditions = []
+    params: List[Any] = []
+    if test_item_id is not None:
+        conditions.append("s.test_item_id = ?")
+        params.append(test_item_id)
+    if run_id is not None:
+        conditions.append("s.run_id = ?")
+        params.append(run_id)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    directory = screenshot_directory()
+    rows = scenario_db.get_connection().execute(f"""
+        SELECT s.id, s.run_id, s.test_case_id, s.test_item_id, s.step_no, s.captured_at,
+               f.path, f.thumbnail_path, f.width, f.height
+        FROM screenshots s JOIN screenshot_files f ON f.content_hash = s.content_hash
+        {where} ORDER BY s.id DESC
+    """, params).fetchall()
+    keys = ("id", "run_id", "test_case_id", "test_item_id", "step_no", "captured_at")
+    return [{
+        **dict(zip(keys, row[:6])),
+        "path": os.path.join(directory, row[6]),
+        "thumbnail_path": os.path.join(directory, row[7]) if row[7] else None,
+        "width": row[8],
+        "height": row[9],
+    } for row in rows]
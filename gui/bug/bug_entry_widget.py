@@ -3,12 +3,13 @@
 """
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QFormLayout, QLineEdit, QTextEdit, QComboBox, QDateEdit, QScrollArea, QPushButton, QHBoxLayout, QMessageBox, QLabel
 from PyQt5.QtCore import QDate
-import sqlite3
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core import scenario_db
+from core.hierarchy_store import get_store, PROJECT, SCREEN, ADDED, REMOVED, RESET
 from gui.common.constants import *
+from gui.common.hierarchy_view import subscribe_hierarchy, insert_entry, remove_entries
 
 class BugEntryWidget(QWidget):
     """
@@ -16,9 +17,12 @@ class BugEntryWidget(QWidget):
     """
     def __init__(self, parent=None):
         super().__init__(parent)
+        self._projects = []
+        self._screens = []
         self._init_ui()
         self._load_projects()
         self._load_master_data()
+        subscribe_hierarchy(self, self._on_hierarchy_changed)
 
     def _init_ui(self):
         """UI要素の初期化（各部品ごとに分割）"""
@@ -117,46 +121,55 @@ class BugEntryWidget(QWidget):
 
     def _load_projects(self):
         """プロジェクト一覧をロードし、画面名も連動更新"""
+        self._projects = get_store().get_projects()
+        self.project_combo.blockSignals(True)
         self.project_combo.clear()
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT id, name FROM projects ORDER BY id")
-            self._projects = cur.fetchall()
-            for pid, name in self._projects:
-                self.project_combo.addItem(name, pid)
+        for pid, name in self._projects:
+            self.project_combo.addItem(name, pid)
+        self.project_combo.blockSignals(False)
         self._on_project_changed()
 
+    def _current_project_id(self):
+        idx = self.project_combo.currentIndex()
+        if idx < 0 or idx >= len(self._projects):
+            return None
+        return self._projects[idx][0]
+
     def _on_project_changed(self):
         """プロジェクト選択時に画面名を更新"""
+        self._screens = get_store().get_screens(self._current_project_id())
         self.screen_name_combo.clear()
-        idx = self.project_combo.currentIndex()
-        if idx < 0 or not hasattr(self, '_projects') or idx >= len(self._projects):
-            return
-        pid = self._projects[idx][0]
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT id, name FROM screens WHERE project_id=? ORDER BY id", (pid,))
-            screens = cur.fetchall()
-            for sid, name in screens:
-                self.screen_name_combo.addItem(name, sid)
+        for sid, name in self._screens:
+            self.screen_name_combo.addItem(name, sid)
+
+    def _on_hierarchy_changed(self, event):
+        """階層の変更をプロジェクト・画面名の選択肢に反映"""
+        if event.kind == RESET:
+            self._load_projects()
+        elif event.level == PROJECT:
+            if event.kind == ADDED:
+                insert_entry(self.project_combo, self._projects, event.ids[0], event.name)
+            elif event.kind == REMOVED:
+                remove_entries(self.project_combo, self._projects, event.ids)
+        elif event.level == SCREEN:
+            if event.kind == ADDED and event.parent_id == self._current_project_id():
+                insert_entry(self.screen_name_combo, self._screens, event.ids[0], event.name)
+            elif event.kind == REMOVED:
+                remove_entries(self.screen_name_combo, self._screens, event.ids)
 
     def _load_master_data(self):
         """マスターデータをコンボボックスにロード（画面名は除外）"""
+        master = scenario_db.get_all_master_data()
         # 原因カテゴリ
-        cause_categories = scenario_db.get_master_data("master_cause_categories")
-        self.cause_category_combo.addItems(cause_categories)
+        self.cause_category_combo.addItems(master["master_cause_categories"])
         # 重要度
-        severities = scenario_db.get_master_data("master_severities")
-        self.severity_combo.addItems(severities)
+        self.severity_combo.addItems(master["master_severities"])
         # 再現性
-        reproducibilities = scenario_db.get_master_data("master_reproducibilities")
-        self.reproducibility_combo.addItems(reproducibilities)
+        self.reproducibility_combo.addItems(master["master_reproducibilities"])
         # 状態
-        statuses = scenario_db.get_master_data("master_statuses")
-        self.status_combo.addItems(statuses)
+        self.status_combo.addItems(master["master_statuses"])
         # 対応者
-        testers = scenario_db.get_master_data("master_testers")
-        self.assignee_combo.addItems(testers)
+        self.assignee_combo.addItems(master["master_testers"])
 
     def _get_form_data(self):
         """フォームデータを辞書型で取得"""
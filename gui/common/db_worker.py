@@ -0,0 +1,164 @@
+"""
+DB読み込みのバックグラウンド実行
+クエリはDB専用のスレッドプールで実行し、結果はシグナル経由でUIスレッドに返す
+同じチャネルへ新しい要求が来たら古い要求は破棄（実行中ならSQLiteの処理を中断）する
+"""
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Optional, Set
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+from PyQt5.QtWidgets import QProgressBar
+
+from core import scenario_db
+
+# DB読み込み用スレッド数（スレッドごとにコネクションを持つため少数に固定）
+DB_THREAD_COUNT = 2
+# ビジー表示を出すまでの待ち時間（ミリ秒、一瞬で終わる読み込みではちらつかせない）
+BUSY_INDICATOR_DELAY_MS = 150
+
+_pool: Optional[QThreadPool] = None
+
+
+def db_thread_pool() -> QThreadPool:
+    """
+    DB読み込み用のスレッドプール（アプリ全体で共有）
+    スレッドを終了させないことで、スレッドごとのコネクションを使い回す
+    """
+    global _pool
+    if _pool is None:
+        _pool = QThreadPool()
+        _pool.setMaxThreadCount(DB_THREAD_COUNT)
+        _pool.setExpiryTimeout(-1)
+    return _pool
+
+
+class _TaskSignals(QObject):
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+
+
+class _QueryTask(QRunnable):
+    """1回分のクエリ実行（ワーカースレッド側）"""
+    def __init__(self, func: Callable[..., Any], args: tuple):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.func = func
+        self.args = args
+        self.signals = _TaskSignals()
+        self.cancelled = False
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def run(self):
+        if self.cancelled:
+            self.signals.finished.emit(None)
+            return
+        conn = scenario_db.get_connection()
+        with self._lock:
+            self._conn = conn
+        try:
+            result = self.func(*self.args)
+        except Exception as e:
+            self.signals.failed.emit(e)
+        else:
+            self.signals.finished.emit(result)
+        finally:
+            with self._lock:
+                self._conn = None
+            # 中断・例外で残ったトランザクションを片付ける
+            if conn.in_transaction:
+                conn.rollback()
+
+    def cancel(self):
+        """実行前なら実行しない、実行中ならSQLiteの処理を中断する"""
+        self.cancelled = True
+        with self._lock:
+            if self._conn is not None:
+                self._conn.interrupt()
+
+
+class QueryRunner(QObject):
+    """
+    チャネル単位の非同期クエリ実行
+    runner.request("screens", scenario_db.get_screens, pid, on_result=self._on_screens_loaded)
+    ・同じチャネルの新しい要求が来ると古い要求の結果は捨てる（実行中なら中断）
+    ・on_result / on_error はUIスレッドで呼ばれる
+    ・実行中の要求があるかどうかを busy_changed で通知する
+    """
+    busy_changed = pyqtSignal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._current: Dict[str, _QueryTask] = {}
+        # 完了通知を受けるまでタスクを保持する（破棄済みの要求も含む）
+        self._running: Set[_QueryTask] = set()
+
+    def request(self, channel: str, func: Callable[..., Any], *args: Any,
+                on_result: Callable[[Any], None],
+                on_error: Optional[Callable[[Exception], None]] = None) -> None:
+        """func(*args) をワーカースレッドで実行し、結果を on_result に渡す"""
+        self.cancel(channel)
+        task = _QueryTask(func, args)
+        self._current[channel] = task
+        task.signals.finished.connect(lambda result: self._on_done(channel, task, result, on_result))
+        task.signals.failed.connect(lambda error: self._on_done(channel, task, error, on_error or self._report_error))
+        self._running.add(task)
+        if len(self._running) == 1:
+            self.busy_changed.emit(True)
+        db_thread_pool().start(task)
+
+    def cancel(self, *channels: str) -> None:
+        """指定チャネル（省略時は全チャネル）の要求を破棄する"""
+        for channel in channels or list(self._current):
+            task = self._current.pop(channel, None)
+            if task is not None:
+                task.cancel()
+
+    def is_busy(self) -> bool:
+        return bool(self._running)
+
+    def is_pending(self, channel: str) -> bool:
+        """指定チャネルの要求が結果待ちかどうか"""
+        return channel in self._current
+
+    def _on_done(self, channel: str, task: _QueryTask, value: Any, callback: Callable[[Any], None]) -> None:
+        self._running.discard(task)
+        if not self._running:
+            self.busy_changed.emit(False)
+        if task.cancelled or self._current.get(channel) is not task:
+            return
+        del self._current[channel]
+        callback(value)
+
+    @staticmethod
+    def _report_error(error: Exception) -> None:
+        print(f"[WARN] DB読み込みに失敗しました: {error}")
+
+
+class BusyIndicator(QProgressBar):
+    """
+    読み込み中だけ表示する細いプログレスバー（不定進捗）
+    indicator.attach(runner) で QueryRunner のビジー状態に連動する
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setRange(0, 0)
+        self.setTextVisible(False)
+        self.setMaximumHeight(6)
+        self.hide()
+        self._busy = False
+
+    def attach(self, runner: QueryRunner) -> None:
+        runner.busy_changed.connect(self.set_busy)
+
+    def set_busy(self, busy: bool) -> None:
+        self._busy = busy
+        if busy:
+            QTimer.singleShot(BUSY_INDICATOR_DELAY_MS, self._show_if_busy)
+        else:
+            self.hide()
+
+    def _show_if_busy(self) -> None:
+        if self._busy:
+            self.show()
@@ -0,0 +1,55 @@
+"""
+階層ストア（core.hierarchy_store）と画面部品の連携
+・subscribe_hierarchy: ウィジェットが破棄されるまで変更通知を受け取る
+・insert_entry / remove_entries: 通知された差分だけをコンボボックス・リストに反映する
+  （rows は表示と同じ並びの [(id, name), ...]。各画面の self._projects などをそのまま渡す）
+"""
+import bisect
+from typing import Callable, Iterable, List, Tuple, Union
+
+from PyQt5.QtWidgets import QComboBox, QListWidget, QWidget
+
+from core.hierarchy_store import ChangeEvent, get_store
+
+EntryView = Union[QComboBox, QListWidget]
+
+
+def subscribe_hierarchy(widget: QWidget, callback: Callable[[ChangeEvent], None]) -> None:
+    """widget が破棄されるまで階層ストアの変更通知を callback で受け取る"""
+    unsubscribe = get_store().subscribe(callback)
+    widget.destroyed.connect(lambda *_: unsubscribe())
+
+
+def insert_entry(view: EntryView, rows: List[Tuple[int, str]], entry_id: int, name: str,
+                 offset: int = 0) -> None:
+    """
+    id順の一覧に1件追加する（offset: 先頭の固定項目「(すべて)」などの数）
+    空の一覧に追加した場合は先頭を選択する（選択変更の通知で下位の一覧が読み込まれる）
+    """
+    pos = bisect.bisect_left(rows, (entry_id,))
+    if pos < len(rows) and rows[pos][0] == entry_id:
+        return
+    rows.insert(pos, (entry_id, name))
+    if isinstance(view, QComboBox):
+        view.insertItem(pos + offset, name, entry_id)
+    else:
+        view.insertItem(pos + offset, name)
+        if view.currentRow() < 0:
+            view.setCurrentRow(0)
+
+
+def remove_entries(view: EntryView, rows: List[Tuple], ids: Iterable[int],
+                   offset: int = 0) -> bool:
+    """
+    一覧から指定IDの行を除く（戻り値: 1件でも除いたか）
+    選択中の行を除いた場合は選択変更の通知で下位の一覧が読み直される
+    """
+    removed = set(ids)
+    positions = [i for i, row in enumerate(rows) if row[0] in removed]
+    for pos in reversed(positions):
+        del rows[pos]
+        if isinstance(view, QComboBox):
+            view.removeItem(pos + offset)
+        else:
+            view.takeItem(pos + offset)
+    return bool(positions)
@@ -7,10 +7,10 @@ from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QColor
 from typing import Optional
 import os
-import sqlite3
 
-from core import scenario_db
+from core.hierarchy_store import get_store, PROJECT, ADDED, REMOVED, RESET
 from gui.scenario.scenario_creation_widget import ScenarioCreationWidget
+from gui.common.hierarchy_view import subscribe_hierarchy, insert_entry, remove_entries
 
 class ImportExcelTab(QWidget):
     """シナリオ一覧タブ内に埋め込む Excel インポート用タブ"""
@@ -19,10 +19,10 @@ class ImportExcelTab(QWidget):
 
     def __init__(self, parent=None):
         super().__init__(parent)
-        scenario_db.init_db()
         self.selected_file: Optional[str] = None
         self._load_projects()
         self._init_ui()
+        subscribe_hierarchy(self, self._on_hierarchy_changed)
 
     # ------------------------------ UI ------------------------------
     def _init_ui(self):
@@ -149,12 +149,25 @@ class ImportExcelTab(QWidget):
             self.result_table.setItem(i, 4, QTableWidgetItem(row.get("message", "-")))
 
     def _load_projects(self):
-        """DB からプロジェクト一覧を取得し保持"""
+        """階層ストアからプロジェクト一覧を取得し保持"""
         self._project_list = []
         try:
-            with sqlite3.connect(scenario_db.DB_PATH) as conn:
-                cur = conn.cursor()
-                cur.execute("SELECT id, name FROM projects ORDER BY id")
-                self._project_list = cur.fetchall()
+            self._project_list = get_store().get_projects()
         except Exception:
-            pass 
\ No newline at end of file
+            pass
+
+    def _on_hierarchy_changed(self, event):
+        """取り込み先プロジェクトの選択肢を階層の変更に合わせて更新"""
+        if event.kind == RESET:
+            current = self.combo_project.currentData()
+            self._load_projects()
+            self.combo_project.clear()
+            for pid, name in self._project_list:
+                self.combo_project.addItem(name, pid)
+            index = self.combo_project.findData(current)
+            if index >= 0:
+                self.combo_project.setCurrentIndex(index)
+        elif event.level == PROJECT and event.kind == ADDED:
+            insert_entry(self.combo_project, self._project_list, event.ids[0], event.name)
+        elif event.level == PROJECT and event.kind == REMOVED:
+            remove_entries(self.combo_project, self._project_list, event.ids) 
\ No newline at end of file
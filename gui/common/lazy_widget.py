@@ -0,0 +1,50 @@
+"""
+初めて表示するときに中身を生成するウィジェット
+DBを読み込む重い画面をタブ・サイドバーのページとして置いておき、開かれるまで生成しない
+"""
+import time
+from typing import Callable, Optional
+
+from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtWidgets import QVBoxLayout, QWidget
+
+
+class LazyWidget(QWidget):
+    """
+    factory() で作る画面の入れ物
+    ensure_built() を呼ぶか、初めて表示されたときに1回だけ factory() を呼んで中に配置する
+    keep_margins: 中の画面の周りに既定の余白を取るか（False の場合は余白なし）
+    """
+    # 画面を生成した（引数: 生成した画面）
+    built = pyqtSignal(QWidget)
+
+    def __init__(self, name: str, factory: Callable[[], QWidget], keep_margins: bool = False, parent=None):
+        super().__init__(parent)
+        self.name = name
+        self._factory: Optional[Callable[[], QWidget]] = factory
+        self._widget: Optional[QWidget] = None
+        # 生成にかかった時間（ミリ秒、未生成の場合は None）
+        self.build_ms: Optional[float] = None
+        layout = QVBoxLayout(self)
+        if not keep_margins:
+            layout.setContentsMargins(0, 0, 0, 0)
+
+    def is_built(self) -> bool:
+        return self._widget is not None
+
+    def ensure_built(self) -> QWidget:
+        """中の画面を返す（未生成なら生成する）"""
+        if self._widget is None:
+            start = time.perf_counter()
+            factory, self._factory = self._factory, None
+            self._widget = factory()
+            self.layout().addWidget(self._widget)
+            self.build_ms = (time.perf_counter() - start) * 1000
+            print(f"[LOG] 画面生成: {self.name} ({self.build_ms:.1f}ms)")
+            self.built.emit(self._widget)
+        return self._widget
+
+    def showEvent(self, event):
+        # 切り替えの通知を経由せずに表示された場合（入れ子のタブなど）もここで生成する
+        self.ensure_built()
+        super().showEvent(event)
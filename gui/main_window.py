@@ -3,8 +3,12 @@
 """
 import sys
 import os
+import time
+from typing import Callable, List, Tuple
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core import scenario_db
+from core.hierarchy_store import get_store
+from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QHBoxLayout, QListWidget, QStackedWidget, QTabWidget, QPushButton, QVBoxLayout, QLabel
 )
@@ -19,6 +23,7 @@ from gui.testitem_management_widget import TestItemManagementWidget
 from gui.test.test_execution_window import TestExecutionWindow
 from gui.test.test_scenario_select_window import TestScenarioSelectWindow
 from gui.common.import_excel_tab import ImportExcelTab
+from gui.common.lazy_widget import LazyWidget
 
 class MainWindow(QMainWindow):
     """
@@ -26,9 +31,22 @@ class MainWindow(QMainWindow):
     サイドバー＋メインビュー方式でカテゴリごとに画面を切り替える
     管理カテゴリはサブタブでまとめる
     各画面のUIパーツは導線を意識して配置すること
+    DBを読み込む画面はサイドバー・タブで初めて開いたときに生成する（起動時は最初に表示する画面だけ）
     """
     def __init__(self):
         super().__init__()
+        # 起動時間の内訳 [(工程, ミリ秒)]（初回表示後にまとめてログ出力する）
+        self._startup_start = self._lap_start = time.perf_counter()
+        self._startup_timings: List[Tuple[str, float]] = []
+        self._startup_reported = False
+        self._lazy_views: List[LazyWidget] = []
+        # DB初期化（プロセス内で1回だけ。各画面はこの後に生成する）
+        scenario_db.ensure_db()
+        self._lap("DB初期化")
+        # 各画面で共有するプロジェクト・画面・テストケースの階層を読み込む
+        # （画面間の更新は階層ストアの変更通知で行う）
+        get_store().load()
+        self._lap("階層ストア読み込み")
         self.setWindowTitle("テスト自動化支援ツール")
         self.setGeometry(100, 100, 1200, 600)
 
@@ -59,33 +77,23 @@ class MainWindow(QMainWindow):
         self.scenario_tab = QTabWidget()
 
         # --- 一覧タブ ---
-        scenario_list_tab = QWidget()
-        vbox = QVBoxLayout(scenario_list_tab)
         # ツールバーを削除し、一覧テーブルのみ配置
-        self.scenario_list_widget = ScenarioListWidget()
-        vbox.addWidget(self.scenario_list_widget)
-        self.scenario_tab.addTab(scenario_list_tab, "一覧")
+        self._scenario_list_view = self._add_lazy_tab(
+            self.scenario_tab, "シナリオ管理", "一覧", ScenarioListWidget, keep_margins=True)
 
         # --- プロジェクト管理タブ (追加・削除) ---
-        proj_manage_tab = QWidget()
-        vbox_pm = QVBoxLayout(proj_manage_tab)
-        self.project_management_widget = ProjectManagementWidget()
-        # プロジェクト変更時に他のタブを更新
-        self.project_management_widget.project_changed.connect(self._on_project_changed)
-        vbox_pm.addWidget(self.project_management_widget)
-        self.scenario_tab.addTab(proj_manage_tab, "プロジェクト管理")
+        self._project_management_view = self._add_lazy_tab(
+            self.scenario_tab, "シナリオ管理", "プロジェクト管理", ProjectManagementWidget, keep_margins=True)
 
         # --- シナリオ編集タブ（作成・削除統合） ---
-        from gui.scenario.scenario_management_widget import ScenarioManagementWidget
-        self.scenario_management_widget = ScenarioManagementWidget()
-        # シナリオ変更時に他のタブを更新
-        self.scenario_management_widget.scenario_changed.connect(self._on_scenario_changed)
-        self.scenario_tab.addTab(self.scenario_management_widget, "シナリオ編集")
+        def create_scenario_management():
+            from gui.scenario.scenario_management_widget import ScenarioManagementWidget
+            return ScenarioManagementWidget()
+        self._scenario_management_view = self._add_lazy_tab(
+            self.scenario_tab, "シナリオ管理", "シナリオ編集", create_scenario_management)
 
         # --- インポート・エクスポートタブ ---
-        import_tab = ImportExcelTab()
-        import_tab.import_completed.connect(self.scenario_list_widget._force_refresh)
-        self.scenario_tab.addTab(import_tab, "一括インポート")
+        self._add_lazy_tab(self.scenario_tab, "シナリオ管理", "一括インポート", ImportExcelTab)
 
         export_tab = QWidget()
         export_layout = QVBoxLayout(export_tab)
@@ -115,8 +123,8 @@ class MainWindow(QMainWindow):
         self.test_tab.addTab(test_list_tab, "一覧")
 
         # --- 実行タブ ---
-        self.test_scenario_select_tab = TestScenarioSelectWindow()
-        self.test_tab.addTab(self.test_scenario_select_tab, "実行")
+        self._test_scenario_select_view = self._add_lazy_tab(
+            self.test_tab, "テスト管理", "実行", TestScenarioSelectWindow)
 
         # --- 結果記録タブ（プレースホルダー）---
         test_result_tab = QWidget()
@@ -158,12 +166,15 @@ class MainWindow(QMainWindow):
         self.bug_tab.addTab(bug_list_tab, "一覧")
 
         # --- 登録タブ ---
-        bug_register_tab = QWidget()
-        vbox_bug_register = QVBoxLayout(bug_register_tab)
-        vbox_bug_register.addWidget(BugEntryWidget())
-        btn_to_bug_list = QPushButton("一覧へ")
-        vbox_bug_register.addWidget(btn_to_bug_list)
-        self.bug_tab.addTab(bug_register_tab, "登録")
+        def create_bug_register_tab():
+            bug_register_tab = QWidget()
+            vbox_bug_register = QVBoxLayout(bug_register_tab)
+            vbox_bug_register.addWidget(BugEntryWidget())
+            btn_to_bug_list = QPushButton("一覧へ")
+            vbox_bug_register.addWidget(btn_to_bug_list)
+            btn_to_bug_list.clicked.connect(goto_bug_list)
+            return bug_register_tab
+        self._add_lazy_tab(self.bug_tab, "不具合管理", "登録", create_bug_register_tab)
 
         # --- 編集・詳細・エクスポートタブ（プレースホルダー）---
         bug_edit_tab = QWidget()
@@ -189,20 +200,18 @@ class MainWindow(QMainWindow):
         def goto_bug_list():
             self.bug_tab.setCurrentIndex(0)
         btn_bug_new.clicked.connect(goto_bug_register)
-        btn_to_bug_list.clicked.connect(goto_bug_list)
 
         # 運用管理（プロジェクト・画面・テストケース・テスト項目）
         self.management_tab = QTabWidget()
         # --- プロジェクト管理タブ ---
-        self.management_project_widget = ProjectManagementWidget()
-        self.management_project_widget.project_changed.connect(self._on_project_changed)
-        self.management_tab.addTab(self.management_project_widget, "プロジェクト管理")
+        self._management_project_view = self._add_lazy_tab(
+            self.management_tab, "運用管理", "プロジェクト管理", ProjectManagementWidget)
         # --- 画面管理タブ ---
-        self.management_tab.addTab(ScreenManagementWidget(), "画面管理")
+        self._add_lazy_tab(self.management_tab, "運用管理", "画面管理", ScreenManagementWidget)
         # --- テストケース管理タブ ---
-        self.management_tab.addTab(TestCaseManagementWidget(), "テストケース管理")
+        self._add_lazy_tab(self.management_tab, "運用管理", "テストケース管理", TestCaseManagementWidget)
         # --- テスト項目管理タブ ---
-        self.management_tab.addTab(TestItemManagementWidget(), "テスト項目管理")
+        self._add_lazy_tab(self.management_tab, "運用管理", "テスト項目管理", TestItemManagementWidget)
         self.stack.addWidget(self.management_tab)
 
         # システム管理（サブタブ：ユーザー管理・権限管理・ログ管理・設定）
@@ -223,40 +232,80 @@ class MainWindow(QMainWindow):
         self.master_tab.addTab(QLabel("マスタエクスポート画面（今後拡張予定）"), "エクスポート")
         self.stack.addWidget(self.master_tab)
 
+        # サブタブの切り替えで、開いた画面を生成する
+        for tabs in (self.scenario_tab, self.test_tab, self.bug_tab, self.management_tab):
+            tabs.currentChanged.connect(self._build_current_view)
+
+        # 最初に表示する画面だけを生成する
         self.sidebar.setCurrentRow(0)
+        self._lap("画面構築")
 
     def _on_sidebar_changed(self, idx: int):
         """
-        サイドバーの選択に応じてメインビューを切り替える
+        サイドバーの選択に応じてメインビューを切り替える（未生成の画面はここで生成する）
         """
         self.stack.setCurrentIndex(idx)
-
-    def _on_project_changed(self):
-        """
-        プロジェクト変更時に他のタブを更新
-        """
-        # シナリオ一覧タブを更新
-        if hasattr(self, 'scenario_list_widget'):
-            self.scenario_list_widget._force_refresh()
-        
-        # 統合されたシナリオ管理ウィジェット内の作成・削除タブを更新
-        if hasattr(self, 'scenario_management_widget'):
-            if hasattr(self.scenario_management_widget.creation_widget, '_load_projects'):
-                self.scenario_management_widget.creation_widget._load_projects()
-            if hasattr(self.scenario_management_widget.delete_widget, '_load_projects'):
-                self.scenario_management_widget.delete_widget._load_projects()
-
-    def _on_scenario_changed(self):
-        """
-        シナリオ・テスト項目作成時に他のタブを更新
-        """
-        # シナリオ一覧タブを更新
-        if hasattr(self, 'scenario_list_widget'):
-            self.scenario_list_widget._force_refresh()
-        
-        # 統合されたシナリオ管理ウィジェット内の削除タブを更新
-        if hasattr(self, 'scenario_management_widget'):
-            self.scenario_management_widget._on_scenario_updated()
+        self._build_current_view()
+
+    def _add_lazy_tab(self, tabs: QTabWidget, category: str, title: str,
+                      factory: Callable[[], QWidget], keep_margins: bool = False) -> LazyWidget:
+        """開いたときに factory() で生成するサブタブを追加する"""
+        view = LazyWidget(f"{category}/{title}", factory, keep_margins)
+        tabs.addTab(view, title)
+        self._lazy_views.append(view)
+        return view
+
+    def _build_current_view(self, *_):
+        """表示中のカテゴリの表示中のサブタブを生成する"""
+        page = self.stack.currentWidget()
+        if isinstance(page, QTabWidget):
+            page = page.currentWidget()
+        if isinstance(page, LazyWidget):
+            page.ensure_built()
+
+    # 各画面（参照した時点で未生成なら生成する）
+    @property
+    def scenario_list_widget(self) -> ScenarioListWidget:
+        return self._scenario_list_view.ensure_built()
+
+    @property
+    def project_management_widget(self) -> ProjectManagementWidget:
+        return self._project_management_view.ensure_built()
+
+    @property
+    def scenario_management_widget(self) -> QWidget:
+        return self._scenario_management_view.ensure_built()
+
+    @property
+    def test_scenario_select_tab(self) -> TestScenarioSelectWindow:
+        return self._test_scenario_select_view.ensure_built()
+
+    @property
+    def management_project_widget(self) -> ProjectManagementWidget:
+        return self._management_project_view.ensure_built()
+
+    # ------------------------------ 起動時間 ------------------------------
+    def _lap(self, label: str):
+        """起動時間の内訳に、前の工程からの経過時間を記録する"""
+        now = time.perf_counter()
+        self._startup_timings.append((label, (now - self._lap_start) * 1000))
+        self._lap_start = now
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self._startup_reported:
+            self._startup_reported = True
+            # 初回の描画が終わってイベントループに戻った時点までを計測する
+            QTimer.singleShot(0, self._report_startup)
+
+    def _report_startup(self):
+        self._lap("初回表示")
+        total = (self._lap_start - self._startup_start) * 1000
+        breakdown = " / ".join(f"{label} {ms:.1f}ms" for label, ms in self._startup_timings)
+        built = [f"{view.name} {view.build_ms:.1f}ms" for view in self._lazy_views if view.is_built()]
+        print(f"[LOG] 起動時間: 合計 {total:.1f}ms（{breakdown}）")
+        print(f"[LOG] 起動時に生成した画面: {', '.join(built) or 'なし'}"
+              f"（未生成 {len(self._lazy_views) - len(built)} 画面は開いたときに生成）")
 
     def _create_management_tab(self) -> QWidget:
         """
@@ -9,7 +9,6 @@ class ProjectCreationWidget(QWidget):
 
     def __init__(self, parent=None):
         super().__init__(parent)
-        scenario_db.init_db()
         self._init_ui()
         self._load_projects()
 
@@ -30,7 +29,7 @@ class ProjectCreationWidget(QWidget):
     def _load_projects(self):
         self.project_list.clear()
         try:
-            with sqlite3.connect(scenario_db.DB_PATH) as conn:
+            with scenario_db.get_connection() as conn:
                 cur = conn.cursor()
                 cur.execute("SELECT id, name FROM projects ORDER BY id")
                 self._projects = cur.fetchall()
@@ -47,7 +46,7 @@ class ProjectCreationWidget(QWidget):
                 QMessageBox.warning(self, "エラー", "プロジェクト名は1～100文字で入力してください")
                 return
             try:
-                with sqlite3.connect(scenario_db.DB_PATH) as conn:
+                with scenario_db.get_connection() as conn:
                     cur = conn.cursor()
                     cur.execute("INSERT INTO projects (name) VALUES (?)", (name,))
                     conn.commit()
@@ -1,6 +1,6 @@
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QPushButton, QHBoxLayout, QListWidget, QMessageBox, QAbstractItemView
-import sqlite3
-from core import scenario_db
+from core import cascade_delete, scenario_db
+from core.hierarchy_store import get_store, PROJECT
 from gui.common.utils import get_selected_rows_from_listwidget
 
 class ProjectDeleteWidget(QWidget):
@@ -8,7 +8,6 @@ class ProjectDeleteWidget(QWidget):
 
     def __init__(self, parent=None):
         super().__init__(parent)
-        scenario_db.init_db()
         self._init_ui()
         self._load_projects()
 
@@ -28,7 +27,7 @@ class ProjectDeleteWidget(QWidget):
     def _load_projects(self):
         self.project_list.clear()
         try:
-            with sqlite3.connect(scenario_db.DB_PATH) as conn:
+            with scenario_db.get_connection() as conn:
                 cur = conn.cursor()
                 cur.execute("SELECT id, name FROM projects ORDER BY id")
                 self._projects = cur.fetchall()
@@ -50,14 +49,12 @@ class ProjectDeleteWidget(QWidget):
             QMessageBox.Yes | QMessageBox.No
         )
         if reply == QMessageBox.Yes:
-            errors = []
-            for pid, name in delete_targets:
-                try:
-                    scenario_db.delete_project(pid)
-                except Exception as e:
-                    errors.append(f"{name}: {str(e)}")
-            if errors:
-                QMessageBox.critical(self, "エラー", "\n".join(errors))
+            project_ids = [pid for pid, _ in delete_targets]
+            try:
+                cascade_delete.delete_projects(project_ids)
+            except Exception as e:
+                QMessageBox.critical(self, "エラー", str(e))
             else:
+                get_store().notify_removed(PROJECT, project_ids)
                 QMessageBox.information(self, "削除完了", "選択したプロジェクトを削除しました")
             self._load_projects() 
\ No newline at end of file
@@ -3,8 +3,11 @@
 """
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QListWidget, QPushButton, QHBoxLayout, QMessageBox, QAbstractItemView
 from PyQt5.QtCore import pyqtSignal
-from core import scenario_db
+import sqlite3
+from core import cascade_delete
+from core.hierarchy_store import get_store, PROJECT, ADDED, REMOVED, RESET
 from gui.common.utils import get_text_dialog, get_selected_rows_from_listwidget
+from gui.common.hierarchy_view import subscribe_hierarchy, insert_entry, remove_entries
 
 class ProjectManagementWidget(QWidget):
     """
@@ -15,8 +18,10 @@ class ProjectManagementWidget(QWidget):
     
     def __init__(self, parent=None):
         super().__init__(parent)
+        self._projects = []
         self._init_ui()
         self._load_projects()
+        subscribe_hierarchy(self, self._on_hierarchy_changed)
 
     def _init_ui(self):
         layout = QVBoxLayout()
@@ -39,17 +44,22 @@ class ProjectManagementWidget(QWidget):
         layout.addLayout(btn_layout)
 
     def _load_projects(self):
+        self._projects = get_store().get_projects()
         self.project_list.clear()
-        import sqlite3
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT id, name FROM projects ORDER BY id")
-            self._projects = cur.fetchall()
-            for pid, name in self._projects:
-                self.project_list.addItem(name)
+        for pid, name in self._projects:
+            self.project_list.addItem(name)
         if self._projects:
             self.project_list.setCurrentRow(0)
 
+    def _on_hierarchy_changed(self, event):
+        """他の画面を含む階層の変更をプロジェクト一覧に反映"""
+        if event.kind == RESET:
+            self._load_projects()
+        elif event.level == PROJECT and event.kind == ADDED:
+            insert_entry(self.project_list, self._projects, event.ids[0], event.name)
+        elif event.level == PROJECT and event.kind == REMOVED:
+            remove_entries(self.project_list, self._projects, event.ids)
+
     def _add_project(self):
         name, ok = get_text_dialog(self, "新規プロジェクト名を入力してください")
         if ok and name:
@@ -59,15 +69,10 @@ class ProjectManagementWidget(QWidget):
                 return
             
             try:
-                import sqlite3
-                with sqlite3.connect(scenario_db.DB_PATH) as conn:
-                    cur = conn.cursor()
-                    cur.execute("INSERT INTO projects (name) VALUES (?)", (name,))
-                    conn.commit()
-                    QMessageBox.information(self, "作成完了", f"プロジェクト '{name}' を作成しました")
-                    self._load_projects()
-                    # 他のタブに変更を通知
-                    self.project_changed.emit()
+                # 一覧への追加は階層ストアの変更通知で行う（他のタブも同様）
+                get_store().add_project(name)
+                QMessageBox.information(self, "作成完了", f"プロジェクト '{name}' を作成しました")
+                self.project_changed.emit()
             except sqlite3.IntegrityError:
                 QMessageBox.warning(self, "エラー", "同名のプロジェクトが既に存在します")
             except Exception as e:
@@ -75,7 +80,7 @@ class ProjectManagementWidget(QWidget):
 
     def _delete_project(self):
         # 共通関数で選択データ取得
-        delete_targets = get_selected_rows_from_listwidget(self.project_list, getattr(self, '_projects', []))
+        delete_targets = get_selected_rows_from_listwidget(self.project_list, self._projects)
         if not delete_targets:
             QMessageBox.warning(self, "エラー", "削除するプロジェクトを選択してください")
             return
@@ -87,23 +92,14 @@ class ProjectManagementWidget(QWidget):
             QMessageBox.Yes | QMessageBox.No
         )
         if reply == QMessageBox.Yes:
+            project_ids = [pid for pid, _ in delete_targets]
             try:
-                errors = []
-                for pid, name in delete_targets:
-                    try:
-                        scenario_db.delete_project(pid)
-                    except Exception as e:
-                        errors.append(f"{name}: {str(e)}")
-                
-                if errors:
-                    QMessageBox.critical(self, "削除エラー", "\n".join(errors))
-                else:
-                    QMessageBox.information(self, "削除完了", f"選択したプロジェクトを削除しました")
-                    # 他のタブに変更を通知
-                    self.project_changed.emit()
-                
-                self._load_projects()
-                
+                # 配下の画面・テストケース・テスト項目・不具合もまとめて削除（失敗時は全件ロールバック）
+                cascade_delete.delete_projects(project_ids)
             except Exception as e:
-                QMessageBox.critical(self, "予期しないエラー", f"削除処理中に予期しないエラーが発生しました:\n{str(e)}")
-                self._load_projects()
+                QMessageBox.critical(self, "削除エラー", f"削除処理中にエラーが発生しました:\n{str(e)}")
+                return
+            # 一覧（他のタブを含む）から除く
+            get_store().notify_removed(PROJECT, project_ids)
+            QMessageBox.information(self, "削除完了", f"選択したプロジェクトを削除しました")
+            self.project_changed.emit()
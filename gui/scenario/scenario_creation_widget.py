@@ -7,9 +7,11 @@ import sqlite3
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from core import scenario_db
+from core import cascade_delete, scenario_db
+from core.hierarchy_store import get_store, PROJECT, SCREEN, CASE, ITEM, ADDED, REMOVED, RESET
 from gui.common.constants import *
 from gui.common.utils import get_text_dialog
+from gui.common.hierarchy_view import subscribe_hierarchy, insert_entry, remove_entries
 from gui.common.import_result_dialog import ImportResultDialog
 
 class ScenarioCreationWidget(QWidget):
@@ -21,10 +23,13 @@ class ScenarioCreationWidget(QWidget):
     
     def __init__(self, parent=None):
         super().__init__(parent)
-        scenario_db.init_db()
+        self._projects = []
+        self._screens = []
+        self._cases = []
         self._init_ui()
         self._load_projects()
         self._load_master_data()
+        subscribe_hierarchy(self, self._on_hierarchy_changed)
 
     def _init_ui(self):
         main_layout = QHBoxLayout()
@@ -60,9 +65,9 @@ class ScenarioCreationWidget(QWidget):
         )
         if reply == QMessageBox.Yes:
             try:
-                scenario_db.delete_project(pid)
+                cascade_delete.delete_projects([pid])
+                get_store().notify_removed(PROJECT, [pid])
                 QMessageBox.information(self, "削除完了", f"プロジェクト '{name}' を削除しました")
-                self._load_projects()
             except Exception as e:
                 QMessageBox.critical(self, "削除失敗", f"削除中にエラーが発生しました: {str(e)}")
 
@@ -154,49 +159,56 @@ class ScenarioCreationWidget(QWidget):
         return w
 
     def _load_projects(self):
+        self._projects = get_store().get_projects()
         self.project_list.clear()
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT id, name FROM projects ORDER BY id")
-            self._projects = cur.fetchall()
-            for pid, name in self._projects:
-                self.project_list.addItem(name)
+        for pid, name in self._projects:
+            self.project_list.addItem(name)
         if self._projects:
             self.project_list.setCurrentRow(0)
 
     def _on_project_selected(self):
-        idx = self.project_list.currentRow()
-        if idx < 0 or not hasattr(self, '_projects') or idx >= len(self._projects):
-            self.screen_combo.clear()
-            return
-        pid = self._projects[idx][0]
-        self._load_screens(pid)
+        self._load_screens(self._get_current_project_id())
 
     def _load_screens(self, project_id):
+        self._screens = get_store().get_screens(project_id)
+        self.screen_combo.blockSignals(True)
         self.screen_combo.clear()
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT id, name FROM screens WHERE project_id=? ORDER BY id", (project_id,))
-            self._screens = cur.fetchall()
-            for sid, name in self._screens:
-                self.screen_combo.addItem(name, sid)
+        for sid, name in self._screens:
+            self.screen_combo.addItem(name, sid)
         if self._screens:
             self.screen_combo.setCurrentIndex(0)
+        self.screen_combo.blockSignals(False)
+        self._on_screen_changed()
 
     def _on_screen_changed(self):
-        sid = self._get_current_screen_id()
-        if sid is None:
-            self.case_combo.clear()
-            return
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT id, name FROM test_cases WHERE screen_id=? ORDER BY id", (sid,))
-            self._cases = cur.fetchall()
-            self.case_combo.clear()
-            for cid, name in self._cases:
-                self.case_combo.addItem(name, cid)
+        self._cases = get_store().get_test_cases(self._get_current_screen_id())
+        self.case_combo.blockSignals(True)
+        self.case_combo.clear()
+        for cid, name in self._cases:
+            self.case_combo.addItem(name, cid)
+        self.case_combo.blockSignals(False)
         self._on_case_changed()
 
+    def _on_hierarchy_changed(self, event):
+        """階層の変更をプロジェクト一覧・画面名・テストケース名の選択肢に反映"""
+        if event.kind == RESET:
+            self._load_projects()
+        elif event.level == PROJECT:
+            if event.kind == ADDED:
+                insert_entry(self.project_list, self._projects, event.ids[0], event.name)
+            elif event.kind == REMOVED:
+                remove_entries(self.project_list, self._projects, event.ids)
+        elif event.level == SCREEN:
+            if event.kind == ADDED and event.parent_id == self._get_current_project_id():
+                insert_entry(self.screen_combo, self._screens, event.ids[0], event.name)
+            elif event.kind == REMOVED:
+                remove_entries(self.screen_combo, self._screens, event.ids)
+        elif event.level == CASE:
+            if event.kind == ADDED and event.parent_id == self._get_current_screen_id():
+                insert_entry(self.case_combo, self._cases, event.ids[0], event.name)
+            elif event.kind == REMOVED:
+                remove_entries(self.case_combo, self._cases, event.ids)
+
     def _on_case_changed(self):
         # 今回は何もしない（将来拡張用）
         pass
@@ -231,11 +243,9 @@ class ScenarioCreationWidget(QWidget):
                 QMessageBox.warning(self, "エラー", "テストケース名は1～100文字で入力してください")
                 return
             try:
-                with sqlite3.connect(scenario_db.DB_PATH) as conn:
-                    self._get_or_create_case(conn.cursor(), sid, name)
-                    conn.commit()
-                self._on_screen_changed()
-                # 他のタブに作成完了を通知
+                # 同名のテストケースがなければ追加（選択肢への追加は階層ストアの変更通知で行う）
+                if not any(case_name == name for _, case_name in self._cases):
+                    get_store().add_test_case(sid, name)
                 self.scenario_created.emit()
             except Exception as e:
                 QMessageBox.critical(self, "エラー", f"テストケース作成中にエラーが発生しました:\n{str(e)}")
@@ -255,11 +265,9 @@ class ScenarioCreationWidget(QWidget):
                 QMessageBox.warning(self, "エラー", "画面名は1～100文字で入力してください")
                 return
             try:
-                with sqlite3.connect(scenario_db.DB_PATH) as conn:
-                    self._get_or_create_screen(conn.cursor(), pid, name)
-                    conn.commit()
-                self._load_screens(pid)
-                # 他のタブに作成完了を通知
+                # 同名の画面がなければ追加（選択肢への追加は階層ストアの変更通知で行う）
+                if not any(screen_name == name for _, screen_name in self._screens):
+                    get_store().add_screen(pid, name)
                 self.scenario_created.emit()
             except sqlite3.IntegrityError:
                 QMessageBox.warning(self, "エラー", "同名の画面が既に存在します")
@@ -302,7 +310,7 @@ class ScenarioCreationWidget(QWidget):
         }
         # DB登録
         try:
-            with sqlite3.connect(scenario_db.DB_PATH) as conn:
+            with scenario_db.get_connection() as conn:
                 cur = conn.cursor()
                 cur.execute('''
                     INSERT INTO test_items (
@@ -314,9 +322,10 @@ class ScenarioCreationWidget(QWidget):
                 ))
                 conn.commit()
                 item_id = cur.lastrowid
+            # 他のタブに追加を通知
+            get_store().notify_added(ITEM, item_id, case_id, name)
             QMessageBox.information(self, "保存完了", f"テスト項目ID: {item_id} を保存しました")
             self._clear_form()
-            # 他のタブに作成完了を通知
             self.scenario_created.emit()
         except Exception as e:
             QMessageBox.critical(self, "保存エラー", f"テスト項目の保存中にエラーが発生しました:\n{str(e)}")
@@ -328,12 +337,10 @@ class ScenarioCreationWidget(QWidget):
         self.priority_combo.clear()
         self.tester_combo.clear()
         self.result_combo.clear()
-        priorities = scenario_db.get_master_data("master_priorities")
-        testers = scenario_db.get_master_data("master_testers")
-        results = scenario_db.get_master_data("master_results")
-        self.priority_combo.addItems(priorities)
-        self.tester_combo.addItems(testers)
-        self.result_combo.addItems(results)
+        master = scenario_db.get_all_master_data()
+        self.priority_combo.addItems(master["master_priorities"])
+        self.tester_combo.addItems(master["master_testers"])
+        self.result_combo.addItems(master["master_results"])
 
     def _get_or_create_project(self, cur, project_name):
         """プロジェクトがなければ作成し、IDを返す"""
@@ -369,7 +376,7 @@ class ScenarioCreationWidget(QWidget):
         """
         import csv
         try:
-            with sqlite3.connect(scenario_db.DB_PATH) as conn:
+            with scenario_db.get_connection() as conn:
                 cur = conn.cursor()
                 with open(csv_path, encoding='utf-8') as f:
                     reader = csv.reader(f)
@@ -391,8 +398,9 @@ class ScenarioCreationWidget(QWidget):
         except Exception as e:
             QMessageBox.critical(self, "インポートエラー", f"CSVインポート中にエラーが発生しました:\n{str(e)}")
             return
+        # インポート後に全タブの一覧を更新
+        get_store().reload()
         QMessageBox.information(self, "インポート完了", "CSVから一括登録が完了しました")
-        self._load_projects()  # インポート後にプロジェクトリストを自動更新
 
     def import_projects_from_excel(self, excel_path):
         """
@@ -400,13 +408,14 @@ class ScenarioCreationWidget(QWidget):
         画面名一覧を最初に列挙し、1回だけプロジェクト名を聞いて全画面をそのプロジェクトに登録
         """
         from core.scenario_loader import ScenarioLoader
-        loader = ScenarioLoader(excel_path)
-        all_data = loader.load_all_scenarios()
-        if not all_data:
+        from core.scenario_cache import ScenarioParseCache
+        from core.scenario_importer import ScenarioImporter, summarize_by_screen
+        loader = ScenarioLoader(excel_path, streaming=True, max_workers=None, cache=ScenarioParseCache())
+        # 画面名一覧を抽出（解析結果はキャッシュに残り、取り込み時はキャッシュから1シートずつ読み直す）
+        screen_names = [page["screen_name"] for page in loader.iter_all_scenarios()]
+        if not screen_names:
             QMessageBox.warning(self, "インポート失敗", "Excelからシナリオが見つかりませんでした")
             return
-        # 画面名一覧を抽出
-        screen_names = [page["screen_name"] for page in all_data]
         # 画面名一覧をダイアログで表示
         dlg = QDialog(self)
         dlg.setWindowTitle("インポート対象の画面一覧")
@@ -431,58 +440,22 @@ class ScenarioCreationWidget(QWidget):
         project_name, ok = get_text_dialog(self, "これらの画面を登録するプロジェクト名を入力してください")
         if not ok or not project_name:
             return
-        import_result = []
         try:
-            with sqlite3.connect(scenario_db.DB_PATH) as conn:
-                cur = conn.cursor()
-                # プロジェクト（共通関数で取得・作成）
-                pid = self._get_or_create_project(cur, project_name)
-                for page in all_data:
-                    screen_name = page["screen_name"].strip()
-                    if not screen_name or len(screen_name) > 100:
-                        continue
-                    sid = self._get_or_create_screen(cur, pid, screen_name)
-                    screen_result = {"screen": screen_name, "scenarios": []}
-                    for scenario in page["scenarios"]:
-                        scenario_name = scenario["name"].strip()
-                        if not scenario_name or len(scenario_name) > 100:
-                            continue
-                        cid = self._get_or_create_case(cur, sid, scenario_name)
-                        # テスト項目
-                        for testcase in scenario.get("testitems", []):
-                            name = testcase.get("テスト項目") or testcase.get("name")
-                            if not name:
-                                continue
-                            name = str(name).strip()
-                            if not name or len(name) > 100:
-                                continue
-                            cur.execute("""
-                                INSERT INTO test_items (
-                                    test_case_id, name, input_data, operation, expected, priority, tester, exec_date, result, remarks
-                                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            """, (
-                                cid,
-                                name,
-                                str(testcase.get("入力データ", "")).strip(),
-                                str(testcase.get("操作手順", "")).strip(),
-                                str(testcase.get("期待結果", "")).strip(),
-                                str(testcase.get("優先度", "")).strip(),
-                                str(testcase.get("担当者", "")).strip(),
-                                str(testcase.get("実施日", "")).strip(),
-                                str(testcase.get("結果", "")).strip(),
-                                str(testcase.get("備考", "")).strip()
-                            ))
-                        screen_result["scenarios"].append({
-                            "name": scenario_name,
-                            "testcase_count": len(scenario.get("testitems", []))
-                        })
-                    import_result.append(screen_result)
-                conn.commit()
+            # 既存シナリオにもテスト項目を追加する（一括書き込みはcore側で実施）
+            result_list = ScenarioImporter().import_all(
+                loader.iter_all_scenarios(), project_name=project_name, append=True)
         except Exception as e:
             QMessageBox.critical(self, "インポートエラー", f"Excelインポート中にエラーが発生しました:\n{str(e)}")
             return
-        self._load_projects()  # インポート後にプロジェクトリストを自動更新
-        # 他のタブに作成完了を通知
+        import_result = [
+            {
+                "screen": screen["screen"],
+                "scenarios": [{"name": r["name"], "testcase_count": r["inserted"]} for r in screen["scenarios"]],
+            }
+            for screen in summarize_by_screen(result_list)
+        ]
+        # インポート後に全タブの一覧を更新
+        get_store().reload()
         self.scenario_created.emit()
         dlg = ImportResultDialog(import_result, self)
         dlg.exec_()
@@ -493,85 +466,29 @@ class ScenarioCreationWidget(QWidget):
         project_mode: 'existing' or 'new'
         project_id: 既存プロジェクトID（existing時のみ）
         project_name: 新規プロジェクト名（new時のみ）
-        overwrite: True=上書き, False=残す
-        戻り値: [{screen, name, status, message}...]
+        overwrite: True=上書き（テスト項目の差分のみ反映）, False=残す
+        戻り値: [{screen, name, status, message, inserted, updated, deleted, unchanged}...]
         """
         from core.scenario_loader import ScenarioLoader
-        import sqlite3
-        result_list = []
-        loader = ScenarioLoader(excel_path)
-        all_data = loader.load_all_scenarios()
-        if not all_data:
-            return [{"screen": "-", "name": "-", "status": "失敗", "message": "Excelからシナリオが見つかりませんでした"}]
+        from core.scenario_cache import ScenarioParseCache
+        from core.scenario_importer import ScenarioImporter
+        loader = ScenarioLoader(excel_path, streaming=True, max_workers=None, cache=ScenarioParseCache())
         try:
-            with sqlite3.connect(scenario_db.DB_PATH) as conn:
-                cur = conn.cursor()
-                # プロジェクトID決定
-                if project_mode == 'existing' and project_id:
-                    pid = project_id
-                else:
-                    pid = self._get_or_create_project(cur, project_name)
-                for page in all_data:
-                    screen_name = page["screen_name"].strip()
-                    if not screen_name or len(screen_name) > 100:
-                        continue
-                    sid = self._get_or_create_screen(cur, pid, screen_name)
-                    for scenario in page["scenarios"]:
-                        scenario_name = scenario["name"].strip()
-                        if not scenario_name or len(scenario_name) > 100:
-                            continue
-                        # 上書き/残す判定
-                        cur.execute("SELECT id FROM test_cases WHERE screen_id=? AND name=?", (sid, scenario_name))
-                        row = cur.fetchone()
-                        if row:
-                            if overwrite:
-                                cid = row[0]
-                                cur.execute("DELETE FROM test_items WHERE test_case_id=?", (cid,))
-                                cur.execute("DELETE FROM test_cases WHERE id=?", (cid,))
-                                # 新規作成
-                                cid = self._get_or_create_case(cur, sid, scenario_name)
-                                status = "成功"
-                                msg = "上書き登録"
-                            else:
-                                status = "成功"
-                                msg = "既存シナリオを残しました"
-                                result_list.append({"screen": screen_name, "name": scenario_name, "status": status, "message": msg})
-                                continue
-                        else:
-                            cid = self._get_or_create_case(cur, sid, scenario_name)
-                            status = "成功"
-                            msg = "新規登録"
-                        # テスト項目
-                        for testcase in scenario.get("testitems", []):
-                            name = testcase.get("テスト項目") or testcase.get("name")
-                            if not name:
-                                continue
-                            name = str(name).strip()
-                            if not name or len(name) > 100:
-                                continue
-                            cur.execute("""
-                                INSERT INTO test_items (
-                                    test_case_id, name, input_data, operation, expected, priority, tester, exec_date, result, remarks
-                                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            """, (
-                                cid,
-                                name,
-                                str(testcase.get("入力データ", "")).strip(),
-                                str(testcase.get("操作手順", "")).strip(),
-                                str(testcase.get("期待結果", "")).strip(),
-                                str(testcase.get("優先度", "")).strip(),
-                                str(testcase.get("担当者", "")).strip(),
-                                str(testcase.get("実施日", "")).strip(),
-                                str(testcase.get("結果", "")).strip(),
-                                str(testcase.get("備考", "")).strip()
-                            ))
-                        result_list.append({"screen": screen_name, "name": scenario_name, "status": status, "message": msg})
-                conn.commit()
+            # シートごとの抽出結果をそのまま取り込む（全シート分をリストにしない）
+            result_list = ScenarioImporter().import_all(
+                loader.iter_all_scenarios(),
+                project_id=project_id if project_mode == 'existing' else None,
+                project_name=project_name,
+                overwrite=overwrite,
+            )
         except Exception as e:
             return [{"screen": "-", "name": "-", "status": "失敗", "message": str(e)}]
+        if not result_list:
+            return [{"screen": "-", "name": "-", "status": "失敗", "message": "Excelからシナリオが見つかりませんでした"}]
         
-        # 成功した場合は他のタブに通知
+        # 成功した場合は全タブの一覧を更新
         if result_list and any(r["status"] == "成功" for r in result_list):
+            get_store().reload()
             self.scenario_created.emit()
         
         return result_list
@@ -584,7 +501,6 @@ class ScenarioCreationWidget(QWidget):
         path, _ = QFileDialog.getOpenFileName(self, "CSVファイルを選択", "", "CSV Files (*.csv)")
         if path:
             self.import_projects_from_csv(path)
-            self._load_projects()
 
     def show_excel_import_dialog(self):
         """
@@ -594,7 +510,6 @@ class ScenarioCreationWidget(QWidget):
         path, _ = QFileDialog.getOpenFileName(self, "Excelファイルを選択", "", "Excel Files (*.xlsx *.xls)")
         if path:
             self.import_projects_from_excel(path)
-            self._load_projects()
 
     def show_csv_sample(self):
         """
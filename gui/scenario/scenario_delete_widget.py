@@ -4,7 +4,9 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt, pyqtSignal
 import sqlite3
-from core import scenario_db
+from core import cascade_delete, scenario_db
+from core.hierarchy_store import get_store, PROJECT, SCREEN, CASE, ADDED, REMOVED, RESET
+from gui.common.hierarchy_view import subscribe_hierarchy, insert_entry, remove_entries
 from typing import Optional, List
 
 class ScenarioDeleteWidget(QWidget):
@@ -14,9 +16,11 @@ class ScenarioDeleteWidget(QWidget):
     
     def __init__(self, parent=None):
         super().__init__(parent)
-        scenario_db.init_db()
+        self._projects = []
+        self._screens = []
         self._init_ui()
         self._load_projects()
+        subscribe_hierarchy(self, self._on_hierarchy_changed)
 
     # -------------------- UI --------------------
     def _init_ui(self):
@@ -70,15 +74,11 @@ class ScenarioDeleteWidget(QWidget):
 
     # -------------------- Data Load --------------------
     def _load_projects(self):
+        self._projects = get_store().get_projects()
         self.project_combo.blockSignals(True)
         self.project_combo.clear()
-        self._projects = []
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT id, name FROM projects ORDER BY id")
-            self._projects = cur.fetchall()
-            for pid, name in self._projects:
-                self.project_combo.addItem(name, pid)
+        for pid, name in self._projects:
+            self.project_combo.addItem(name, pid)
         self.project_combo.blockSignals(False)
         self._on_project_changed()
 
@@ -89,23 +89,21 @@ class ScenarioDeleteWidget(QWidget):
         if project_id is None:
             self.screen_combo.blockSignals(False)
             return
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT id, name FROM screens WHERE project_id=? ORDER BY id", (project_id,))
-            self._screens = cur.fetchall()
-            self.screen_combo.addItem("(すべて)", None)
-            for sid, name in self._screens:
-                self.screen_combo.addItem(name, sid)
+        self._screens = get_store().get_screens(project_id)
+        self.screen_combo.addItem("(すべて)", None)
+        for sid, name in self._screens:
+            self.screen_combo.addItem(name, sid)
         self.screen_combo.blockSignals(False)
 
     def _load_table(self):
         project_id = self.project_combo.currentData()
         screen_id = self.screen_combo.currentData()
-        keyword = self.keyword_edit.text().strip().lower()
+        keyword = self.keyword_edit.text().strip()
 
-        # 取得
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
+        if keyword:
+            # シナリオ名の全文検索（関連度順）
+            rows_to_show = scenario_db.search_test_cases(keyword, project_id, screen_id, limit=None)
+        else:
             sql = (
                 "SELECT tc.id, s.name, tc.name, tc.status, tc.last_run, tc.result "
                 "FROM test_cases tc JOIN screens s ON tc.screen_id=s.id "
@@ -120,32 +118,80 @@ class ScenarioDeleteWidget(QWidget):
                 sql += "AND s.id=? "
                 params.append(screen_id)
             sql += "ORDER BY tc.id"
-            cur.execute(sql, params)
-            all_rows = cur.fetchall()
-
-        # フィルタリング
-        rows_to_show = [r for r in all_rows if not keyword or keyword in r[2].lower()]
+            rows_to_show = scenario_db.get_connection().execute(sql, params).fetchall()
 
         # 一度に行数を設定
+        # （行ごとのチェック状態変更の通知で全行を走査しないよう、設定中は通知を止める）
+        self.table.blockSignals(True)
         self.table.setRowCount(len(rows_to_show))
 
-        for row_idx, (cid, screen_name, scenario_name, status, last_run, result) in enumerate(rows_to_show):
-            # チェックボックス
-            chk_item = QTableWidgetItem()
-            chk_item.setFlags(Qt.ItemIsUserCheckable | Qt.ItemIsEnabled)
-            chk_item.setCheckState(Qt.Unchecked)
-            chk_item.setData(Qt.UserRole, cid)
-            self.table.setItem(row_idx, 0, chk_item)
-            # 他の列
-            self.table.setItem(row_idx, 1, QTableWidgetItem(screen_name))
-            self.table.setItem(row_idx, 2, QTableWidgetItem(scenario_name))
-            self.table.setItem(row_idx, 3, QTableWidgetItem(status or '-'))
-            self.table.setItem(row_idx, 4, QTableWidgetItem(last_run or '-'))
-            self.table.setItem(row_idx, 5, QTableWidgetItem(result or '-'))
+        for row_idx, row in enumerate(rows_to_show):
+            self._set_row(row_idx, row)
+        self.table.blockSignals(False)
         
         # テーブル更新後は削除ボタンを無効化（選択状態がリセットされるため）
         self.delete_btn.setEnabled(False)
 
+    def _set_row(self, row_idx, row):
+        """テーブルの1行にシナリオ（テストケース）を表示"""
+        cid, screen_name, scenario_name, status, last_run, result = row
+        # チェックボックス
+        chk_item = QTableWidgetItem()
+        chk_item.setFlags(Qt.ItemIsUserCheckable | Qt.ItemIsEnabled)
+        chk_item.setCheckState(Qt.Unchecked)
+        chk_item.setData(Qt.UserRole, cid)
+        self.table.setItem(row_idx, 0, chk_item)
+        # 他の列
+        self.table.setItem(row_idx, 1, QTableWidgetItem(screen_name))
+        self.table.setItem(row_idx, 2, QTableWidgetItem(scenario_name))
+        self.table.setItem(row_idx, 3, QTableWidgetItem(status or '-'))
+        self.table.setItem(row_idx, 4, QTableWidgetItem(last_run or '-'))
+        self.table.setItem(row_idx, 5, QTableWidgetItem(result or '-'))
+
+    def _on_hierarchy_changed(self, event):
+        """階層の変更を各選択・シナリオ一覧に反映"""
+        if event.kind == RESET:
+            self._load_projects()
+        elif event.level == PROJECT:
+            if event.kind == ADDED:
+                insert_entry(self.project_combo, self._projects, event.ids[0], event.name)
+            elif event.kind == REMOVED:
+                remove_entries(self.project_combo, self._projects, event.ids)
+        elif event.level == SCREEN:
+            # 画面の選択肢は先頭の「(すべて)」の後ろに並ぶ
+            if event.kind == ADDED and event.parent_id == self.project_combo.currentData():
+                insert_entry(self.screen_combo, self._screens, event.ids[0], event.name, offset=1)
+            elif event.kind == REMOVED:
+                remove_entries(self.screen_combo, self._screens, event.ids, offset=1)
+        elif event.level == CASE:
+            if event.kind == REMOVED:
+                self._remove_case_rows(event.ids)
+            elif event.kind == ADDED and self._is_case_shown(event.parent_id, event.name):
+                # 一覧はID順のため末尾に追加する
+                screen_name = self.screen_combo.itemText(self.screen_combo.findData(event.parent_id))
+                row_idx = self.table.rowCount()
+                self.table.insertRow(row_idx)
+                self._set_row(row_idx, (event.ids[0], screen_name, event.name, '未実行', None, None))
+
+    def _is_case_shown(self, screen_id, name) -> bool:
+        """追加されたテストケースが現在の絞り込み条件で一覧に表示されるか"""
+        if self.keyword_edit.text().strip():
+            # キーワード検索中は関連度順のため追加しない（次の検索で表示される）
+            return False
+        selected = self.screen_combo.currentData()
+        if selected is not None:
+            return selected == screen_id
+        return any(sid == screen_id for sid, _ in self._screens)
+
+    def _remove_case_rows(self, case_ids):
+        """指定したテストケースの行をテーブルから除く"""
+        removed = set(case_ids)
+        for row in reversed(range(self.table.rowCount())):
+            item = self.table.item(row, 0)
+            if item and item.data(Qt.UserRole) in removed:
+                self.table.removeRow(row)
+        self._update_delete_button_state()
+
     # -------------------- Slots --------------------
     def _on_project_changed(self):
         """プロジェクト変更時の処理"""
@@ -163,10 +209,12 @@ class ScenarioDeleteWidget(QWidget):
 
     def _select_all(self, checked: bool):
         state = Qt.Checked if checked else Qt.Unchecked
+        self.table.blockSignals(True)
         for row in range(self.table.rowCount()):
             item = self.table.item(row, 0)
             if item:
                 item.setCheckState(state)
+        self.table.blockSignals(False)
         self._update_delete_button_state()
 
     def _on_item_changed(self, item):
@@ -188,7 +236,7 @@ class ScenarioDeleteWidget(QWidget):
         """指定したテストケースID群に関連付くバグ件数を返す"""
         if not isinstance(test_case_ids, list) or not all(isinstance(i, int) for i in test_case_ids):
             raise ValueError("test_case_ids は整数IDのリストである必要があります")
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
+        with scenario_db.get_connection() as conn:
             cur = conn.cursor()
             placeholders = ','.join('?' * len(test_case_ids))
             cur.execute(f"""
@@ -224,44 +272,19 @@ class ScenarioDeleteWidget(QWidget):
             return
         
         try:
-            with sqlite3.connect(scenario_db.DB_PATH) as conn:
-                cur = conn.cursor()
-                # sqlite3 のコンテキストマネージャ内では自動でトランザクション開始されるため明示的BEGINは不要
-                
-                for cid in cids:
-                    # データ整合性を保つための適切な削除順序
-                    # 1. bugsテーブルのtest_item_id参照を解除
-                    cur.execute("""
-                        UPDATE bugs SET test_item_id = NULL 
-                        WHERE test_item_id IN (
-                            SELECT id FROM test_items WHERE test_case_id = ?
-                        )
-                    """, (cid,))
-                    
-                    # 2. test_itemsテーブルのbug_id参照を解除（念のため）
-                    cur.execute("UPDATE test_items SET bug_id = NULL WHERE test_case_id = ?", (cid,))
-                    
-                    # 3. test_itemsを削除
-                    cur.execute("DELETE FROM test_items WHERE test_case_id=?", (cid,))
-                    
-                    # 4. 最後にtest_casesを削除
-                    cur.execute("DELETE FROM test_cases WHERE id=?", (cid,))
-                
-                # 全ての処理が成功した場合のみコミット
-                conn.commit()
-                
-                # 削除完了メッセージ
-                completion_msg = f"{len(cids)} 件のシナリオを削除しました"
-                if related_bugs_count > 0:
-                    completion_msg += f"\n{related_bugs_count} 件のバグ情報の参照も更新されました"
-                QMessageBox.information(self, "削除完了", completion_msg)
-                
-                # テーブル更新と削除ボタン状態リセット
-                self._load_table()
-                self.delete_btn.setEnabled(False)  # 削除後はボタンを無効化
-                # 他の画面にも削除完了を通知
-                self.deletion_completed.emit()
-                
+            # 配下のテスト項目も含めて1つのトランザクションで削除（失敗時は全件ロールバック）
+            counts = cascade_delete.delete_test_cases(cids)
+            # 削除完了メッセージ
+            completion_msg = f"{counts['test_cases']} 件のシナリオを削除しました"
+            if counts["unlinked_bugs"] > 0:
+                completion_msg += f"\n{counts['unlinked_bugs']} 件のバグ情報の参照も更新されました"
+            QMessageBox.information(self, "削除完了", completion_msg)
+
+            # 一覧（他の画面を含む）から削除した行を除く
+            get_store().notify_removed(CASE, cids)
+            self.delete_btn.setEnabled(False)  # 削除後はボタンを無効化
+            self.deletion_completed.emit()
+
         except sqlite3.Error as e:
             # データベースエラーの場合
             QMessageBox.critical(
@@ -0,0 +1,263 @@
+"""
+シナリオ一覧（テスト項目一覧）のテーブルモデル
+行データは列ごとの辞書符号化（値の一覧＋行ごとのインデックス配列）で保持し、
+表示文字列・文字色は data() で表示中のセルの分だけ求める
+"""
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+from PyQt5.QtGui import QColor
+
+# 表示列（操作列は固定値）
+HEADERS = ["プロジェクト", "画面名", "テストケース", "テスト項目名", "優先度", "担当者", "結果", "操作"]
+COL_PRIORITY = 4
+COL_RESULT = 6
+COL_ACTION = 7
+# 値が空の場合の表示（データ列のみ）
+DEFAULT_VALUES = ("", "", "", "", "-", "-", "未実施")
+
+# 文字色（優先度・結果）
+PRIORITY_COLORS = {"高": QColor("red"), "中": QColor("orange"), "低": QColor("blue")}
+RESULT_COLORS = {"成功": QColor("green"), "失敗": QColor("red"), "要確認": QColor("orange")}
+
+
+class ColumnStore:
+    """
+    列指向の行ストア
+    各列は「重複を除いた値のリスト」と「行→値インデックスの配列」で持つため、
+    同じ画面名・担当者などが何万行あっても文字列は1つだけになる
+    """
+    def __init__(self, column_count: int):
+        self.values: List[List[str]] = [[] for _ in range(column_count)]
+        self.codes: List[array] = [array("i") for _ in range(column_count)]
+        self._lookup: List[Dict[str, int]] = [{} for _ in range(column_count)]
+        self._ranks: Dict[int, array] = {}
+
+    def __len__(self) -> int:
+        return len(self.codes[0]) if self.codes else 0
+
+    def append(self, row: Sequence[str]) -> None:
+        """1行追加"""
+        for col, value in enumerate(row):
+            lookup = self._lookup[col]
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(self.values[col])
+                self.values[col].append(value)
+            self.codes[col].append(code)
+
+    def value(self, row: int, col: int) -> str:
+        return self.values[col][self.codes[col][row]]
+
+    def sort_keys(self, col: int) -> array:
+        """列の値の並び順（値インデックス→順位、列ごとに1回だけ計算）"""
+        ranks = self._ranks.get(col)
+        if ranks is None or len(ranks) != len(self.values[col]):
+            ranks = self._ranks[col] = self._compute_ranks(col)
+        return ranks
+
+    def _compute_ranks(self, col: int) -> array:
+        values = self.values[col]
+        ranks = array("i", bytes(4 * len(values)))
+        for rank, code in enumerate(sorted(range(len(values)), key=values.__getitem__)):
+            ranks[code] = rank
+        return ranks
+
+
+def build_store(rows: Iterable[Sequence[Optional[str]]]) -> ColumnStore:
+    """
+    行データ（DEFAULT_VALUESと同じ並びのタプル）からストアを作る
+    空の値は表示用の既定値に置き換える（ワーカースレッドからも呼べる）
+    """
+    store = ColumnStore(len(DEFAULT_VALUES))
+    defaults = DEFAULT_VALUES
+    for row in rows:
+        store.append([value or default for value, default in zip(row, defaults)])
+    return store
+
+
+class ScenarioListModel(QAbstractTableModel):
+    """
+    シナリオ一覧用の読み取り専用モデル
+    ソートは行番号の並べ替え（順列）だけを作り直し、セルのデータ自体は動かさない
+    行フィルタ（マスク）はソート済みの並びから表示する行を抜き出すだけなので、
+    入力中の絞り込みでもソートをやり直さない
+    続きのページがある場合、ビューが末尾までスクロールすると fetch_more_requested を通知する
+    （続きの行は append_rows で追加）
+    続きのページがある間は読み込み済みの行だけでは全体の並びにならないため、ソートは
+    sort_requested を通知するだけにし、その列の並びで読み直した最初のページを set_store で受け取る
+    """
+    # 続きのページの読み込み要求
+    fetch_more_requested = pyqtSignal()
+    # 列の並びで最初のページから読み直す要求（列, Qt.SortOrder）
+    sort_requested = pyqtSignal(int, int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._store = ColumnStore(len(DEFAULT_VALUES))
+        # ストア全行のソート済みの並びと、そのうち表示する行
+        self._sorted = array("i")
+        self._mask: Optional[bytearray] = None
+        self._order = array("i")
+        self._sort_column = -1
+        self._sort_order = Qt.AscendingOrder
+        self._has_more = False
+        self._fetching = False
+
+    # ------------------------------ データ設定 ------------------------------
+    def set_rows(self, rows: Iterable[Sequence[Optional[str]]]) -> None:
+        """
+        行データを入れ替える（rows: DEFAULT_VALUESと同じ並びのタプル、カーソルをそのまま渡せる）
+        """
+        self.set_store(build_store(rows))
+
+    def set_store(self, store: ColumnStore, has_more: bool = False) -> None:
+        """
+        作成済みのストアに入れ替える（has_more: 続きのページがあるか）
+        直前のソート条件があれば再適用する
+        """
+        self.beginResetModel()
+        self._store = store
+        self._has_more = has_more
+        self._fetching = False
+        self._mask = None
+        self._sorted = array("i", range(len(store)))
+        if self._sort_column >= 0:
+            self._apply_sort(self._sort_column, self._sort_order)
+        self._apply_mask()
+        self.endResetModel()
+
+    def append_rows(self, rows: Iterable[Sequence[Optional[str]]], has_more: bool) -> None:
+        """
+        続きのページの行を末尾に追加する（has_more: さらに続きがあるか）
+        ソート中なら読み込み済みの行全体でソートし直す
+        （ページがソート列の並びで読まれていれば、読み込み済みの行は動かず末尾に続く）
+        """
+        store = self._store
+        start = len(store)
+        for row in rows:
+            store.append([value or default for value, default in zip(row, DEFAULT_VALUES)])
+        added = len(store) - start
+        self._has_more = has_more
+        self._fetching = False
+        if not added:
+            return
+        if self._mask is not None:
+            self._mask.extend(b"\x01" * added)
+        first = len(self._order)
+        self.beginInsertRows(QModelIndex(), first, first + added - 1)
+        self._sorted = self._sorted + array("i", range(start, start + added))
+        self._apply_mask()
+        self.endInsertRows()
+        if self._sort_column >= 0:
+            self._sort_loaded(self._sort_column, self._sort_order)
+
+    def set_row_filter(self, mask: Optional[bytearray]) -> None:
+        """
+        表示する行を絞り込む（mask: ストアの行ごとに表示するなら1、Noneで全行表示）
+        """
+        self.beginResetModel()
+        self._mask = mask
+        self._apply_mask()
+        self.endResetModel()
+
+    def clear(self) -> None:
+        """全行を削除"""
+        self.set_rows([])
+
+    def sort_state(self) -> Tuple[int, Qt.SortOrder]:
+        """現在のソート条件 (列, 並び順)。ソートしていない場合の列は -1"""
+        return self._sort_column, self._sort_order
+
+    def row_values(self, row: int) -> List[str]:
+        """表示行のデータ列の値"""
+        source = self._order[row]
+        return [self._store.value(source, col) for col in range(len(DEFAULT_VALUES))]
+
+    # ------------------------------ モデルAPI ------------------------------
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._order)
+
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return not parent.isValid() and self._has_more and not self._fetching
+
+    def fetchMore(self, parent: QModelIndex = QModelIndex()) -> None:
+        if self.canFetchMore(parent):
+            self._fetching = True
+            self.fetch_more_requested.emit()
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole) -> Any:
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal and 0 <= section < len(HEADERS):
+            return HEADERS[section]
+        return None
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        col = index.column()
+        if role == Qt.DisplayRole:
+            if col == COL_ACTION:
+                # 操作ボタンは未実装のため現在は表示しない
+                return "-"
+            return self._store.value(self._order[index.row()], col)
+        if role == Qt.ForegroundRole:
+            if col == COL_PRIORITY:
+                return PRIORITY_COLORS.get(self._store.value(self._order[index.row()], col))
+            if col == COL_RESULT:
+                return RESULT_COLORS.get(self._store.value(self._order[index.row()], col))
+        return None
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.AscendingOrder) -> None:
+        """
+        列でソート（同じ値の行は読み込んだ順＝プロジェクト・画面・ケース順を保つ）
+        続きのページがある場合は並べ替えずに sort_requested で読み直しを要求する
+        （読み直したページは列の値・テスト項目ID順に届くので、同じ値の行はテスト項目ID順になる）
+        """
+        if not 0 <= column < len(DEFAULT_VALUES):
+            return
+        if self._has_more:
+            self._sort_column = column
+            self._sort_order = order
+            self.sort_requested.emit(column, int(order))
+            return
+        self._sort_loaded(column, order)
+
+    def _sort_loaded(self, column: int, order: Qt.SortOrder) -> None:
+        """読み込み済みの行を列でソートする"""
+        self.layoutAboutToBeChanged.emit()
+        # 選択中の行などの永続インデックスをソート後の位置へ付け替える
+        persistent = self.persistentIndexList()
+        sources = [self._order[index.row()] for index in persistent]
+        self._apply_sort(column, order)
+        self._apply_mask()
+        if persistent:
+            positions = array("i", bytes(4 * len(self._store)))
+            for row, source in enumerate(self._order):
+                positions[source] = row
+            self.changePersistentIndexList(
+                persistent,
+                [self.index(positions[source], index.column()) for source, index in zip(sources, persistent)],
+            )
+        self.layoutChanged.emit()
+
+    def _apply_sort(self, column: int, order: Qt.SortOrder) -> None:
+        self._sort_column = column
+        self._sort_order = order
+        ranks = self._store.sort_keys(column)
+        codes = self._store.codes[column]
+        self._sorted = array("i", sorted(
+            range(len(self._store)),
+            key=lambda i: ranks[codes[i]],
+            reverse=(order == Qt.DescendingOrder),
+        ))
+
+    def _apply_mask(self) -> None:
+        mask = self._mask
+        if mask is None:
+            self._order = self._sorted
+        else:
+            self._order = array("i", [i for i in self._sorted if mask[i]])
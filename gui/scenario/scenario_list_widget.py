@@ -5,21 +5,48 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core import scenario_db
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTableWidget, QTableWidgetItem, QHeaderView, QPushButton, QHBoxLayout, QLineEdit, QLabel, QComboBox
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QColor
-from typing import Optional
+from core.hierarchy_store import get_store, PROJECT, ADDED, REMOVED, RESET
+from core.incremental_search import IncrementalSearch, fetch_search_base
+from gui.scenario.scenario_list_model import ScenarioListModel, build_store
+from gui.common.db_worker import QueryRunner, BusyIndicator
+from gui.common.hierarchy_view import subscribe_hierarchy, insert_entry, remove_entries
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTableView, QHeaderView, QPushButton, QHBoxLayout, QLineEdit, QLabel, QComboBox
+from PyQt5.QtCore import Qt, QTimer
+from typing import Optional, Tuple
+
+# 入力が止まってから検索するまでの待ち時間（ミリ秒）
+SEARCH_DEBOUNCE_MS = 200
 
 class ScenarioListWidget(QWidget):
     """
     シナリオ一覧表示ウィジェット
+    検索キーワードは入力に合わせて絞り込む（入力中はDB検索結果をメモリ上で絞り込む）
     """
     def __init__(self, parent=None):
         super().__init__(parent)
-        # データベースの初期化を確実に行う
-        scenario_db.init_db()
+        self._runner = QueryRunner(self)
+        self._search = IncrementalSearch()
+        # 一覧に表示するプロジェクト（None: 全プロジェクト）。検索・ソート・読み直しはすべてこの範囲で行う
+        self._scope_project_id: Optional[int] = None
+        # 一覧のページング状態（プロジェクト・ソート列と降順か・次ページのカーソル・総件数。検索中の総件数はNone）
+        self._page_project_id: Optional[int] = None
+        self._page_sort: Tuple[Optional[int], bool] = (None, False)
+        self._page_cursor = None
+        self._total_count: Optional[int] = None
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self._search_timer.timeout.connect(self._on_search)
+        # データ変更の通知は1回の読み直しにまとめる（非表示中は次に表示されたときに読み直す）
+        self._project_list = []
+        self._stale = False
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(0)
+        self._refresh_timer.timeout.connect(self._refresh)
         self._init_ui()
         self._load_projects()
+        subscribe_hierarchy(self, self._on_hierarchy_changed)
         
     def _init_ui(self):
         """UI要素の初期化"""
@@ -53,13 +80,29 @@ class ScenarioListWidget(QWidget):
         self.search_edit.setPlaceholderText("テスト項目名・テストケース名・画面名・担当者など")
         self.search_button = QPushButton("検索")
         self.search_button.clicked.connect(self._on_search)
+        # 入力のたびにタイマーを掛け直し、入力が止まったら検索する
+        self.search_edit.textChanged.connect(self._search_timer.start)
+        self.search_edit.returnPressed.connect(self._on_search)
         search_layout.addWidget(search_label)
         search_layout.addWidget(self.search_edit)
         search_layout.addWidget(self.search_button)
+        self.count_label = QLabel("")
+        search_layout.addWidget(self.count_label)
         layout.addLayout(search_layout)
 
+        # 読み込み中表示
+        self.busy_indicator = BusyIndicator()
+        self.busy_indicator.attach(self._runner)
+        layout.addWidget(self.busy_indicator)
+
         # テーブルを作成してから初期化
-        self.table = QTableWidget()
+        self.model = ScenarioListModel(self)
+        self.model.fetch_more_requested.connect(self._fetch_next_page)
+        self.model.sort_requested.connect(self._on_sort_requested)
+        self.model.modelReset.connect(self._update_count_label)
+        self.model.rowsInserted.connect(self._update_count_label)
+        self.table = QTableView()
+        self.table.setModel(self.model)
         layout.addWidget(self.table)
         
         # テーブルの初期化を確実に行う
@@ -69,10 +112,6 @@ class ScenarioListWidget(QWidget):
     
     def _init_table(self):
         """テーブルの初期化"""
-        self.table.setColumnCount(8)
-        self.table.setHorizontalHeaderLabels([
-            "プロジェクト", "画面名", "テストケース", "テスト項目名", "優先度", "担当者", "結果", "操作"
-        ])
         header = self.table.horizontalHeader()
         if header:
             header.setSectionResizeMode(QHeaderView.Stretch)
@@ -80,63 +119,75 @@ class ScenarioListWidget(QWidget):
             header.setVisible(True)
             # ソート機能を有効化
             header.setSortIndicatorShown(True)
-            # ヘッダークリック時のカスタムソートは不要のためメソッド削除
         self.table.setSelectionBehavior(self.table.SelectRows)
         self.table.setEditTriggers(self.table.NoEditTriggers)
-        # ソート機能を有効化
+        # ソート機能を有効化（ヘッダークリックでモデルのsortが呼ばれる）
         self.table.setSortingEnabled(True)
         # 垂直ヘッダー（行番号）のみ非表示
         vheader = self.table.verticalHeader()
         if vheader:
             vheader.setVisible(False)
-        # 初期状態では行を0に設定し、内容をクリア
-        self.table.setRowCount(0)
-        self.table.clearContents()
-        # ヘッダーの表示を確実にする
+            # 行の高さを固定し、表示範囲外の行のサイズ計算を省く
+            vheader.setSectionResizeMode(QHeaderView.Fixed)
         self.table.setShowGrid(True)
         self.table.setAlternatingRowColors(True)
     
     def _on_search(self):
         """検索ボタン押下時の処理"""
+        self._search_timer.stop()
         keyword = self.search_edit.text().strip()
         self._load_scenarios(keyword)
     
     def _load_projects(self):
-        """DBからプロジェクト一覧を取得しコンボボックスにセット"""
-        import sqlite3
+        """階層ストアからプロジェクト一覧を取得しコンボボックスにセット"""
+        try:
+            projects = get_store().get_projects()
+        except Exception as e:
+            print(f"DBエラー: {e}")
+            projects = None
+        self._on_projects_loaded(projects)
+
+    def _on_projects_loaded(self, projects):
         self.project_combo.blockSignals(True)
         self.project_combo.clear()
         self._project_list = []
-        try:
-            with sqlite3.connect(scenario_db.DB_PATH) as conn:
-                cur = conn.cursor()
-                cur.execute("SELECT id, name FROM projects ORDER BY id")
-                for pid, name in cur.fetchall():
-                    self.project_combo.addItem(name, pid)
-                    self._project_list.append((pid, name))
-        except Exception as e:
+        if projects is None:
             self.project_combo.addItem("(DBエラー)")
-        self.project_combo.blockSignals(False)
-        if self._project_list:
-            self.project_combo.setCurrentIndex(0)
-            self.current_project.setText(f"現在: {self._project_list[0][1]}")
         else:
+            for pid, name in projects:
+                self.project_combo.addItem(name, pid)
+                self._project_list.append((pid, name))
+        # 一覧の読み込みは呼び出し元が別途要求するため、ここでは選択変更を通知しない
+        ids = [pid for pid, _ in self._project_list]
+        if self._scope_project_id in ids:
+            idx = ids.index(self._scope_project_id)
+            self.project_combo.setCurrentIndex(idx)
+            self.current_project.setText(f"現在: {self._project_list[idx][1]}")
+        else:
+            # 全プロジェクトの表示中（表示中のプロジェクトがなくなった場合を含む）はどれも選択しない
+            self._scope_project_id = None
+            if self._project_list:
+                self.project_combo.setCurrentIndex(-1)
             self.current_project.setText("現在: -")
+        self.project_combo.blockSignals(False)
 
     def _on_project_selected(self, idx: int):
-        """プロジェクト選択時の処理"""
-        if hasattr(self, '_project_list') and idx is not None and 0 <= idx < len(self._project_list):
+        """プロジェクト選択時の処理（選択肢の追加・削除で位置だけが変わった場合は読み直さない）"""
+        if idx is not None and 0 <= idx < len(self._project_list):
             pid, name = self._project_list[idx]
-            self.current_project.setText(f"現在: {name}")
-            self._load_scenarios(project_id=pid)
+            label = f"現在: {name}"
         else:
-            self.current_project.setText("現在: -")
-            self._load_scenarios()
+            pid, label = None, "現在: -"
+        self.current_project.setText(label)
+        if pid == self._scope_project_id:
+            return
+        self._scope_project_id = pid
+        self._load_scenarios(self.search_edit.text().strip())
 
     def _on_project_search(self):
         """プロジェクト名検索時の処理（エディットボックスでEnter/フォーカスアウト時）"""
         text = self.project_combo.currentText().strip()
-        if not text or not hasattr(self, '_project_list'):
+        if not text:
             return
         # 完全一致優先、部分一致で最も近いものを選択
         idx = -1
@@ -159,119 +210,84 @@ class ScenarioListWidget(QWidget):
             self.project_combo.setCurrentIndex(idx)
         else:
             # 一致なし
+            self._scope_project_id = None
             self.current_project.setText("現在: - (該当なし)")
-            self._load_scenarios()
+            self._load_scenarios(self.search_edit.text().strip())
 
-    def _load_scenarios(self, keyword: str = "", project_id: Optional[int] = None):
-        """テスト項目一覧を取得してテーブルに表示（キーワード・プロジェクト対応）"""
-        import sqlite3
-        # データ読み込み前にテーブルをクリア
-        self.table.clearContents()
-        self.table.setRowCount(0)
-        test_items = []
-        try:
-            with sqlite3.connect(scenario_db.DB_PATH) as conn:
-                cur = conn.cursor()
-                # テスト項目テーブルから詳細情報を取得
-                if project_id:
-                    cur.execute("""
-                        SELECT 
-                            p.name as project_name,
-                            s.name as screen_name,
-                            tc.name as testcase_name,
-                            ti.name as testitem_name,
-                            ti.priority,
-                            ti.tester,
-                            ti.result
-                        FROM test_items ti
-                        JOIN test_cases tc ON ti.test_case_id = tc.id
-                        JOIN screens s ON tc.screen_id = s.id
-                        JOIN projects p ON s.project_id = p.id
-                        WHERE p.id = ?
-                        ORDER BY p.name, s.name, tc.name, ti.id
-                    """, (project_id,))
-                else:
-                    cur.execute("""
-                        SELECT 
-                            p.name as project_name,
-                            s.name as screen_name,
-                            tc.name as testcase_name,
-                            ti.name as testitem_name,
-                            ti.priority,
-                            ti.tester,
-                            ti.result
-                        FROM test_items ti
-                        JOIN test_cases tc ON ti.test_case_id = tc.id
-                        JOIN screens s ON tc.screen_id = s.id
-                        JOIN projects p ON s.project_id = p.id
-                        ORDER BY p.name, s.name, tc.name, ti.id
-                    """)
-                for row in cur.fetchall():
-                    test_items.append({
-                        'project_name': row[0],
-                        'screen_name': row[1],
-                        'testcase_name': row[2],
-                        'testitem_name': row[3],
-                        'priority': row[4] or '-',
-                        'tester': row[5] or '-',
-                        'result': row[6] or '未実施'
-                    })
-        except Exception as e:
-            print(f"DBエラー: {e}")
-            print(f"詳細: {str(e)}")
+    def _load_scenarios(self, keyword: str = ""):
+        """テスト項目一覧を取得してテーブルに表示（表示中のプロジェクトの範囲、キーワード対応）"""
+        project_id = self._scope_project_id
         if keyword:
-            keyword_lower = keyword.lower()
-            test_items = [item for item in test_items if
-                keyword_lower in str(item['testcase_name']).lower() or
-                keyword_lower in str(item['testitem_name']).lower() or
-                keyword_lower in str(item['screen_name']).lower() or
-                keyword_lower in str(item['project_name']).lower() or
-                keyword_lower in str(item['tester']).lower()
-            ]
-        # データがない場合は空のテーブルを表示
-        if not test_items:
-            self.table.setRowCount(0)
+            # 前回のDB検索結果から絞り込めるならDBには問い合わせない
+            mask = self._search.refine(project_id, keyword)
+            if mask is not None:
+                self._runner.cancel("scenarios", "scenario_page")
+                self.model.set_row_filter(mask)
+                return
+            self._runner.cancel("scenario_page")
+            self._total_count = None
+            on_result = lambda result: self._on_search_loaded(project_id, keyword, result)
+            self._runner.request(
+                "scenarios", _query_search_store, project_id, keyword,
+                on_result=on_result, on_error=self._on_load_error
+            )
             return
-            
-        # 既存のセルウィジェットをクリア
-        self.table.clearContents()
-        self.table.setRowCount(len(test_items))
-        
-        for row, item in enumerate(test_items):
-            # データ行のみにアイテムを設定
-            self.table.setItem(row, 0, QTableWidgetItem(item['project_name']))
-            self.table.setItem(row, 1, QTableWidgetItem(item['screen_name']))
-            self.table.setItem(row, 2, QTableWidgetItem(item['testcase_name']))
-            self.table.setItem(row, 3, QTableWidgetItem(item['testitem_name']))
-            
-            # 優先度色分け
-            priority_item = QTableWidgetItem(item['priority'])
-            if item['priority'] == '高':
-                priority_item.setForeground(QColor('red'))
-            elif item['priority'] == '中':
-                priority_item.setForeground(QColor('orange'))
-            elif item['priority'] == '低':
-                priority_item.setForeground(QColor('blue'))
-            self.table.setItem(row, 4, priority_item)
-            
-            self.table.setItem(row, 5, QTableWidgetItem(item['tester']))
-            
-            # 実行結果色分け
-            result_item = QTableWidgetItem(item['result'])
-            if item['result'] == '成功':
-                result_item.setForeground(QColor('green'))
-            elif item['result'] == '失敗':
-                result_item.setForeground(QColor('red'))
-            elif item['result'] == '要確認':
-                result_item.setForeground(QColor('orange'))
-            self.table.setItem(row, 6, result_item)
-            
-            # 操作ボタンは未実装のため現在は表示しない
-            self.table.setItem(row, 7, QTableWidgetItem("-"))
+        # 一覧全体を読み直す場合は絞り込みの基準結果も破棄する（データ変更の反映を含む）
+        self._search.clear()
+        # 最初のページだけを読み、続きはスクロールに合わせて読み込む（ソート中はその列の並びで読む）
+        column, order = self.model.sort_state()
+        sort = (column if column >= 0 else None, order == Qt.DescendingOrder)
+        self._runner.cancel("scenario_page")
+        self._runner.request(
+            "scenarios", _query_first_page, project_id, *sort,
+            on_result=lambda result: self._on_first_page_loaded(project_id, sort, result),
+            on_error=self._on_load_error
+        )
+
+    def _on_sort_requested(self, column: int, order: int):
+        """続きのページがある一覧のソート（ソート列の並びで最初のページから読み直す）"""
+        self._load_scenarios()
+
+    def _on_first_page_loaded(self, project_id: Optional[int], sort, result):
+        store, cursor, total = result
+        # 読み直す前の並びで要求した続きのページは使わない
+        self._runner.cancel("scenario_page")
+        self._page_project_id = project_id
+        self._page_sort = sort
+        self._page_cursor = cursor
+        self._total_count = total
+        self.model.set_store(store, has_more=cursor is not None)
+
+    def _fetch_next_page(self):
+        """一覧の続きのページを読み込む（モデルからの要求）"""
+        self._runner.request(
+            "scenario_page", scenario_db.get_test_item_page, self._page_project_id, self._page_cursor,
+            scenario_db.ITEM_PAGE_SIZE, *self._page_sort,
+            on_result=self._on_next_page_loaded, on_error=self._on_load_error
+        )
+
+    def _on_next_page_loaded(self, result):
+        rows, cursor = result
+        self._page_cursor = cursor
+        self.model.append_rows(rows, has_more=cursor is not None)
+
+    def _update_count_label(self):
+        """件数表示（一覧は 読み込み済み / 全件数、検索は一致件数）"""
+        if self._total_count is None:
+            self.count_label.setText(f"{self.model.rowCount()} 件")
+        else:
+            self.count_label.setText(f"{self.model.rowCount()} / {self._total_count} 件")
+
+    def _on_search_loaded(self, project_id: Optional[int], keyword: str, result):
+        store, texts = result
+        self._search.set_base(project_id, keyword, texts)
+        self.model.set_store(store)
+
+    def _on_load_error(self, error: Exception):
+        print(f"DBエラー: {error}")
+        self.model.clear()
 
     def _get_project_name(self, project_id):
-        if not hasattr(self, '_project_list'):
-            return "-"
         for pid, name in self._project_list:
             if pid == project_id:
                 return name
@@ -284,29 +300,59 @@ class ScenarioListWidget(QWidget):
         """
         from gui.common.import_excel_dialog import ImportExcelDialog
         dialog = ImportExcelDialog(self._project_list, self)
-        result = dialog.exec_()
-        # ダイアログ終了後に必ず一覧を再読み込み
-        # データベースの変更を確実に反映するため、少し待機してから再読み込み
-        from PyQt5.QtCore import QTimer
-        QTimer.singleShot(100, self._force_refresh)
-    
-    def _force_refresh(self):
-        """強制的にプロジェクトとシナリオ一覧を再読み込み"""
-        self._load_projects()
-        self._load_scenarios()
-        print("Excelインポート後の一覧更新完了")
+        # 取り込んだ内容は階層ストアの変更通知（RESET）で一覧に反映される
+        dialog.exec_()
 
     def _on_refresh(self):
         """
         更新ボタン押下時の処理（プロジェクト・シナリオ一覧を再読み込み）
         """
         self._load_projects()
-        self._load_scenarios()
+        self._refresh()
+
+    def _on_hierarchy_changed(self, event):
+        """
+        階層の変更を反映（プロジェクトの選択肢は差分で更新し、一覧は1回だけ読み直す）
+        """
+        if event.level == PROJECT and event.kind == ADDED:
+            insert_entry(self.project_combo, self._project_list, event.ids[0], event.name)
+            return
+        if event.level == PROJECT and event.kind == REMOVED:
+            # 選択中のプロジェクトが消えた場合は選択変更で一覧が読み直される
+            remove_entries(self.project_combo, self._project_list, event.ids)
+            return
+        if event.kind == RESET:
+            self._load_projects()
+        self._stale = True
+        if self.isVisible():
+            self._refresh_timer.start()
+
+    def _refresh(self):
+        """表示中のプロジェクト・キーワードのまま一覧を読み直す（データ変更の反映）"""
+        self._stale = False
+        # 絞り込みの基準結果は変更前のデータのため破棄する
+        self._search.clear()
+        self._load_scenarios(self.search_edit.text().strip())
 
     def showEvent(self, event):
         super().showEvent(event)
-        # 初回表示時のみデータを読み込む
+        # 初回表示時のみデータを読み込む（非表示中にデータが変わっていれば読み直す）
         if not hasattr(self, '_initialized'):
             self._load_projects()
             self._load_scenarios()
             self._initialized = True
+            self._stale = False
+        elif self._stale:
+            self._refresh()
+
+
+def _query_first_page(project_id: Optional[int], sort_column: Optional[int] = None, descending: bool = False):
+    """一覧の最初のページと総件数の取得、表示用ストアの作成（ワーカースレッドで実行）"""
+    rows, cursor = scenario_db.get_test_item_page(project_id, sort_column=sort_column, descending=descending)
+    return build_store(rows), cursor, scenario_db.count_test_items(project_id)
+
+
+def _query_search_store(project_id: Optional[int], keyword: str):
+    """キーワード検索と表示用ストア・絞り込み用テキストの作成（ワーカースレッドで実行）"""
+    rows, texts = fetch_search_base(keyword, project_id)
+    return build_store(rows), texts
@@ -47,19 +47,6 @@ class ScenarioManagementWidget(QWidget):
     def _connect_signals(self):
         """シグナル接続"""
         # 作成・削除時に外部に通知
+        # （作成・削除タブ相互の一覧更新は階層ストアの変更通知で行う）
         self.creation_widget.scenario_created.connect(self.scenario_changed.emit)
         self.delete_widget.deletion_completed.connect(self.scenario_changed.emit)
-        
-        # 作成・削除相互の更新
-        self.creation_widget.scenario_created.connect(self._on_scenario_updated)
-        self.delete_widget.deletion_completed.connect(self._on_scenario_updated)
-    
-    def _on_scenario_updated(self):
-        """シナリオ更新時の内部処理"""
-        # 削除タブの一覧を更新
-        if hasattr(self.delete_widget, '_load_table'):
-            self.delete_widget._load_table()
-        
-        # 作成タブのプロジェクト一覧を更新
-        if hasattr(self.creation_widget, '_load_projects'):
-            self.creation_widget._load_projects()
\ No newline at end of file
@@ -2,8 +2,10 @@
 画面（シナリオ）管理ウィジェット
 """
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QComboBox, QListWidget, QPushButton, QHBoxLayout, QMessageBox, QAbstractItemView
-from core import scenario_db
+from core import cascade_delete
+from core.hierarchy_store import get_store, PROJECT, SCREEN, ADDED, REMOVED, RESET
 from gui.common.utils import get_text_dialog, get_selected_rows_from_listwidget
+from gui.common.hierarchy_view import subscribe_hierarchy, insert_entry, remove_entries
 import sqlite3
 
 class ScreenManagementWidget(QWidget):
@@ -12,8 +14,11 @@ class ScreenManagementWidget(QWidget):
     """
     def __init__(self, parent=None):
         super().__init__(parent)
+        self._projects = []
+        self._screens = []
         self._init_ui()
         self._load_projects()
+        subscribe_hierarchy(self, self._on_hierarchy_changed)
 
     def _init_ui(self):
         layout = QVBoxLayout()
@@ -42,63 +47,70 @@ class ScreenManagementWidget(QWidget):
         layout.addLayout(btn_layout)
 
     def _load_projects(self):
+        self._projects = get_store().get_projects()
+        self.project_combo.blockSignals(True)
         self.project_combo.clear()
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT id, name FROM projects ORDER BY id")
-            self._projects = cur.fetchall()
-            for pid, name in self._projects:
-                self.project_combo.addItem(name, pid)
+        for pid, name in self._projects:
+            self.project_combo.addItem(name, pid)
+        self.project_combo.blockSignals(False)
         self._on_project_changed()
 
     def _on_project_changed(self):
+        self._load_screens(self._current_project_id())
+
+    def _current_project_id(self):
         idx = self.project_combo.currentIndex()
-        if idx < 0 or not hasattr(self, '_projects') or idx >= len(self._projects):
-            self.screen_list.clear()
-            return
-        pid = self._projects[idx][0]
-        self._load_screens(pid)
+        if idx < 0 or idx >= len(self._projects):
+            return None
+        return self._projects[idx][0]
 
     def _load_screens(self, project_id):
+        self._screens = get_store().get_screens(project_id)
         self.screen_list.clear()
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT id, name FROM screens WHERE project_id=? ORDER BY id", (project_id,))
-            self._screens = cur.fetchall()
-            for sid, name in self._screens:
-                self.screen_list.addItem(name)
+        for sid, name in self._screens:
+            self.screen_list.addItem(name)
         if self._screens:
             self.screen_list.setCurrentRow(0)
 
+    def _on_hierarchy_changed(self, event):
+        """階層の変更をプロジェクト選択・画面一覧に反映"""
+        if event.kind == RESET:
+            self._load_projects()
+        elif event.level == PROJECT:
+            if event.kind == ADDED:
+                insert_entry(self.project_combo, self._projects, event.ids[0], event.name)
+            elif event.kind == REMOVED:
+                remove_entries(self.project_combo, self._projects, event.ids)
+        elif event.level == SCREEN:
+            if event.kind == ADDED and event.parent_id == self._current_project_id():
+                insert_entry(self.screen_list, self._screens, event.ids[0], event.name)
+            elif event.kind == REMOVED:
+                remove_entries(self.screen_list, self._screens, event.ids)
+
     def _add_screen(self):
-        idx = self.project_combo.currentIndex()
-        if idx < 0 or not hasattr(self, '_projects') or idx >= len(self._projects):
+        pid = self._current_project_id()
+        if pid is None:
             QMessageBox.warning(self, "エラー", "プロジェクトを選択してください")
             return
-        pid = self._projects[idx][0]
         name, ok = get_text_dialog(self, "新規画面名を入力してください")
         if ok and name:
             name = name.strip()
             if not name or len(name) > 100:
                 QMessageBox.warning(self, "エラー", "画面名は1～100文字で入力してください")
                 return
-            with sqlite3.connect(scenario_db.DB_PATH) as conn:
-                cur = conn.cursor()
-                try:
-                    cur.execute("INSERT INTO screens (project_id, name) VALUES (?, ?)", (pid, name))
-                    conn.commit()
-                except sqlite3.IntegrityError:
-                    QMessageBox.warning(self, "エラー", "同名の画面が既に存在します")
-            self._load_screens(pid)
+            try:
+                # 一覧への追加は階層ストアの変更通知で行う
+                get_store().add_screen(pid, name)
+            except sqlite3.IntegrityError:
+                QMessageBox.warning(self, "エラー", "同名の画面が既に存在します")
 
     def _delete_screen(self):
-        pidx = self.project_combo.currentIndex()
-        if pidx < 0 or not hasattr(self, '_projects') or pidx >= len(self._projects):
+        pid = self._current_project_id()
+        if pid is None:
             QMessageBox.warning(self, "エラー", "プロジェクトを選択してください")
             return
-        pid = self._projects[pidx][0]
         # 共通関数で選択データ取得
-        delete_targets = get_selected_rows_from_listwidget(self.screen_list, getattr(self, '_screens', []))
+        delete_targets = get_selected_rows_from_listwidget(self.screen_list, self._screens)
         if not delete_targets:
             QMessageBox.warning(self, "エラー", "削除する画面を選択してください")
             return
@@ -110,26 +122,12 @@ class ScreenManagementWidget(QWidget):
             QMessageBox.Yes | QMessageBox.No
         )
         if reply == QMessageBox.Yes:
-            with sqlite3.connect(scenario_db.DB_PATH) as conn:
-                cur = conn.cursor()
-                errors = []
-                for sid, name in delete_targets:
-                    try:
-                        # テストケースID取得
-                        cur.execute("SELECT id FROM test_cases WHERE screen_id=?", (sid,))
-                        case_ids = [row[0] for row in cur.fetchall()]
-                        # テスト項目削除
-                        if case_ids:
-                            cur.executemany("DELETE FROM test_items WHERE test_case_id=?", [(cid,) for cid in case_ids])
-                        # テストケース削除
-                        cur.execute("DELETE FROM test_cases WHERE screen_id=?", (sid,))
-                        # 画面削除
-                        cur.execute("DELETE FROM screens WHERE id=?", (sid,))
-                    except Exception as e:
-                        errors.append(f"{name}: {str(e)}")
-                conn.commit()
-                if errors:
-                    QMessageBox.critical(self, "エラー", "\n".join(errors))
-                else:
-                    QMessageBox.information(self, "削除完了", f"選択した画面を削除しました")
-            self._load_screens(pid)
+            screen_ids = [sid for sid, _ in delete_targets]
+            try:
+                # 配下のテストケース・テスト項目もまとめて削除（関連バグからの参照は解除）
+                cascade_delete.delete_screens(screen_ids)
+            except Exception as e:
+                QMessageBox.critical(self, "エラー", f"画面の削除中にエラーが発生しました:\n{str(e)}")
+                return
+            get_store().notify_removed(SCREEN, screen_ids, pid)
+            QMessageBox.information(self, "削除完了", f"選択した画面を削除しました")
@@ -1,18 +1,51 @@
 """
 テスト実行専用ウインドウ
 """
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QPushButton, QTableWidget, QTableWidgetItem, QHBoxLayout, QMessageBox
-from PyQt5.QtCore import Qt
-import sqlite3
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QLabel, QPushButton, QTableWidget, QTableWidgetItem, QHBoxLayout, QMessageBox, QCheckBox
+)
+from PyQt5.QtCore import Qt, QTimer
 from core import scenario_db
+from core.hierarchy_store import get_store, CASE, SCREEN
+from gui.common.db_worker import QueryRunner
+
+# 表示列（No 以降は scenario_db.EXECUTION_ITEM_COLUMNS の並び）
+HEADERS = ["No", "テスト項目", "入力データ", "操作手順", "期待結果", "優先度", "担当者", "実施日", "結果", "不具合ID", "備考"]
+COL_BUG = 9
+# 自動保存までの待ち時間（最後の編集から、ミリ秒）
+AUTOSAVE_DELAY_MS = 2000
+# 不具合IDの入力形式（BUG-0001 または 番号のみ）
+_BUG_NO_PATTERN = re.compile(r"^(?:BUG-)?(\d+)$", re.IGNORECASE)
+
+# 変更内容: [(テスト項目ID, {列名: 値})] と、保存する時点の各行の表示文字列 {テスト項目ID: [...]}
+Changes = Tuple[List[Tuple[int, Dict[str, Any]]], Dict[int, List[str]]]
+
 
 class TestExecutionWindow(QWidget):
     """
     テスト実行専用ウインドウ
+    編集されたセルを読み込み時の値と比べて変更のある行だけを記録し、
+    保存ではその行の変更された列だけをまとめて更新する（自動保存をオンにすると編集が止まった時点で裏で保存）
     """
     def __init__(self, test_case_id: int, parent=None):
         super().__init__(parent)
         self.test_case_id = test_case_id
+        self._project_id: Optional[int] = None
+        # 表示行 → テスト項目ID / テスト項目ID → 表示行
+        self._row_ids: List[int] = []
+        self._rows: Dict[int, int] = {}
+        # テスト項目ID → DBに保存済みの各列の表示文字列（No列を除く）
+        self._saved: Dict[int, List[str]] = {}
+        # 保存済みの値から変わっているテスト項目ID
+        self._dirty: Set[int] = set()
+        self._runner = QueryRunner(self)
+        self._autosave_timer = QTimer(self)
+        self._autosave_timer.setSingleShot(True)
+        self._autosave_timer.setInterval(AUTOSAVE_DELAY_MS)
+        self._autosave_timer.timeout.connect(self._autosave)
         self.setWindowTitle("テスト実行ウインドウ")
         self.setGeometry(200, 200, 1000, 600)
         self._init_ui()
@@ -26,11 +59,10 @@ class TestExecutionWindow(QWidget):
 
         # テーブル
         self.table = QTableWidget()
-        self.table.setColumnCount(11)
-        self.table.setHorizontalHeaderLabels([
-            "No", "テスト項目", "入力データ", "操作手順", "期待結果", "優先度", "担当者", "実施日", "結果", "不具合ID", "備考"
-        ])
+        self.table.setColumnCount(len(HEADERS))
+        self.table.setHorizontalHeaderLabels(HEADERS)
         self.table.setEditTriggers(QTableWidget.AllEditTriggers)
+        self.table.itemChanged.connect(self._on_item_changed)
         layout.addWidget(self.table)
 
         # ボタン
@@ -38,49 +70,201 @@ class TestExecutionWindow(QWidget):
         self.save_btn = QPushButton("結果保存")
         self.save_btn.clicked.connect(self._save_results)
         btn_layout.addWidget(self.save_btn)
+        self.autosave_check = QCheckBox("自動保存")
+        self.autosave_check.toggled.connect(self._on_autosave_toggled)
+        btn_layout.addWidget(self.autosave_check)
+        self.file_bugs_btn = QPushButton("失敗項目を不具合登録")
+        self.file_bugs_btn.clicked.connect(self._file_bugs_for_failures)
+        btn_layout.addWidget(self.file_bugs_btn)
+        btn_layout.addStretch()
+        self.status_label = QLabel()
+        btn_layout.addWidget(self.status_label)
         layout.addLayout(btn_layout)
 
     def _load_test_items(self):
         # DBからテスト項目を取得
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT id, name, input_data, operation, expected, priority, assignee, exec_date, result, bug_id, remarks
-                FROM test_items WHERE test_case_id=? ORDER BY id
-            """, (self.test_case_id,))
-            items = cur.fetchall()
+        items = scenario_db.get_test_items_for_execution(self.test_case_id)
+        store = get_store()
+        self._project_id = store.get_parent_id(SCREEN, store.get_parent_id(CASE, self.test_case_id))
+        self._row_ids = []
+        self._rows = {}
+        self._saved = {}
+        self._dirty.clear()
+        self.table.blockSignals(True)
         self.table.setRowCount(len(items))
-        for row, item in enumerate(items):
-            for col, value in enumerate(item):
-                # bug_idは整数型。表示時はBUG-0001形式に変換
-                if col == 9 and value is not None and str(value).isdigit():
-                    cell = QTableWidgetItem(f"BUG-{int(value):04d}")
-                else:
-                    cell = QTableWidgetItem(str(value) if value is not None else "")
-                if col == 0:
-                    cell.setFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled)  # Noは編集不可
-                self.table.setItem(row, col, cell)
+        for row, (item_id, *values, bug_id, bug_no, remarks) in enumerate(items):
+            # 不具合はプロジェクト内番号でBUG-0001形式に表示
+            texts = ["" if v is None else str(v) for v in values]
+            texts.append(f"BUG-{bug_no:04d}" if bug_no is not None else "")
+            texts.append("" if remarks is None else str(remarks))
+            cell = QTableWidgetItem(str(item_id))
+            cell.setFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled)  # Noは編集不可
+            self.table.setItem(row, 0, cell)
+            for col, text in enumerate(texts, start=1):
+                self.table.setItem(row, col, QTableWidgetItem(text))
+            self._row_ids.append(item_id)
+            self._rows[item_id] = row
+            self._saved[item_id] = texts
+        self.table.blockSignals(False)
+        self._update_status()
+
+    # ------------------------------ 変更の記録 ------------------------------
+    def _row_texts(self, row: int) -> List[str]:
+        """表示行の各列（No列を除く）の文字列"""
+        texts = []
+        for col in range(1, len(HEADERS)):
+            cell = self.table.item(row, col)
+            texts.append(cell.text() if cell else "")
+        return texts
+
+    def _on_item_changed(self, cell: QTableWidgetItem):
+        row = cell.row()
+        if not 0 <= row < len(self._row_ids):
+            return
+        item_id = self._row_ids[row]
+        if self._row_texts(row) != self._saved[item_id]:
+            self._dirty.add(item_id)
+        else:
+            self._dirty.discard(item_id)
+        self._update_status()
+        if self._dirty and self.autosave_check.isChecked():
+            self._autosave_timer.start()
+
+    def _update_status(self, message: str = ""):
+        pending = f"未保存: {len(self._dirty)} 行" if self._dirty else "未保存の変更はありません"
+        self.status_label.setText(f"{message}  {pending}" if message else pending)
+
+    def _collect_changes(self) -> Changes:
+        """
+        変更のある行の変更された列だけを集める
+        不具合IDが見つからない場合は ValueError
+        """
+        changes = []
+        snapshot = {}
+        for item_id in sorted(self._dirty):
+            texts = self._row_texts(self._rows[item_id])
+            values = {}
+            for col, (text, saved) in enumerate(zip(texts, self._saved[item_id]), start=1):
+                if text != saved:
+                    values[scenario_db.EXECUTION_ITEM_COLUMNS[col - 1]] = self._to_db_value(col, text)
+            if values:
+                changes.append((item_id, values))
+                snapshot[item_id] = texts
+        return changes, snapshot
 
+    def _to_db_value(self, col: int, text: str) -> Any:
+        text = text.strip()
+        if col != COL_BUG:
+            return text or None
+        if not text:
+            return None
+        # 不具合ID欄はBUG-0001形式（プロジェクト内番号）→ bugs.id に変換
+        match = _BUG_NO_PATTERN.match(text)
+        bug_id = None
+        if match and self._project_id is not None:
+            bug_id = scenario_db.find_bug_id(self._project_id, int(match.group(1)))
+        if bug_id is None:
+            raise ValueError(f"不具合ID「{text}」はこのプロジェクトに登録されていません")
+        return bug_id
+
+    def _on_saved(self, snapshot: Dict[int, List[str]], count: int, message: str):
+        """保存した時点の値を保存済みとして記録する（保存中にさらに編集された行は未保存のまま）"""
+        for item_id, texts in snapshot.items():
+            self._saved[item_id] = texts
+            if self._row_texts(self._rows[item_id]) == texts:
+                self._dirty.discard(item_id)
+        self._update_status(message.format(count=count))
+        # 一覧・実行シナリオ選択などに結果の変更を通知
+        get_store().notify_items_changed([self.test_case_id])
+
+    # ------------------------------ 保存 ------------------------------
     def _save_results(self):
-        # テーブルの内容をDBに保存
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            for row in range(self.table.rowCount()):
-                item_id = self.table.item(row, 0).text()
-                values = []
-                for col in range(1, 11):
-                    val = self.table.item(row, col).text() if self.table.item(row, col) else None
-                    # bug_id欄（col==9）はBUG-0001形式→整数に変換
-                    if col == 9 and val and val.startswith("BUG-"):
-                        try:
-                            val = int(val.replace("BUG-", ""))
-                        except Exception:
-                            val = None
-                    values.append(val)
-                cur.execute("""
-                    UPDATE test_items SET
-                        name=?, input_data=?, operation=?, expected=?, priority=?, assignee=?, exec_date=?, result=?, bug_id=?, remarks=?
-                    WHERE id=?
-                """, (*values, item_id))
-            conn.commit()
-        QMessageBox.information(self, "保存完了", "テスト結果を保存しました")
+        # 変更のある行だけをDBに保存
+        count = self._save_pending()
+        if count is None:
+            return
+        if count:
+            QMessageBox.information(self, "保存完了", f"{count} 件のテスト項目を保存しました")
+        else:
+            QMessageBox.information(self, "保存", "変更はありません")
+
+    def _save_pending(self) -> Optional[int]:
+        """
+        未保存の変更を同期的に保存し、保存した行数を返す（失敗した場合は None）
+        自動保存の待ち・実行中のものは取り消して保存し直す
+        """
+        self._autosave_timer.stop()
+        self._runner.cancel("autosave")
+        try:
+            changes, snapshot = self._collect_changes()
+        except ValueError as e:
+            QMessageBox.warning(self, "入力エラー", str(e))
+            return None
+        if not changes:
+            return 0
+        try:
+            count = scenario_db.update_test_items(changes)
+        except Exception as e:
+            QMessageBox.critical(self, "エラー", f"テスト結果の保存に失敗しました: {str(e)}")
+            return None
+        self._on_saved(snapshot, count, "{count} 件のテスト項目を保存しました")
+        return count
+
+    def _on_autosave_toggled(self, checked: bool):
+        if checked and self._dirty:
+            self._autosave_timer.start()
+        elif not checked:
+            self._autosave_timer.stop()
+
+    def _autosave(self):
+        """変更のある行をワーカースレッドで保存する"""
+        try:
+            changes, snapshot = self._collect_changes()
+        except ValueError as e:
+            self._update_status(f"自動保存できません: {e}")
+            return
+        if not changes:
+            return
+        self._runner.request(
+            "autosave", scenario_db.update_test_items, changes,
+            on_result=lambda count: self._on_saved(snapshot, count, "{count} 件を自動保存しました"),
+            on_error=lambda e: self._update_status(f"自動保存に失敗しました: {e}"),
+        )
+
+    def closeEvent(self, event):
+        """未保存の変更があれば保存するか確認する（自動保存がオンなら確認せずに保存）"""
+        if self._dirty:
+            if self.autosave_check.isChecked():
+                reply = QMessageBox.Yes
+            else:
+                reply = QMessageBox.question(
+                    self, "確認", f"未保存の変更が {len(self._dirty)} 行あります。保存しますか？",
+                    QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel
+                )
+            if reply == QMessageBox.Cancel or (reply == QMessageBox.Yes and self._save_pending() is None):
+                event.ignore()
+                return
+        self._autosave_timer.stop()
+        self._runner.cancel()
+        super().closeEvent(event)
+
+    def _file_bugs_for_failures(self):
+        """結果が「失敗」で不具合未登録のテスト項目について、不具合をまとめて登録する（未保存の変更は先に保存）"""
+        reply = QMessageBox.question(
+            self, "確認",
+            "結果が「失敗」のテスト項目について不具合を登録しますか？\n（未保存の変更は先に保存します。不具合登録済みの項目は対象外です）",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if reply != QMessageBox.Yes or self._save_pending() is None:
+            return
+        try:
+            bug_ids = scenario_db.file_bugs_for_failed_items([self.test_case_id])
+        except Exception as e:
+            QMessageBox.critical(self, "エラー", f"不具合の登録に失敗しました: {str(e)}")
+            return
+        if not bug_ids:
+            QMessageBox.information(self, "不具合登録", "登録対象の失敗項目はありません")
+            return
+        self._load_test_items()
+        get_store().notify_items_changed([self.test_case_id])
+        QMessageBox.information(self, "不具合登録", f"{len(bug_ids)} 件の不具合を登録しました\n{', '.join(bug_ids)}")
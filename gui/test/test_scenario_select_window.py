@@ -3,8 +3,10 @@
 """
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QComboBox, QListWidget, QPushButton, QHBoxLayout, QMessageBox
 from PyQt5.QtCore import Qt
-import sqlite3
 from core import scenario_db
+from core.hierarchy_store import get_store, PROJECT, SCREEN, CASE, ADDED, REMOVED, CHANGED, RESET
+from gui.common.db_worker import QueryRunner, BusyIndicator
+from gui.common.hierarchy_view import subscribe_hierarchy, insert_entry, remove_entries
 from .test_execution_window import TestExecutionWindow
 
 class TestScenarioSelectWindow(QWidget):
@@ -16,12 +18,20 @@ class TestScenarioSelectWindow(QWidget):
         super().__init__(parent)
         self.setWindowTitle("テスト実行シナリオ選択")
         self.setGeometry(250, 250, 600, 400)
+        self._runner = QueryRunner(self)
+        self._projects = []
+        self._screens = []
+        self._scenarios = []
         self._init_ui()
         self._load_projects()
+        subscribe_hierarchy(self, self._on_hierarchy_changed)
 
     def _init_ui(self):
         layout = QVBoxLayout()
         self.setLayout(layout)
+        self.busy_indicator = BusyIndicator()
+        self.busy_indicator.attach(self._runner)
+        layout.addWidget(self.busy_indicator)
         layout.addWidget(QLabel("プロジェクト選択"))
         self.project_combo = QComboBox()
         self.project_combo.currentIndexChanged.connect(self._on_project_changed)
@@ -40,60 +50,85 @@ class TestScenarioSelectWindow(QWidget):
         layout.addLayout(btn_layout)
 
     def _load_projects(self):
+        self._projects = get_store().get_projects()
+        self.project_combo.blockSignals(True)
         self.project_combo.clear()
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT id, name FROM projects ORDER BY id")
-            self._projects = cur.fetchall()
-            for pid, name in self._projects:
-                self.project_combo.addItem(name, pid)
+        for pid, name in self._projects:
+            self.project_combo.addItem(name, pid)
+        self.project_combo.blockSignals(False)
         self._on_project_changed()
 
     def _on_project_changed(self):
+        self._load_screens(self._current_project_id())
+
+    def _current_project_id(self):
         idx = self.project_combo.currentIndex()
-        if idx < 0 or not hasattr(self, '_projects') or idx >= len(self._projects):
-            self.screen_combo.clear()
-            self.scenario_list.clear()
-            return
-        pid = self._projects[idx][0]
-        self._load_screens(pid)
+        if idx < 0 or idx >= len(self._projects):
+            return None
+        return self._projects[idx][0]
+
+    def _current_screen_id(self):
+        idx = self.screen_combo.currentIndex()
+        if idx < 0 or idx >= len(self._screens):
+            return None
+        return self._screens[idx][0]
 
     def _load_screens(self, project_id):
+        self._screens = get_store().get_screens(project_id)
+        self.screen_combo.blockSignals(True)
         self.screen_combo.clear()
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT id, name FROM screens WHERE project_id=? ORDER BY id", (project_id,))
-            self._screens = cur.fetchall()
-            for sid, name in self._screens:
-                self.screen_combo.addItem(name, sid)
+        for sid, name in self._screens:
+            self.screen_combo.addItem(name, sid)
+        self.screen_combo.blockSignals(False)
         self._on_screen_changed()
 
     def _on_screen_changed(self):
-        idx = self.screen_combo.currentIndex()
-        if idx < 0 or not hasattr(self, '_screens') or idx >= len(self._screens):
-            self.scenario_list.clear()
+        sid = self._current_screen_id()
+        if sid is None:
+            self._on_scenarios_loaded([])
             return
-        sid = self._screens[idx][0]
         self._load_scenarios(sid)
 
     def _load_scenarios(self, screen_id):
+        self._runner.request(
+            "scenarios", scenario_db.get_test_cases_for_execution, screen_id, on_result=self._on_scenarios_loaded
+        )
+
+    def _on_scenarios_loaded(self, scenarios):
+        self._runner.cancel("scenarios")
+        self._scenarios = scenarios
         self.scenario_list.clear()
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT tc.id, tc.name, MIN(ti.result) as min_result
-                FROM test_cases tc
-                LEFT JOIN test_items ti ON tc.id = ti.test_case_id
-                WHERE tc.screen_id=?
-                GROUP BY tc.id, tc.name
-                ORDER BY CASE WHEN min_result IS NULL OR min_result='' OR min_result='未実施' THEN 0 ELSE 1 END, tc.id
-            """, (screen_id,))
-            self._scenarios = cur.fetchall()
-            for cid, name, _ in self._scenarios:
-                self.scenario_list.addItem(name)
+        for cid, name, _ in self._scenarios:
+            self.scenario_list.addItem(name)
         if self._scenarios:
             self.scenario_list.setCurrentRow(0)
 
+    def _on_hierarchy_changed(self, event):
+        """階層の変更を各選択・シナリオ一覧に反映"""
+        if event.kind == RESET:
+            self._load_projects()
+        elif event.level == PROJECT:
+            if event.kind == ADDED:
+                insert_entry(self.project_combo, self._projects, event.ids[0], event.name)
+            elif event.kind == REMOVED:
+                remove_entries(self.project_combo, self._projects, event.ids)
+        elif event.level == SCREEN:
+            if event.kind == ADDED and event.parent_id == self._current_project_id():
+                insert_entry(self.screen_combo, self._screens, event.ids[0], event.name)
+            elif event.kind == REMOVED:
+                remove_entries(self.screen_combo, self._screens, event.ids)
+        elif event.level == CASE:
+            # 追加・テスト項目の変更は未実施優先の並びが変わるため、表示中の画面だけ読み直す
+            if event.kind == REMOVED:
+                if self._runner.is_pending("scenarios"):
+                    self._on_screen_changed()
+                else:
+                    remove_entries(self.scenario_list, self._scenarios, event.ids)
+            elif event.kind == ADDED and event.parent_id == self._current_screen_id():
+                self._on_screen_changed()
+            elif event.kind == CHANGED and any(row[0] in event.ids for row in self._scenarios):
+                self._on_screen_changed()
+
     def _open_test_execution(self):
         idx = self.scenario_list.currentRow()
         if idx < 0 or not hasattr(self, '_scenarios') or idx >= len(self._scenarios):
@@ -2,8 +2,10 @@
 テストケース管理ウィジェット
 """
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QComboBox, QListWidget, QPushButton, QHBoxLayout, QMessageBox, QAbstractItemView
-from core import scenario_db
+from core import cascade_delete
+from core.hierarchy_store import get_store, PROJECT, SCREEN, CASE, ADDED, REMOVED, RESET
 from gui.common.utils import get_text_dialog, get_selected_rows_from_listwidget
+from gui.common.hierarchy_view import subscribe_hierarchy, insert_entry, remove_entries
 import sqlite3
 
 class TestCaseManagementWidget(QWidget):
@@ -12,8 +14,12 @@ class TestCaseManagementWidget(QWidget):
     """
     def __init__(self, parent=None):
         super().__init__(parent)
+        self._projects = []
+        self._screens = []
+        self._cases = []
         self._init_ui()
         self._load_projects()
+        subscribe_hierarchy(self, self._on_hierarchy_changed)
 
     def _init_ui(self):
         layout = QVBoxLayout()
@@ -47,82 +53,93 @@ class TestCaseManagementWidget(QWidget):
         layout.addLayout(btn_layout)
 
     def _load_projects(self):
+        self._projects = get_store().get_projects()
+        self.project_combo.blockSignals(True)
         self.project_combo.clear()
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT id, name FROM projects ORDER BY id")
-            self._projects = cur.fetchall()
-            for pid, name in self._projects:
-                self.project_combo.addItem(name, pid)
+        for pid, name in self._projects:
+            self.project_combo.addItem(name, pid)
+        self.project_combo.blockSignals(False)
         self._on_project_changed()
 
     def _on_project_changed(self):
+        self._load_screens(self._current_project_id())
+
+    def _current_project_id(self):
         idx = self.project_combo.currentIndex()
-        if idx < 0 or not hasattr(self, '_projects') or idx >= len(self._projects):
-            self.screen_combo.clear()
-            self.case_list.clear()
-            return
-        pid = self._projects[idx][0]
-        self._load_screens(pid)
+        if idx < 0 or idx >= len(self._projects):
+            return None
+        return self._projects[idx][0]
+
+    def _current_screen_id(self):
+        idx = self.screen_combo.currentIndex()
+        if idx < 0 or idx >= len(self._screens):
+            return None
+        return self._screens[idx][0]
 
     def _load_screens(self, project_id):
+        self._screens = get_store().get_screens(project_id)
+        self.screen_combo.blockSignals(True)
         self.screen_combo.clear()
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT id, name FROM screens WHERE project_id=? ORDER BY id", (project_id,))
-            self._screens = cur.fetchall()
-            for sid, name in self._screens:
-                self.screen_combo.addItem(name, sid)
+        for sid, name in self._screens:
+            self.screen_combo.addItem(name, sid)
+        self.screen_combo.blockSignals(False)
         self._on_screen_changed()
 
     def _on_screen_changed(self):
-        idx = self.screen_combo.currentIndex()
-        if idx < 0 or not hasattr(self, '_screens') or idx >= len(self._screens):
-            self.case_list.clear()
-            return
-        sid = self._screens[idx][0]
-        self._load_cases(sid)
+        self._load_cases(self._current_screen_id())
 
     def _load_cases(self, screen_id):
+        self._cases = get_store().get_test_cases(screen_id)
         self.case_list.clear()
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT id, name FROM test_cases WHERE screen_id=? ORDER BY id", (screen_id,))
-            self._cases = cur.fetchall()
-            for cid, name in self._cases:
-                self.case_list.addItem(name)
+        for cid, name in self._cases:
+            self.case_list.addItem(name)
         if self._cases:
             self.case_list.setCurrentRow(0)
 
+    def _on_hierarchy_changed(self, event):
+        """階層の変更を各選択・テストケース一覧に反映"""
+        if event.kind == RESET:
+            self._load_projects()
+        elif event.level == PROJECT:
+            if event.kind == ADDED:
+                insert_entry(self.project_combo, self._projects, event.ids[0], event.name)
+            elif event.kind == REMOVED:
+                remove_entries(self.project_combo, self._projects, event.ids)
+        elif event.level == SCREEN:
+            if event.kind == ADDED and event.parent_id == self._current_project_id():
+                insert_entry(self.screen_combo, self._screens, event.ids[0], event.name)
+            elif event.kind == REMOVED:
+                remove_entries(self.screen_combo, self._screens, event.ids)
+        elif event.level == CASE:
+            if event.kind == ADDED and event.parent_id == self._current_screen_id():
+                insert_entry(self.case_list, self._cases, event.ids[0], event.name)
+            elif event.kind == REMOVED:
+                remove_entries(self.case_list, self._cases, event.ids)
+
     def _add_case(self):
-        sidx = self.screen_combo.currentIndex()
-        if sidx < 0 or not hasattr(self, '_screens') or sidx >= len(self._screens):
+        sid = self._current_screen_id()
+        if sid is None:
             QMessageBox.warning(self, "エラー", "画面（シナリオ）を選択してください")
             return
-        sid = self._screens[sidx][0]
         name, ok = get_text_dialog(self, "新規テストケース名を入力してください")
         if ok and name:
             name = name.strip()
             if not name or len(name) > 100:
                 QMessageBox.warning(self, "エラー", "テストケース名は1～100文字で入力してください")
                 return
-            with sqlite3.connect(scenario_db.DB_PATH) as conn:
-                cur = conn.cursor()
-                try:
-                    cur.execute("INSERT INTO test_cases (screen_id, name) VALUES (?, ?)", (sid, name))
-                    conn.commit()
-                except sqlite3.IntegrityError:
-                    QMessageBox.warning(self, "エラー", "同名のテストケースが既に存在します")
-            self._load_cases(sid)
+            try:
+                # 一覧への追加は階層ストアの変更通知で行う
+                get_store().add_test_case(sid, name)
+            except sqlite3.IntegrityError:
+                QMessageBox.warning(self, "エラー", "同名のテストケースが既に存在します")
 
     def _delete_case(self):
-        sidx = self.screen_combo.currentIndex()
-        if sidx < 0 or not hasattr(self, '_screens') or sidx >= len(self._screens):
+        sid = self._current_screen_id()
+        if sid is None:
             QMessageBox.warning(self, "エラー", "画面（シナリオ）を選択してください")
             return
-        sid = self._screens[sidx][0]
         # 共通関数で選択データ取得
-        delete_targets = get_selected_rows_from_listwidget(self.case_list, getattr(self, '_cases', []))
+        delete_targets = get_selected_rows_from_listwidget(self.case_list, self._cases)
         if not delete_targets:
             QMessageBox.warning(self, "エラー", "削除するテストケースを選択してください")
             return
@@ -134,20 +151,12 @@ class TestCaseManagementWidget(QWidget):
             QMessageBox.Yes | QMessageBox.No
         )
         if reply == QMessageBox.Yes:
-            with sqlite3.connect(scenario_db.DB_PATH) as conn:
-                cur = conn.cursor()
-                errors = []
-                for cid, name in delete_targets:
-                    try:
-                        # テスト項目削除
-                        cur.execute("DELETE FROM test_items WHERE test_case_id=?", (cid,))
-                        # テストケース削除
-                        cur.execute("DELETE FROM test_cases WHERE id=?", (cid,))
-                    except Exception as e:
-                        errors.append(f"{name}: {str(e)}")
-                conn.commit()
-                if errors:
-                    QMessageBox.critical(self, "エラー", "\n".join(errors))
-                else:
-                    QMessageBox.information(self, "削除完了", f"選択したテストケースを削除しました")
-            self._load_cases(sid)
+            case_ids = [cid for cid, _ in delete_targets]
+            try:
+                # 配下のテスト項目もまとめて削除（関連バグからの参照は解除）
+                cascade_delete.delete_test_cases(case_ids)
+            except Exception as e:
+                QMessageBox.critical(self, "エラー", f"テストケースの削除中にエラーが発生しました:\n{str(e)}")
+                return
+            get_store().notify_removed(CASE, case_ids, sid)
+            QMessageBox.information(self, "削除完了", f"選択したテストケースを削除しました")
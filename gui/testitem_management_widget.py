@@ -2,8 +2,11 @@
 テスト項目管理ウィジェット
 """
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QComboBox, QListWidget, QPushButton, QHBoxLayout, QMessageBox, QAbstractItemView
-from core import scenario_db
+from core import cascade_delete, scenario_db
+from core.hierarchy_store import get_store, PROJECT, SCREEN, CASE, ITEM, ADDED, REMOVED, CHANGED, RESET
 from gui.common.utils import get_text_dialog, get_selected_rows_from_listwidget
+from gui.common.db_worker import QueryRunner, BusyIndicator
+from gui.common.hierarchy_view import subscribe_hierarchy, insert_entry, remove_entries
 import sqlite3
 
 class TestItemManagementWidget(QWidget):
@@ -12,13 +15,22 @@ class TestItemManagementWidget(QWidget):
     """
     def __init__(self, parent=None):
         super().__init__(parent)
+        self._runner = QueryRunner(self)
+        self._projects = []
+        self._screens = []
+        self._cases = []
+        self._items = []
         self._init_ui()
         self._load_projects()
+        subscribe_hierarchy(self, self._on_hierarchy_changed)
 
     def _init_ui(self):
         layout = QVBoxLayout()
         self.setLayout(layout)
         layout.addWidget(QLabel("テスト項目管理画面"))
+        self.busy_indicator = BusyIndicator()
+        self.busy_indicator.attach(self._runner)
+        layout.addWidget(self.busy_indicator)
 
         # プロジェクト選択
         self.project_combo = QComboBox()
@@ -52,102 +64,131 @@ class TestItemManagementWidget(QWidget):
         layout.addLayout(btn_layout)
 
     def _load_projects(self):
+        self._projects = get_store().get_projects()
+        self.project_combo.blockSignals(True)
         self.project_combo.clear()
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT id, name FROM projects ORDER BY id")
-            self._projects = cur.fetchall()
-            for pid, name in self._projects:
-                self.project_combo.addItem(name, pid)
+        for pid, name in self._projects:
+            self.project_combo.addItem(name, pid)
+        self.project_combo.blockSignals(False)
         self._on_project_changed()
 
     def _on_project_changed(self):
+        self._load_screens(self._current_project_id())
+
+    def _current_project_id(self):
         idx = self.project_combo.currentIndex()
-        if idx < 0 or not hasattr(self, '_projects') or idx >= len(self._projects):
-            self.screen_combo.clear()
-            self.case_combo.clear()
-            self.item_list.clear()
-            return
-        pid = self._projects[idx][0]
-        self._load_screens(pid)
+        if idx < 0 or idx >= len(self._projects):
+            return None
+        return self._projects[idx][0]
+
+    def _current_screen_id(self):
+        idx = self.screen_combo.currentIndex()
+        if idx < 0 or idx >= len(self._screens):
+            return None
+        return self._screens[idx][0]
+
+    def _current_case_id(self):
+        idx = self.case_combo.currentIndex()
+        if idx < 0 or idx >= len(self._cases):
+            return None
+        return self._cases[idx][0]
 
     def _load_screens(self, project_id):
+        self._screens = get_store().get_screens(project_id)
+        self.screen_combo.blockSignals(True)
         self.screen_combo.clear()
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT id, name FROM screens WHERE project_id=? ORDER BY id", (project_id,))
-            self._screens = cur.fetchall()
-            for sid, name in self._screens:
-                self.screen_combo.addItem(name, sid)
+        for sid, name in self._screens:
+            self.screen_combo.addItem(name, sid)
+        self.screen_combo.blockSignals(False)
         self._on_screen_changed()
 
     def _on_screen_changed(self):
-        idx = self.screen_combo.currentIndex()
-        if idx < 0 or not hasattr(self, '_screens') or idx >= len(self._screens):
-            self.case_combo.clear()
-            self.item_list.clear()
-            return
-        sid = self._screens[idx][0]
-        self._load_cases(sid)
+        self._load_cases(self._current_screen_id())
 
     def _load_cases(self, screen_id):
+        self._cases = get_store().get_test_cases(screen_id)
+        self.case_combo.blockSignals(True)
         self.case_combo.clear()
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT id, name FROM test_cases WHERE screen_id=? ORDER BY id", (screen_id,))
-            self._cases = cur.fetchall()
-            for cid, name in self._cases:
-                self.case_combo.addItem(name, cid)
+        for cid, name in self._cases:
+            self.case_combo.addItem(name, cid)
+        self.case_combo.blockSignals(False)
         self._on_case_changed()
 
     def _on_case_changed(self):
-        idx = self.case_combo.currentIndex()
-        if idx < 0 or not hasattr(self, '_cases') or idx >= len(self._cases):
-            self.item_list.clear()
+        cid = self._current_case_id()
+        if cid is None:
+            self._on_items_loaded([])
             return
-        cid = self._cases[idx][0]
         self._load_items(cid)
 
     def _load_items(self, case_id):
+        self._runner.request("items", scenario_db.get_test_items, case_id, on_result=self._on_items_loaded)
+
+    def _on_items_loaded(self, items):
+        self._runner.cancel("items")
+        self._items = items
         self.item_list.clear()
-        with sqlite3.connect(scenario_db.DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT id, name FROM test_items WHERE test_case_id=? ORDER BY id", (case_id,))
-            self._items = cur.fetchall()
-            for iid, name in self._items:
-                self.item_list.addItem(name)
+        for iid, name in self._items:
+            self.item_list.addItem(name)
         if self._items:
             self.item_list.setCurrentRow(0)
 
+    def _on_hierarchy_changed(self, event):
+        """階層の変更を各選択・テスト項目一覧に反映"""
+        if event.kind == RESET:
+            self._load_projects()
+        elif event.level == PROJECT:
+            if event.kind == ADDED:
+                insert_entry(self.project_combo, self._projects, event.ids[0], event.name)
+            elif event.kind == REMOVED:
+                remove_entries(self.project_combo, self._projects, event.ids)
+        elif event.level == SCREEN:
+            if event.kind == ADDED and event.parent_id == self._current_project_id():
+                insert_entry(self.screen_combo, self._screens, event.ids[0], event.name)
+            elif event.kind == REMOVED:
+                remove_entries(self.screen_combo, self._screens, event.ids)
+        elif event.level == CASE:
+            if event.kind == ADDED and event.parent_id == self._current_screen_id():
+                insert_entry(self.case_combo, self._cases, event.ids[0], event.name)
+            elif event.kind == REMOVED:
+                remove_entries(self.case_combo, self._cases, event.ids)
+            elif event.kind == CHANGED and self._current_case_id() in event.ids:
+                self._on_case_changed()
+        elif event.level == ITEM:
+            if event.parent_id != self._current_case_id():
+                return
+            if self._runner.is_pending("items"):
+                # 読み込み中の一覧は変更前の可能性があるため読み直す
+                self._on_case_changed()
+            elif event.kind == ADDED:
+                insert_entry(self.item_list, self._items, event.ids[0], event.name)
+            elif event.kind == REMOVED:
+                remove_entries(self.item_list, self._items, event.ids)
+
     def _add_item(self):
-        cidx = self.case_combo.currentIndex()
-        if cidx < 0 or not hasattr(self, '_cases') or cidx >= len(self._cases):
+        cid = self._current_case_id()
+        if cid is None:
             QMessageBox.warning(self, "エラー", "テストケースを選択してください")
             return
-        cid = self._cases[cidx][0]
         name, ok = get_text_dialog(self, "新規テスト項目名を入力してください")
         if ok and name:
             name = name.strip()
             if not name or len(name) > 100:
                 QMessageBox.warning(self, "エラー", "テスト項目名は1～100文字で入力してください")
                 return
-            with sqlite3.connect(scenario_db.DB_PATH) as conn:
-                cur = conn.cursor()
-                try:
-                    cur.execute("INSERT INTO test_items (test_case_id, name) VALUES (?, ?)", (cid, name))
-                    conn.commit()
-                except sqlite3.IntegrityError:
-                    QMessageBox.warning(self, "エラー", "同名のテスト項目が既に存在します")
-            self._load_items(cid)
+            try:
+                # 一覧への追加は階層ストアの変更通知で行う
+                get_store().add_test_item(cid, name)
+            except sqlite3.IntegrityError:
+                QMessageBox.warning(self, "エラー", "同名のテスト項目が既に存在します")
 
     def _delete_item(self):
-        cidx = self.case_combo.currentIndex()
-        if cidx < 0 or not hasattr(self, '_cases') or cidx >= len(self._cases):
+        cid = self._current_case_id()
+        if cid is None:
             QMessageBox.warning(self, "エラー", "テストケースを選択してください")
             return
-        cid = self._cases[cidx][0]
         # 共通関数で選択データ取得
-        delete_targets = get_selected_rows_from_listwidget(self.item_list, getattr(self, '_items', []))
+        delete_targets = get_selected_rows_from_listwidget(self.item_list, self._items)
         if not delete_targets:
             QMessageBox.warning(self, "エラー", "削除するテスト項目を選択してください")
             return
@@ -159,17 +200,12 @@ class TestItemManagementWidget(QWidget):
             QMessageBox.Yes | QMessageBox.No
         )
         if reply == QMessageBox.Yes:
-            with sqlite3.connect(scenario_db.DB_PATH) as conn:
-                cur = conn.cursor()
-                errors = []
-                for iid, name in delete_targets:
-                    try:
-                        cur.execute("DELETE FROM test_items WHERE id=?", (iid,))
-                    except Exception as e:
-                        errors.append(f"{name}: {str(e)}")
-                conn.commit()
-                if errors:
-                    QMessageBox.critical(self, "エラー", "\n".join(errors))
-                else:
-                    QMessageBox.information(self, "削除完了", f"選択したテスト項目を削除しました")
-            self._load_items(cid)
+            item_ids = [iid for iid, _ in delete_targets]
+            try:
+                # 関連バグからの参照も解除される
+                cascade_delete.delete_test_items(item_ids)
+            except Exception as e:
+                QMessageBox.critical(self, "エラー", f"テスト項目の削除中にエラーが発生しました:\n{str(e)}")
+                return
+            get_store().notify_removed(ITEM, item_ids, cid)
+            QMessageBox.information(self, "削除完了", f"選択したテスト項目を削除しました")
@@ -0,0 +1,93 @@
+"""
+カスケード削除のテスト
+実行履歴のあるテストケースを取り込み直して項目を減らしたあとでも、削除できることを確かめる
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from core import cascade_delete, db_connection, scenario_db
+from core.run_history import RunHistoryWriter, now_text
+from core.scenario_importer import ScenarioImporter
+
+
+def _sheet(*item_names):
+    return [{"screen_name": "ログイン", "scenarios": [
+        {"name": "正常系", "testitems": [{"テスト項目": name} for name in item_names]}
+    ]}]
+
+
+def _step(action):
+    now = now_text()
+    return {"action": action, "target": "#login", "started_at": now, "finished_at": now,
+            "duration": 0.1, "result": "OK", "message": ""}
+
+
+class CascadeDeleteTest(unittest.TestCase):
+    def setUp(self):
+        self._db_path = scenario_db.DB_PATH
+        self._dir = tempfile.mkdtemp()
+        scenario_db.DB_PATH = os.path.join(self._dir, "scenarios.db")
+        scenario_db.init_db()
+
+    def tearDown(self):
+        db_connection.close_thread_connections()
+        scenario_db.DB_PATH = self._db_path
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+    def _count(self, table):
+        return scenario_db.get_connection().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def _import_and_run(self):
+        """項目 a, b のテストケースを取り込み、1回分の実行履歴とスクリーンショットの参照を書き込む"""
+        ScenarioImporter().import_all(_sheet("a", "b"), project_name="P")
+        conn = scenario_db.get_connection()
+        project_id, case_id = conn.execute("""
+            SELECT s.project_id, c.id FROM test_cases c JOIN screens s ON s.id = c.screen_id
+        """).fetchone()
+        item_ids = [row[0] for row in conn.execute("SELECT id FROM test_items ORDER BY id")]
+        writer = RunHistoryWriter()
+        run_id = writer.start_run(1, ["chrome"], 1)
+        now = now_text()
+        writer.add_case(run_id, {
+            "test_case_id": case_id, "browser": "chrome", "started_at": now, "finished_at": now,
+            "duration": 0.2, "result": "OK", "error": "",
+            "items": [{"test_item_id": item_id, "steps": [_step("click")]} for item_id in item_ids],
+        })
+        writer.finish_run(run_id)
+        with scenario_db.transaction() as cur:
+            cur.executemany("""
+                INSERT INTO screenshots (content_hash, run_id, test_case_id, test_item_id, step_no, captured_at)
+                VALUES ('0', ?, ?, ?, 1, ?)
+            """, [(run_id, case_id, item_id, now) for item_id in item_ids])
+        return project_id, case_id, item_ids
+
+    def test_delete_case_after_reimport(self):
+        project_id, case_id, item_ids = self._import_and_run()
+        ScenarioImporter().import_all(_sheet("a"), project_id=project_id, overwrite=True)
+
+        # 取り込みで消えた項目の実行履歴・スクリーンショットの参照も消える
+        conn = scenario_db.get_connection()
+        self.assertEqual(conn.execute("SELECT test_item_id FROM test_run_steps").fetchall(), [(item_ids[0],)])
+        self.assertEqual(conn.execute("SELECT test_item_id FROM screenshots").fetchall(), [(item_ids[0],)])
+
+        counts = cascade_delete.delete_test_cases([case_id])
+        self.assertEqual((counts["test_cases"], counts["test_items"]), (1, 1))
+        for table in ("test_cases", "test_items", "test_run_cases", "test_run_steps", "screenshots"):
+            self.assertEqual(self._count(table), 0, table)
+        self.assertEqual(self._count("test_runs"), 1)
+
+    def test_delete_case_with_leftover_steps(self):
+        # 取り込みが項目の実行履歴を残していた頃のデータ（削除済みの項目を指す手順）でも削除できる
+        project_id, case_id, item_ids = self._import_and_run()
+        with scenario_db.transaction() as cur:
+            cur.execute("DELETE FROM test_items WHERE id = ?", (item_ids[1],))
+
+        cascade_delete.delete_projects([project_id])
+        for table in ("projects", "test_cases", "test_items", "test_run_cases", "test_run_steps", "screenshots"):
+            self.assertEqual(self._count(table), 0, table)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,235 @@
+"""
+ExecutionEngine の結合テスト
+localhost で http.server の小さなページを立て、HTTPでページを取得して操作する簡易ドライバで
+ExecutionEngine.run を最初から最後まで実行し、test_items / test_cases への書き戻しを確かめる
+（selenium・ブラウザがなくても実行できる）
+"""
+import datetime
+import http.server
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib.request
+from html.parser import HTMLParser
+from urllib.parse import parse_qs, urljoin, urlparse
+
+from core import db_connection, scenario_db
+from core.execution_engine import CASE_EXECUTED_STATUS, RESULT_FAILURE, RESULT_SUCCESS, ExecutionEngine
+
+LOGIN_PAGE = """<html><head><title>ログイン</title></head><body>
+<input name="user"><a id="go" href="/home?user=guest">ログイン</a>
+</body></html>"""
+HOME_PAGE = """<html><head><title>ダッシュボード</title></head><body>
+<p class="msg">ようこそ {user} さん</p>
+</body></html>"""
+
+# 簡易ドライバで扱うセレクタ（タグ名・#id・.class・[属性=値] の組み合わせ）
+_SELECTOR = re.compile(r"^(\w*)(?:#([\w-]+))?(?:\.([\w-]+))?(?:\[(\w+)=\"?([^\]\"]*)\"?\])?$")
+
+
+class _PageHandler(http.server.BaseHTTPRequestHandler):
+    """テスト用のページ（/login と、クエリの user を表示する /home）"""
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/login":
+            body = LOGIN_PAGE
+        elif url.path == "/home":
+            body = HOME_PAGE.format(user=parse_qs(url.query).get("user", [""])[0])
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Element:
+    def __init__(self, driver, tag, attrs):
+        self.driver = driver
+        self.tag = tag
+        self.attrs = attrs
+        self.text = ""
+
+    def is_displayed(self):
+        return True
+
+    def clear(self):
+        self.attrs["value"] = ""
+
+    def send_keys(self, value):
+        self.attrs["value"] = self.attrs.get("value", "") + value
+
+    def click(self):
+        if self.tag == "a":
+            self.driver.get(self.attrs["href"])
+
+    def find_elements(self, by, selector):
+        return []
+
+
+class _PageParser(HTMLParser):
+    """ページの要素を (タグ, 属性, 文字列) の一覧にする"""
+    def __init__(self, driver):
+        super().__init__()
+        self.driver = driver
+        self.elements = []
+        self._open = []
+
+    def handle_starttag(self, tag, attrs):
+        element = _Element(self.driver, tag, {name: value or "" for name, value in attrs})
+        self.elements.append(element)
+        if tag not in ("input", "br", "img", "meta"):
+            self._open.append(element)
+
+    def handle_endtag(self, tag):
+        while self._open:
+            if self._open.pop().tag == tag:
+                break
+
+    def handle_data(self, data):
+        for element in self._open:
+            element.text += data
+
+
+class _HttpDriver:
+    """ExecutionEngine・DriverPool が使う WebDriver のメソッドだけを持つ、HTTPでページを取得するドライバ"""
+    def __init__(self, browser):
+        self.browser = browser
+        self.current_url = "about:blank"
+        self.window_handles = ["main"]
+        self.switch_to = self
+        self._elements = []
+
+    def get(self, url):
+        if url == "about:blank":
+            self.current_url, self._elements = url, []
+            return
+        self.current_url = urljoin(self.current_url, url)
+        with urllib.request.urlopen(self.current_url) as response:
+            parser = _PageParser(self)
+            parser.feed(response.read().decode("utf-8"))
+        self._elements = parser.elements
+
+    @property
+    def title(self):
+        return next((e.text for e in self._elements if e.tag == "title"), "")
+
+    def find_element(self, by, selector):
+        assert by == "css selector"
+        tag, element_id, class_name, attr, value = _SELECTOR.match(selector).groups()
+        for element in self._elements:
+            if ((not tag or element.tag == tag)
+                    and (not element_id or element.attrs.get("id") == element_id)
+                    and (not class_name or class_name in element.attrs.get("class", "").split())
+                    and (not attr or element.attrs.get(attr) == value)):
+                return element
+        raise LookupError(f"no such element: {selector}")
+
+    def window(self, handle):
+        pass
+
+    def close(self):
+        pass
+
+    def execute_script(self, script):
+        return None
+
+    def delete_all_cookies(self):
+        pass
+
+    def quit(self):
+        pass
+
+
+class ExecutionEngineTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _PageHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}/"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self._db_path = scenario_db.DB_PATH
+        self._dir = tempfile.mkdtemp()
+        scenario_db.DB_PATH = os.path.join(self._dir, "scenarios.db")
+        scenario_db.init_db()
+
+    def tearDown(self):
+        db_connection.close_thread_connections()
+        scenario_db.DB_PATH = self._db_path
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+    def _add_case(self, screen_id, name, items):
+        """テストケースと (名前, 入力データ, 操作手順, 期待結果) のテスト項目を登録し、(ケースID, [項目ID, ...]) を返す"""
+        with scenario_db.transaction() as cur:
+            cur.execute("INSERT INTO test_cases (screen_id, name) VALUES (?, ?)", (screen_id, name))
+            case_id = cur.lastrowid
+            item_ids = []
+            for item in items:
+                cur.execute("""
+                    INSERT INTO test_items (test_case_id, name, input_data, operation, expected)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (case_id, *item))
+                item_ids.append(cur.lastrowid)
+        return case_id, item_ids
+
+    def test_run_writes_results_back(self):
+        with scenario_db.transaction() as cur:
+            cur.execute("INSERT INTO projects (name) VALUES ('P')")
+            cur.execute("INSERT INTO screens (project_id, name) VALUES (?, 'ログイン画面')", (cur.lastrowid,))
+            screen_id = cur.lastrowid
+        passed_case, passed_items = self._add_case(screen_id, "ログインできる", [
+            ("ようこそ表示", "taro",
+             "@open: /home?user={input}",
+             "@タイトル確認: ダッシュボード\n確認：ようこそと表示されること\n@確認: .msg = taro さん"),
+            ("ログインリンク", "hanako",
+             "@open: /login\n@type: input[name=user] = {input}\n入力：ユーザー名を入力する\n@click: #go",
+             "@assert_url: /home?user=guest"),
+            ("目視確認", "", "入力：ユーザー名\n確認：エラーが表示されること", "表示が崩れていないこと"),
+        ])
+        failed_case, failed_items = self._add_case(screen_id, "表示が違う", [
+            ("メッセージ", "jiro", "@open: /home?user={input}", "@assert_text: .msg = saburo"),
+        ])
+        manual_case, manual_items = self._add_case(screen_id, "手動のみ", [
+            ("手動", "", "開く：ログイン画面", "確認：表示されること"),
+        ])
+
+        engine = ExecutionEngine(base_url=self.base_url, parallelism=2, driver_factory=_HttpDriver,
+                                 step_timeout=0.3)
+        results = engine.run([passed_case, failed_case, manual_case])
+
+        self.assertEqual([r["result"] for r in results], [RESULT_SUCCESS, RESULT_FAILURE, None])
+        conn = scenario_db.get_connection()
+        item_rows = dict((row[0], row[1:]) for row in conn.execute("SELECT id, result, exec_date FROM test_items"))
+        today = datetime.date.today().strftime("%Y-%m-%d")
+        self.assertEqual(item_rows[passed_items[0]], (RESULT_SUCCESS, today))
+        self.assertEqual(item_rows[passed_items[1]], (RESULT_SUCCESS, today))
+        self.assertEqual(item_rows[failed_items[0]], (RESULT_FAILURE, today))
+        # 手順（@ の行）のないテスト項目は手動実施の項目として書き換えない
+        self.assertEqual(item_rows[passed_items[2]], (None, None))
+        self.assertEqual(item_rows[manual_items[0]], (None, None))
+
+        case_rows = dict((row[0], row[1:]) for row in conn.execute(
+            "SELECT id, status, result, last_run IS NOT NULL FROM test_cases"))
+        self.assertEqual(case_rows[passed_case], (CASE_EXECUTED_STATUS, RESULT_SUCCESS, 1))
+        self.assertEqual(case_rows[failed_case], (CASE_EXECUTED_STATUS, RESULT_FAILURE, 1))
+        self.assertNotEqual(case_rows[manual_case][0], CASE_EXECUTED_STATUS)
+        self.assertEqual(case_rows[manual_case][1:], (None, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
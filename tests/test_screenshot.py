@@ -0,0 +1,113 @@
+"""
+スクリーンショットの保存（ScreenshotPipeline）のテスト
+Pillow での縮小・JPEG圧縮・サムネイル作成と、同じ画像の重複排除を確かめる
+"""
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from PIL import Image
+
+from core import db_connection, scenario_db
+from core.screenshot import DEFAULT_MAX_WIDTH, THUMBNAIL_WIDTH, ScreenshotPipeline, apply_retention, get_screenshots
+
+
+def _png(width, height, color):
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(out, "PNG")
+    return out.getvalue()
+
+
+class ScreenshotPipelineTest(unittest.TestCase):
+    def setUp(self):
+        self._db_path = scenario_db.DB_PATH
+        self._dir = tempfile.mkdtemp()
+        scenario_db.DB_PATH = os.path.join(self._dir, "scenarios.db")
+        scenario_db.init_db()
+        self.directory = os.path.join(self._dir, "screenshots")
+
+    def tearDown(self):
+        db_connection.close_thread_connections()
+        scenario_db.DB_PATH = self._db_path
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+    def _orphans(self):
+        return scenario_db.get_connection().execute("""
+            SELECT COUNT(*) FROM screenshots s
+            WHERE NOT EXISTS (SELECT 1 FROM screenshot_files f WHERE f.content_hash = s.content_hash)
+        """).fetchone()[0]
+
+    def test_compress_and_deduplicate(self):
+        pipeline = ScreenshotPipeline(workers=2, max_total_mb=None, max_age_days=None)
+        large = _png(1920, 1080, (200, 30, 30))
+        for step_no in range(1, 4):
+            self.assertTrue(pipeline.submit(large, test_item_id=1, step_no=step_no))
+        self.assertTrue(pipeline.submit(_png(800, 600, (30, 30, 200)), test_item_id=2, step_no=1))
+        stats = pipeline.close()
+
+        self.assertEqual((stats["stored"], stats["deduplicated"], stats["failed"]), (2, 2, 0))
+        shots = get_screenshots(test_item_id=1)
+        self.assertEqual(len(shots), 3)
+        self.assertEqual(len({shot["path"] for shot in shots}), 1)
+        shot = shots[0]
+        self.assertTrue(shot["path"].endswith(".jpg"))
+        # 保存先はDBファイルと同じフォルダの screenshots
+        self.assertEqual(os.path.commonpath([shot["path"], self.directory]), self.directory)
+        self.assertEqual((shot["width"], shot["height"]), (DEFAULT_MAX_WIDTH, 720))
+        with Image.open(shot["path"]) as image:
+            self.assertEqual((image.format, image.size), ("JPEG", (DEFAULT_MAX_WIDTH, 720)))
+        with Image.open(shot["thumbnail_path"]) as thumbnail:
+            self.assertEqual((thumbnail.format, thumbnail.width), ("JPEG", THUMBNAIL_WIDTH))
+        # 幅が上限以下の画像は縮小しない
+        small = get_screenshots(test_item_id=2)[0]
+        self.assertEqual((small["width"], small["height"]), (800, 600))
+        self.assertEqual(self._orphans(), 0)
+
+    def test_failed_store_drops_waiting_references(self):
+        pipeline = ScreenshotPipeline(workers=2, max_total_mb=None, max_age_days=None)
+        started = threading.Event()
+        release = threading.Event()
+        store = pipeline._store
+
+        def failing_store(png, content_hash, captured_at):
+            # 保存中に同じ画像が別のワーカーに届くようにしてから失敗させる
+            started.set()
+            release.wait(5)
+            raise OSError("disk full")
+
+        pipeline._store = failing_store
+        png = _png(300, 200, (10, 120, 10))
+        pipeline.submit(png, test_item_id=1, step_no=1)
+        self.assertTrue(started.wait(5))
+        pipeline.submit(png, test_item_id=1, step_no=2)
+        pipeline.submit(png, test_item_id=1, step_no=3)
+        release.set()
+        # 保存に失敗した後に届いた同じ画像は改めて保存する
+        pipeline._store = store
+        stats = pipeline.close(apply_retention=False)
+
+        self.assertEqual(self._orphans(), 0)
+        rows = scenario_db.get_connection().execute("SELECT COUNT(*) FROM screenshots").fetchone()[0]
+        self.assertEqual(rows + stats["failed"], 3)
+        self.assertGreaterEqual(stats["failed"], 1)
+
+    def test_retention_removes_unreferenced_files(self):
+        pipeline = ScreenshotPipeline(workers=1, max_total_mb=None, max_age_days=None)
+        pipeline.submit(_png(300, 200, (10, 10, 10)), test_item_id=1, step_no=1)
+        pipeline.close(apply_retention=False)
+        shot = get_screenshots(test_item_id=1)[0]
+        with scenario_db.transaction() as cur:
+            cur.execute("DELETE FROM screenshots")
+
+        removed = apply_retention(max_total_mb=None, max_age_days=None)
+        self.assertEqual(removed["files"], 1)
+        self.assertFalse(os.path.exists(shot["path"]))
+        self.assertFalse(os.path.exists(shot["thumbnail_path"]))
+        self.assertEqual(scenario_db.get_connection().execute("SELECT COUNT(*) FROM screenshot_files").fetchone()[0], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()